@@ -0,0 +1,146 @@
+# backend/bench/corpus.py
+"""Synthetic PDF/DOCX/TXT/XLSX documents of controlled size.
+
+    python -m bench.corpus --out /tmp/corpus --docs 20 --pages 10
+
+Text is generated from a fixed vocabulary with a seeded RNG, so the same
+arguments always produce the same corpus. Every document also contains a
+few known facts (an invoice number, a total, a vendor) to ask about.
+"""
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List
+
+VOCABULARY = (
+    "report revenue quarter customer invoice payment contract delivery schedule "
+    "policy employee leave annual review budget project milestone risk supplier "
+    "warehouse shipment account balance audit compliance summary region target "
+    "laporan hasil pelanggan bayaran kontrak jadual dasar pekerja cuti tahunan "
+    "bajet projek risiko pembekal akaun baki audit ringkasan sasaran"
+).split()
+
+FILE_TYPES = ("pdf", "docx", "txt", "xlsx")
+WORDS_PER_PAGE = 450
+ROWS_PER_PAGE = 40
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, pages: int) -> List[List[str]]:
+    """Pages of paragraphs, roughly WORDS_PER_PAGE words each"""
+    result = []
+    for _ in range(pages):
+        page, words = [], 0
+        while words < WORDS_PER_PAGE:
+            paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+            page.append(paragraph)
+            words += len(paragraph.split())
+        result.append(page)
+    return result
+
+
+def _facts(index: int) -> Dict[str, str]:
+    return {
+        "invoice": f"INV-{2024000 + index}",
+        "total": f"{1000 + index * 37} dollars",
+        "vendor": f"Vendor {index} Sdn Bhd"
+    }
+
+
+def _fact_text(facts: Dict[str, str]) -> str:
+    return (
+        f"Invoice number {facts['invoice']} has a total of {facts['total']}. "
+        f"The vendor is {facts['vendor']}."
+    )
+
+
+def _write_txt(path: Path, pages: List[List[str]], facts: Dict[str, str]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_fact_text(facts) + "\n\n")
+        for page in pages:
+            f.write("\n\n".join(page) + "\n\n")
+
+
+def _write_pdf(path: Path, pages: List[List[str]], facts: Dict[str, str]):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    style = getSampleStyleSheet()["BodyText"]
+    story = [Paragraph(_fact_text(facts), style)]
+    for page in pages:
+        story.extend(Paragraph(paragraph, style) for paragraph in page)
+        story.append(PageBreak())
+    SimpleDocTemplate(str(path), pagesize=A4).build(story)
+
+
+def _write_docx(path: Path, pages: List[List[str]], facts: Dict[str, str]):
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph(_fact_text(facts))
+    for page in pages:
+        for paragraph in page:
+            document.add_paragraph(paragraph)
+        document.add_page_break()
+    document.save(str(path))
+
+
+def _write_xlsx(path: Path, rng: random.Random, pages: int, facts: Dict[str, str]):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Invoices")
+    sheet.append(["Invoice", "Vendor", "Total", "Region", "Notes"])
+    sheet.append([facts["invoice"], facts["vendor"], facts["total"], "Central", "Reference invoice"])
+    for row in range(pages * ROWS_PER_PAGE):
+        sheet.append([
+            f"INV-{rng.randint(1000000, 9999999)}",
+            f"Vendor {rng.randint(1, 500)}",
+            round(rng.uniform(10, 10000), 2),
+            rng.choice(["North", "South", "East", "West"]),
+            _sentence(rng)
+        ])
+    workbook.save(str(path))
+
+
+def generate_corpus(out_dir: Path, docs: int, pages: int, types=FILE_TYPES, seed: int = 0) -> List[Dict]:
+    """Write `docs` documents cycling through `types`, returns their manifest"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for index in range(docs):
+        rng = random.Random(seed * 100003 + index)
+        file_type = types[index % len(types)]
+        facts = _facts(index)
+        path = out_dir / f"doc_{index:04d}.{file_type}"
+
+        if file_type == "xlsx":
+            _write_xlsx(path, rng, pages, facts)
+        else:
+            writer = {"txt": _write_txt, "pdf": _write_pdf, "docx": _write_docx}[file_type]
+            writer(path, _paragraphs(rng, pages), facts)
+
+        manifest.append({"path": str(path), "type": file_type, "bytes": path.stat().st_size, "facts": facts})
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--types", default=",".join(FILE_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out, args.docs, args.pages, tuple(args.types.split(",")), args.seed)
+    total = sum(item["bytes"] for item in manifest)
+    print(f"Wrote {len(manifest)} documents ({total / 1e6:.1f} MB) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
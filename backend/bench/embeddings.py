@@ -0,0 +1,233 @@
+# backend/bench/embeddings.py
+"""Embedding backend and vector storage benchmark.
+
+    cd backend
+    python -m bench.embeddings --backends torch,onnx,onnx-int8 --dtypes float32,float16,int8 --k 5
+
+Encodes a passage corpus (bench/corpus.py paragraphs, or --texts with one
+passage per line) and queries taken from it with every backend, then
+searches the passages the way cached documents are searched: exact
+cosine over the stored matrix, shortlisting and re-scoring in float32 for
+compact dtypes. Reports encode throughput and single-query latency per
+backend, recall@k against torch/float32 for every backend and dtype
+(with and without re-scoring), the bytes each dtype stores, and the size
+of the same vectors in a Chroma directory. Results are written to
+bench/results/ as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .corpus import _paragraphs
+from .run import BACKEND_DIR, RESULTS_DIR, git_commit, latency_summary, peak_rss_mb
+
+BASELINE = ("torch", "float32")
+
+
+def load_passages(args) -> List[str]:
+    if args.texts:
+        lines = Path(args.texts).read_text(encoding="utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()][:args.passages]
+    passages: List[str] = []
+    index = 0
+    while len(passages) < args.passages:
+        rng = random.Random(args.seed * 100003 + index)
+        passages.extend(paragraph for page in _paragraphs(rng, 10) for paragraph in page)
+        index += 1
+    return passages[:args.passages]
+
+
+def make_queries(passages: List[str], count: int, seed: int) -> List[str]:
+    """A sentence (or the first words) of randomly chosen passages"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        sentences = [s.strip() for s in rng.choice(passages).split(".") if s.strip()]
+        words = rng.choice(sentences).split()
+        queries.append(" ".join(words[:rng.randint(4, 12)]))
+    return queries
+
+
+def bench_encode(model, passages: List[str], queries: List[str], batch_size: int) -> Dict:
+    model.encode(passages[:batch_size], batch_size=batch_size)  # warm up
+    started = time.perf_counter()
+    documents = np.asarray(model.encode(passages, batch_size=batch_size), dtype=np.float32)
+    encode_s = time.perf_counter() - started
+
+    latencies = []
+    for query in queries[:200]:
+        started = time.perf_counter()
+        model.encode([query])
+        latencies.append(time.perf_counter() - started)
+    query_vectors = np.asarray(model.encode(queries, batch_size=batch_size), dtype=np.float32)
+
+    return {
+        "documents": documents,
+        "queries": query_vectors,
+        "result": {
+            "passages_per_s": len(passages) / encode_s,
+            "encode_s": encode_s,
+            "query_latency": latency_summary(latencies)
+        }
+    }
+
+
+def search(documents: np.ndarray, queries: np.ndarray, dtype: str, k: int, rescore_factor: int) -> List[List[int]]:
+    """Top-k rows per query, as EmbeddedVectorStore searches a cached document"""
+    from src.services.session_index import build_partition, exact_top_k_many, rescore
+
+    ids = [str(i) for i in range(len(documents))]
+    partition = build_partition([""] * len(documents), [{}] * len(documents), documents, ids=ids, dtype=dtype)
+    if partition.is_compact and rescore_factor > 1:
+        shortlists = exact_top_k_many(partition, queries, k * rescore_factor)
+        rows = sorted({row for shortlist in shortlists for row, _ in shortlist})
+        tops = rescore(queries, shortlists, rows, documents[rows], k)
+    else:
+        tops = exact_top_k_many(partition, queries, k)
+    return [[row for row, _ in top] for top in tops]
+
+
+def recall_at_k(found: List[List[int]], truth: List[List[int]]) -> float:
+    return float(np.mean([len(set(f) & set(t)) / max(1, len(t)) for f, t in zip(found, truth)]))
+
+
+def storage_bytes(documents: np.ndarray, dtype: str) -> int:
+    from src.services.session_index import build_partition
+
+    return build_partition([""] * len(documents), [{}] * len(documents), documents, dtype=dtype).nbytes
+
+
+def chroma_bytes(documents: np.ndarray, passages: List[str]) -> int:
+    """Disk size of a cosine Chroma collection holding the vectors"""
+    import chromadb
+
+    path = tempfile.mkdtemp(prefix="filechat-bench-chroma-")
+    try:
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+        for start in range(0, len(passages), 1000):
+            collection.add(
+                ids=[str(i) for i in range(start, min(start + 1000, len(passages)))],
+                embeddings=documents[start:start + 1000],
+                documents=passages[start:start + 1000]
+            )
+        del collection, client
+        return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def run(args) -> Dict:
+    sys.path.insert(0, str(BACKEND_DIR))
+    from src.core.config import settings
+    from src.services.embedding_backend import load_embedding_model
+
+    settings.EMBEDDING_QUANTIZATION = args.quantization
+    passages = load_passages(args)
+    queries = make_queries(passages, args.queries, args.seed)
+    backends = args.backends.split(",")
+    dtypes = args.dtypes.split(",")
+    if BASELINE[0] not in backends:
+        backends.insert(0, BASELINE[0])
+
+    encoded: Dict[str, Dict] = {}
+    for backend in backends:
+        started = time.perf_counter()
+        model = load_embedding_model(args.model, backend)
+        load_s = time.perf_counter() - started
+        encoded[backend] = bench_encode(model, passages, queries, args.batch_size)
+        encoded[backend]["result"]["load_s"] = load_s
+        print(f"{backend:<12}{encoded[backend]['result']['passages_per_s']:>10.1f} passages/s")
+        del model
+
+    baseline = encoded[BASELINE[0]]
+    truth = search(baseline["documents"], baseline["queries"], BASELINE[1], args.k, 1)
+
+    results = {}
+    for backend in backends:
+        result = dict(encoded[backend]["result"])
+        documents, query_vectors = encoded[backend]["documents"], encoded[backend]["queries"]
+        result["storage"] = {}
+        for dtype in dtypes:
+            result["storage"][dtype] = {
+                f"recall@{args.k}": recall_at_k(
+                    search(documents, query_vectors, dtype, args.k, args.rescore_factor), truth
+                ),
+                f"recall@{args.k}_no_rescore": recall_at_k(
+                    search(documents, query_vectors, dtype, args.k, 1), truth
+                ),
+                "bytes": storage_bytes(documents, dtype)
+            }
+        results[backend] = result
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "out"},
+        "passages": len(passages),
+        "dimensions": int(baseline["documents"].shape[1]),
+        "backends": results,
+        "chroma_bytes": None if args.skip_chroma else chroma_bytes(baseline["documents"], passages),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def print_summary(result: Dict, k: int):
+    print(f"\n{'backend':<12}{'dtype':<9}{'passages/s':>11}{'query p50':>11}"
+          f"{'recall@' + str(k):>10}{'no rescore':>12}{'MB':>8}")
+    for backend, values in result["backends"].items():
+        for dtype, storage in values["storage"].items():
+            print(
+                f"{backend:<12}{dtype:<9}{values['passages_per_s']:>11.1f}"
+                f"{values['query_latency']['p50_ms']:>9.1f}ms"
+                f"{storage[f'recall@{k}']:>10.3f}{storage[f'recall@{k}_no_rescore']:>12.3f}"
+                f"{storage['bytes'] / 1e6:>8.2f}"
+            )
+    if result["chroma_bytes"] is not None:
+        print(f"\nChroma directory for the same vectors: {result['chroma_bytes'] / 1e6:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--dtypes", default="float32,float16,int8")
+    parser.add_argument("--quantization", default="avx2", help="onnx-int8 kernels: avx2, avx512, avx512_vnni or arm64")
+    parser.add_argument("--texts", help="passages to use instead of the synthetic corpus, one per line")
+    parser.add_argument("--passages", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=4, help="shortlist k x this for compact dtypes")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-chroma", action="store_true", help="don't measure the Chroma directory size")
+    parser.add_argument("--out", type=Path, help="result file (default: bench/results/embeddings-<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = run(args)
+    out = args.out or RESULTS_DIR / f"embeddings-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, default=str))
+
+    print_summary(result, args.k)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
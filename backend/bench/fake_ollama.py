@@ -0,0 +1,76 @@
+# backend/bench/fake_ollama.py
+"""Stand-in for Ollama's /api/generate with a controllable speed.
+
+    python -m bench.fake_ollama --port 11435 --tokens-per-s 40 --latency-ms 200
+
+`--latency-ms` models prompt prefill (time to first token) and
+`--tokens-per-s` the decode rate. Both streaming (NDJSON) and
+non-streaming replies are supported, and every reply returns a `context`
+so multi-turn requests behave like the real server.
+"""
+import argparse
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = "the document states that the value is listed in the section above".split()
+
+
+def create_app(tokens_per_s: float = 40.0, latency_ms: float = 200.0, answer_tokens: int = 48) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    app.state.requests = 0
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(answer_tokens)]
+        context = list(range(len(body.get("context") or []) + len(body["prompt"]) // 4 + answer_tokens))
+        token_delay = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+
+        if body.get("stream", True):
+            async def parts():
+                await asyncio.sleep(latency_ms / 1000)
+                for token in tokens:
+                    yield json.dumps({"model": body["model"], "response": token, "done": False}) + "\n"
+                    await asyncio.sleep(token_delay)
+                yield json.dumps({
+                    "model": body["model"], "response": "", "done": True,
+                    "context": context, "eval_count": len(tokens)
+                }) + "\n"
+
+            return StreamingResponse(parts(), media_type="application/x-ndjson")
+
+        await asyncio.sleep(latency_ms / 1000 + token_delay * len(tokens))
+        return JSONResponse({
+            "model": body["model"], "response": "".join(tokens).strip(), "done": True,
+            "context": context, "eval_count": len(tokens)
+        })
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "fake"}]}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-s", type=float, default=40.0)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=48)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        create_app(args.tokens_per_s, args.latency_ms, args.answer_tokens),
+        host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+# backend/bench/run.py
+"""Ingestion and question-answering benchmark for the backend.
+
+    cd backend
+    python -m bench.run --docs 20 --pages 10 --concurrency 8 --requests 200
+
+Serves the FastAPI app in-process (uvicorn on --app-port, so streaming
+is measured over a real socket) against a fake Ollama server
+(bench/fake_ollama.py) and, unless --mongodb-uri is given, an in-memory
+MongoDB (mongomock-motor). The embedding model and Chroma are the real
+ones. Reports ingestion docs/s and chunks/s, /chat/ask latency
+percentiles and peak RSS, and writes them to bench/results/ as JSON.
+Pass --compare with an earlier result file to print the differences.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from .corpus import FILE_TYPES, generate_corpus
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    ms = [v * 1000 for v in values]
+    return {
+        "count": len(ms),
+        "mean_ms": sum(ms) / len(ms) if ms else None,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else None
+    }
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / (1024 * 1024)
+    return {
+        "process": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+# ===== Fake Ollama =====
+
+def start_fake_ollama(args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "bench.fake_ollama",
+            "--port", str(args.ollama_port),
+            "--tokens-per-s", str(args.ollama_tokens_per_s),
+            "--latency-ms", str(args.ollama_latency_ms),
+            "--answer-tokens", str(args.ollama_answer_tokens)
+        ],
+        cwd=BACKEND_DIR
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.ollama_port}/api/tags", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Fake Ollama did not start")
+
+
+# ===== Phases =====
+
+async def bench_ingestion(client: httpx.AsyncClient, manifest: List[Dict], concurrency: int, timeout: float) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    upload_latencies = []
+
+    async def upload(item):
+        async with semaphore:
+            data = Path(item["path"]).read_bytes()
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/files/upload",
+                files={"file": (Path(item["path"]).name, data)}
+            )
+            upload_latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                return {**item, "error": f"{response.status_code} {response.text[:200]}"}
+            return {**item, "session_id": response.json()["session_id"]}
+
+    started = time.perf_counter()
+    uploaded = await asyncio.gather(*(upload(item) for item in manifest))
+
+    pending = {item["session_id"]: item for item in uploaded if "session_id" in item}
+    finished = []
+    deadline = started + timeout
+    while pending and time.perf_counter() < deadline:
+        for session_id in list(pending):
+            status = (await client.get(f"/api/files/{session_id}/status")).json()
+            if status["state"] in ("done", "failed"):
+                finished.append({**pending.pop(session_id), **status})
+        if pending:
+            await asyncio.sleep(0.25)
+    elapsed = time.perf_counter() - started
+
+    done = [item for item in finished if item["state"] == "done"]
+    chunks = sum(item.get("chunk_count") or 0 for item in done)
+    return {
+        "documents": len(manifest),
+        "bytes": sum(item["bytes"] for item in manifest),
+        "ingested": len(done),
+        "failed": [item["path"] for item in finished if item["state"] == "failed"],
+        "upload_errors": [item["error"] for item in uploaded if "error" in item],
+        "timed_out": len(pending),
+        "elapsed_s": elapsed,
+        "docs_per_s": len(done) / elapsed,
+        "chunks": chunks,
+        "chunks_per_s": chunks / elapsed,
+        "upload_latency": latency_summary(upload_latencies),
+        "sessions": [{"session_id": item["session_id"], "facts": item["facts"]} for item in done]
+    }
+
+
+async def bench_ask(client: httpx.AsyncClient, sessions: List[Dict], args) -> Dict:
+    if not sessions:
+        return {"skipped": "no ingested documents"}
+
+    templates = [
+        "What is the total of invoice {invoice}?",
+        "Who is the vendor for invoice {invoice}?",
+        "Summarize the annual budget and project risk."
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, first_token, errors = [], [], {}
+
+    async def ask(i: int):
+        session = sessions[i % len(sessions)]
+        text = templates[i % len(templates)].format(**session["facts"])
+        if not args.allow_cache:
+            text += f" (request {i})"
+        payload = {"text": text, "session_id": session["session_id"]}
+
+        async with semaphore:
+            started = time.perf_counter()
+            if args.stream:
+                async with client.stream("POST", "/api/chat/ask/stream", json=payload) as response:
+                    status = response.status_code
+                    seen_token = False
+                    async for line in response.aiter_lines():
+                        if not seen_token and line.startswith("event: token"):
+                            seen_token = True
+                            first_token.append(time.perf_counter() - started)
+            else:
+                response = await client.post("/api/chat/ask", json=payload)
+                status = response.status_code
+            elapsed = time.perf_counter() - started
+
+        if status == 200:
+            latencies.append(elapsed)
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "endpoint": "/api/chat/ask/stream" if args.stream else "/api/chat/ask",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "errors": errors,
+        "latency": latency_summary(latencies)
+    }
+    if args.stream:
+        result["time_to_first_token"] = latency_summary(first_token)
+    return result
+
+
+# ===== Runner =====
+
+async def run(args) -> Dict:
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="filechat-bench-"))
+    manifest = generate_corpus(
+        work_dir / "corpus", args.docs, args.pages, tuple(args.types.split(",")), args.seed
+    )
+
+    # Settings are read at import time, so configure before importing the app
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{args.ollama_port}"
+    if args.mongodb_uri:
+        os.environ["MONGODB_URI"] = args.mongodb_uri
+        os.environ["MONGODB_DB_NAME"] = f"file_chat_bench_{int(time.time())}"
+    # The vector store lives in ./chroma_db; keep it inside the work dir
+    os.chdir(work_dir)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from src.core.config import settings
+    from src.core.database import mongodb
+    from src.main import app
+    from src.api import files
+    from src.services.job_service import job_service
+    from src.services.vector_service import vector_service
+    from src.services.llm_service import llm_service
+    from src.services.extraction_service import extraction_service
+
+    settings.UPLOAD_PATH = work_dir / "uploads"
+    if args.mongodb_uri:
+        await mongodb.connect()
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        mongodb.client = AsyncMongoMockClient()
+        mongodb.db = mongodb.client[settings.MONGODB_DB_NAME]
+
+    ollama = start_fake_ollama(args)
+    try:
+        warmup_started = time.perf_counter()
+        await vector_service.warmup()
+        warmup_s = time.perf_counter() - warmup_started
+        job_service.start(files.process_ingestion_job, on_failure=files.ingestion_job_failed)
+
+        server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=args.app_port, lifespan="off", log_level="warning"
+        ))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            if server_task.done():
+                server_task.result()
+            await asyncio.sleep(0.05)
+
+        try:
+            limits = httpx.Limits(max_connections=max(args.concurrency, args.upload_concurrency) + 4)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{args.app_port}", timeout=300, limits=limits
+            ) as client:
+                ingestion = await bench_ingestion(client, manifest, args.upload_concurrency, args.ingest_timeout)
+                ask = await bench_ask(client, ingestion.pop("sessions"), args)
+                metrics = (await client.get("/stats")).json()
+        finally:
+            server.should_exit = True
+            await server_task
+    finally:
+        await job_service.stop()
+        await llm_service.close()
+        await vector_service.close()
+        extraction_service.close()
+        if args.mongodb_uri:
+            await mongodb.client.drop_database(settings.MONGODB_DB_NAME)
+            await mongodb.disconnect()
+        ollama.terminate()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("compare", "out")
+        },
+        "warmup_s": warmup_s,
+        "ingestion": ingestion,
+        "ask": ask,
+        "peak_rss_mb": peak_rss_mb(),
+        "stats": metrics,
+        "work_dir": str(work_dir)
+    }
+
+
+COMPARED = [
+    ("ingestion", "docs_per_s"),
+    ("ingestion", "chunks_per_s"),
+    ("ask", "requests_per_s"),
+    ("ask", "latency", "p50_ms"),
+    ("ask", "latency", "p95_ms"),
+    ("ask", "latency", "p99_ms"),
+    ("ask", "time_to_first_token", "p50_ms"),
+    ("peak_rss_mb", "process"),
+]
+
+
+def _lookup(result: Dict, path) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def print_summary(result: Dict, baseline: Optional[Dict] = None):
+    header = f"{'metric':<36}{'value':>12}"
+    if baseline:
+        header += f"{'baseline':>12}{'change':>10}"
+    print(header)
+    for path in COMPARED:
+        value = _lookup(result, path)
+        if value is None:
+            continue
+        line = f"{'.'.join(path):<36}{value:>12.1f}"
+        old = _lookup(baseline, path) if baseline else None
+        if old:
+            line += f"{old:>12.1f}{(value - old) / old * 100:>+9.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10, help="pages (or 40-row blocks) per document")
+    parser.add_argument("--types", default=",".join(FILE_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--ingest-timeout", type=float, default=1800.0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="benchmark /chat/ask/stream and time to first token")
+    parser.add_argument("--allow-cache", action="store_true", help="repeat identical questions so the answer cache hits")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--ollama-tokens-per-s", type=float, default=40.0)
+    parser.add_argument("--ollama-latency-ms", type=float, default=200.0)
+    parser.add_argument("--ollama-answer-tokens", type=int, default=48)
+    parser.add_argument("--mongodb-uri", help="use a real MongoDB (a throwaway database is created and dropped)")
+    parser.add_argument("--work-dir", help="corpus, uploads and chroma_db location (default: a temp dir)")
+    parser.add_argument("--out", type=Path, help="result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    args = parser.parse_args()
+    # run() changes into the work dir; pin user-supplied paths first
+    args.out = args.out.resolve() if args.out else None
+    args.compare = args.compare.resolve() if args.compare else None
+
+    result = asyncio.run(run(args))
+
+    out = args.out or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, default=str))
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_summary(result, baseline)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,288 @@
-from fastapi import APIRouter, HTTPException
-from ..models.chat import QuestionRequest, ChatResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ..models.chat import (
+    QuestionRequest, BatchQuestionRequest, ChatResponse, ConversationCreate, ConversationResponse
+)
 from ..core.database import mongodb
 from ..services.vector_service import vector_service
-import requests
+from ..services.llm_service import (
+    llm_service, LLMError, LLMOverloadedError, LLMTimeoutError
+)
+from ..services.cache_service import answer_cache, normalize_text, ALL_FILES_TAG
+from ..services.document_store import document_store, DocumentStatus
+from ..services.context_service import context_service, PackedContext
+from ..services.lexical_index import has_evidence, reciprocal_rank_fusion
+from ..services.digest_service import digest_service, detect_intent, format_digest, overview_text
+from ..services.conversation_service import conversation_service
+from ..core.config import settings
+from ..core.metrics import timed, stage_timings
+import asyncio
+import hashlib
+import json
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-@router.post("/ask", response_model=ChatResponse)
-async def ask_question(question: QuestionRequest):
+NO_CONTENT_ANSWER = (
+    "I can't find any readable content for the selected file yet. "
+    "It may still be processing or the document has no extractable text."
+)
+PROCESSING_ANSWER = "The selected file is still being processed. Please try again in a moment."
+FAILED_ANSWER = "The selected file could not be processed. Please try uploading it again."
+NO_TEXT_ANSWER = "The selected file has no extractable text."
+NO_RELEVANT_ANSWER = "I couldn't find relevant information in the document to answer this question."
+NO_RELEVANT_FILES_ANSWER = "I couldn't find relevant information in the selected files to answer this question."
+
+
+def _is_multi_file(question: QuestionRequest) -> bool:
+    return bool(question.session_ids or question.all_files)
+
+
+async def _resolve_files(question: QuestionRequest) -> list:
+    """File records (session_id, doc_id, filename) a multi-file question covers"""
+    projection = {"session_id": 1, "doc_id": 1, "filename": 1}
+    if question.all_files:
+        cursor = mongodb.db.files.find({}, projection).sort("_id", -1)
+    else:
+        session_ids = list(dict.fromkeys(
+            ([question.session_id] if question.session_id else []) + question.session_ids
+        ))
+        cursor = mongodb.db.files.find({"session_id": {"$in": session_ids}}, projection)
+    return await cursor.to_list(length=settings.MAX_QUERY_FILES)
+
+
+async def _retrieve_across_files(question: QuestionRequest):
+    """Search every selected file concurrently and merge into a global top-k.
+
+    Each file contributes at most CROSS_FILE_QUOTA candidates so a single
+    large file cannot crowd out the others. The query embedding is cached,
+    so it is computed once for all files.
+    """
+    targets = _unique_targets(await _resolve_files(question))
+
+    results = await asyncio.gather(*(
+        vector_service.search_similar_chunks(
+            query=question.text,
+            session_id=file_doc["session_id"],
+            limit=_cross_file_quota(),
+            doc_id=file_doc.get("doc_id"),
+            lexical_only=False
+        )
+        for file_doc in targets
+    ), return_exceptions=True)
+    return _merge_file_hits(targets, results)
+
+
+def _unique_targets(file_docs: list) -> list:
+    """Identical uploads share one set of chunks; search each once"""
+    targets = {}
+    for file_doc in file_docs:
+        targets.setdefault(file_doc.get("doc_id") or file_doc["session_id"], file_doc)
+    return list(targets.values())
+
+
+def _cross_file_quota() -> int:
+    return min(settings.CROSS_FILE_QUOTA, settings.CONTEXT_CANDIDATES)
+
+
+def _merge_file_hits(targets: list, results: list):
+    """Label per-file hits with their file and keep the global top-k"""
+    merged = []
+    for file_doc, chunks in zip(targets, results):
+        if isinstance(chunks, Exception):
+            logger.warning(f"Vector search failed for {file_doc['session_id']}: {chunks}")
+            continue
+        for chunk in chunks:
+            chunk["filename"] = file_doc["filename"]
+            chunk["session_id"] = file_doc["session_id"]
+        merged.extend(chunks)
+
+    if any("lexical_score" in c for c in merged):
+        # Per-file fused scores aren't comparable; fuse the global rankings
+        merged = reciprocal_rank_fusion(merged, settings.CONTEXT_CANDIDATES)
+    else:
+        merged.sort(key=lambda c: c.get("score", 0), reverse=True)
+        merged = merged[:settings.CONTEXT_CANDIDATES]
+    filenames = list(dict.fromkeys(c["filename"] for c in merged))
+    return merged, ", ".join(filenames) or "Selected files"
+
+
+async def _retrieve_chunks(question: QuestionRequest):
+    """Run vector search for the question, returns (chunks, filename)"""
+    if _is_multi_file(question):
+        return await _retrieve_across_files(question)
+
+    relevant_chunks = []
+    filename = "General knowledge"
+
+    if question.session_id:
+        # Identical uploads share chunks, stored under the content hash.
+        # Search errors propagate: an empty result would be misread as
+        # "nothing relevant in the document"
+        file_doc = await document_store.resolve_session(question.session_id)
+        relevant_chunks = await vector_service.search_similar_chunks(
+            query=question.text,
+            session_id=question.session_id,
+            limit=settings.CONTEXT_CANDIDATES,
+            doc_id=file_doc.get("doc_id") if file_doc else None
+        )
+
+        if relevant_chunks:
+            filename = relevant_chunks[0]["filename"]
+            if file_doc:
+                # Shared chunks carry the first uploader's filename
+                filename = file_doc["filename"]
+                for chunk in relevant_chunks:
+                    chunk["filename"] = filename
+
+    return relevant_chunks, filename
+
+
+async def _no_content_answer(session_id: str) -> str:
+    """Explain an empty search using the document's ingestion status"""
+    file_doc = await document_store.resolve_session(session_id)
+    if not file_doc or not file_doc.get("doc_id"):
+        return NO_CONTENT_ANSWER
+
+    document = await document_store.get(file_doc["doc_id"], {"status": 1, "chunk_count": 1})
+    status = document.get("status") if document else None
+    if status == DocumentStatus.PENDING:
+        return PROCESSING_ANSWER
+    if status == DocumentStatus.FAILED:
+        return FAILED_ANSWER
+    if status == DocumentStatus.READY:
+        # Search drops weak matches, so a document with chunks just had none relevant
+        return NO_RELEVANT_ANSWER if document.get("chunk_count", 0) > 0 else NO_TEXT_ANSWER
+    return NO_CONTENT_ANSWER
+
+
+async def _early_answer(question: QuestionRequest, relevant_chunks: list):
+    """Return a canned answer when the selected file has no usable context"""
+    if _is_multi_file(question):
+        if not any(has_evidence(c) for c in relevant_chunks):
+            return NO_RELEVANT_FILES_ANSWER
+        return None
+
+    # HARD STOP if no context found for selected file
+    if question.session_id and not relevant_chunks:
+        return await _no_content_answer(question.session_id)
+
+    # Filter by quality FIRST
+    high_quality_chunks = [c for c in relevant_chunks if has_evidence(c)]
+
+    if question.session_id and not high_quality_chunks:
+        return NO_RELEVANT_ANSWER
+
+    return None
+
+
+async def _load_digest(question: QuestionRequest):
+    """(digest, filename) of a single-file question's document, (None, None) if not built"""
+    if not settings.DIGEST_ENABLED or _is_multi_file(question) or not question.session_id:
+        return None, None
     try:
-        # ===== Vector Search =====
-        relevant_chunks = []
-        context = ""
-        filename = "General knowledge"
-        
-        if question.session_id:
-            try:
-                relevant_chunks = vector_service.search_similar_chunks(
-                    query=question.text,
-                    session_id=question.session_id,
-                    limit=3
-                )
-                        
-                if relevant_chunks:
-                    filename = relevant_chunks[0]["filename"] if relevant_chunks else "Unknown"
-                
-            except Exception as e:
-                logger.warning(f"Vector search failed: {e}, falling back to full text")
-
-        # HARD STOP if no context found for selected file
-        if question.session_id and not relevant_chunks:
-            return ChatResponse(
-                answer=(
-                    "I can't find any readable content for the selected file yet. "
-                    "It may still be processing or the document has no extractable text."
-                ),
-                language=question.language,
-                session_id=question.session_id,
-                sources=[]
-            )
+        file_doc = await document_store.resolve_session(question.session_id)
+        if not file_doc or not file_doc.get("doc_id"):
+            return None, None
+        return await digest_service.get(file_doc["doc_id"]), file_doc["filename"]
+    except Exception as e:
+        logger.warning(f"Digest lookup failed: {e}")
+        return None, None
 
-        # Filter by quality FIRST
-        high_quality_chunks = [c for c in relevant_chunks if c.get("score", 0) >= 0.05]
 
-        if question.session_id and not high_quality_chunks:
-            return ChatResponse(
-                answer="I couldn't find relevant information in the document to answer this question.",
-                language=question.language,
-                session_id=question.session_id,
-                sources=[]
-            )
+async def _load_overview(question: QuestionRequest) -> str:
+    """Start of the document summary, given to the model next to the excerpts"""
+    if settings.DIGEST_CONTEXT_TOKENS <= 0:
+        return ""
+    digest, _ = await _load_digest(question)
+    return overview_text(digest, settings.DIGEST_CONTEXT_TOKENS) if digest else ""
+
+
+def _digest_response(question: QuestionRequest, intent: str, digest: dict, filename: str) -> ChatResponse:
+    """Answer a summary/about/key-points question from the precomputed digest"""
+    return ChatResponse(
+        answer=format_digest(digest, intent, question.language.value),
+        language=question.language,
+        session_id=question.session_id,
+        conversation_id=question.conversation_id,
+        sources=[{
+            "source": filename,
+            "session_id": question.session_id,
+            "content_preview": digest["summary"][:100] + "...",
+            "digest": True
+        }]
+    )
+
 
-        # THEN build context from high quality chunks only
-        context = "\n\n".join([chunk["chunk_text"] for chunk in high_quality_chunks])
+async def _answer_from_digest(question: QuestionRequest, conversation=None):
+    """The digest answer for a question that asks for one, or None"""
+    intent = detect_intent(question.text)
+    if intent is None:
+        return None
+    digest, filename = await _load_digest(question)
+    if digest is None:
+        # Not built (yet): answer from retrieved chunks as usual
+        return None
+    response = _digest_response(question, intent, digest, filename)
+    await _record_turn(
+        conversation, question, response.answer,
+        conversation.get("llm_context") if conversation else None, PackedContext()
+    )
+    return response
 
-        # THEN truncate
-        max_context_chars = 3500
-        truncated = context[:max_context_chars]
-        truncation_note = "\n[NOTE: Context was truncated due to length.]" if len(context) > max_context_chars else ""
 
-        # Prepare prompt with context
-        if question.language == "ms":
-            prompt = f"""
+def _chunk_key(chunk: dict) -> str:
+    return hashlib.sha1(chunk["chunk_text"].encode("utf-8")).hexdigest()[:16]
+
+
+def _build_context(relevant_chunks: list, exclude=()) -> PackedContext:
+    high_quality_chunks = [
+        c for c in relevant_chunks
+        if has_evidence(c) and _chunk_key(c) not in exclude
+    ]
+    # Deduplicated, relevance-ordered content packed to the token budget;
+    # chunks from several files are labelled with their source
+    multi_file = len({c.get("session_id") for c in high_quality_chunks}) > 1
+    with timed("context_packing"):
+        return context_service.pack(high_quality_chunks, label_sources=multi_file)
+
+
+def _format_history(messages: list) -> str:
+    return "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+
+
+def _build_prompt(question: QuestionRequest, context: PackedContext, filename: str, history: list = (),
+                  overview: str = "") -> str:
+    truncated = context.text
+    truncation_note = "\n[NOTE: Context was truncated due to length.]" if context.truncated else ""
+    # Earlier turns go after the fixed instructions so the prompt prefix stays stable
+    history_text = _format_history(history)
+
+    # Prepare prompt with context
+    if question.language == "ms":
+        history_block = f"\n            PERBUALAN SEBELUM INI:\n{history_text}\n" if history_text else ""
+        overview_block = f"\n            GAMBARAN KESELURUHAN DOKUMEN:\n            {overview}\n" if overview else ""
+        return f"""
             Anda adalah pembantu analisis dokumen. Jawab soalan berdasarkan konteks di bawah.
-            
+
             DOKUMEN: {filename}
-            
+            {overview_block}
             KONTEKS RELEVAN:
             {truncated}{truncation_note}
-            
+            {history_block}
             SOALAN: {question.text}
-            
+
             JAWAPAN (berdasarkan konteks di atas sahaja):
             """
-        else:
-            prompt = f"""
+
+    history_block = f"\n            PREVIOUS CONVERSATION:\n{history_text}\n" if history_text else ""
+    overview_block = (
+        f"\n            DOCUMENT OVERVIEW (summary of the whole document; use the context for details):"
+        f"\n            {overview}\n"
+    ) if overview else ""
+    return f"""
             SYSTEM ROLE:
             You are a strict document analysis assistant used in production software.
 
@@ -98,67 +304,570 @@ async def ask_question(question: QuestionRequest):
 
             DOCUMENT NAME:
             {filename}
-
+            {overview_block}
             DOCUMENT CONTEXT:
             <<<BEGIN CONTEXT>>>
             {truncated}{truncation_note}
             <<<END CONTEXT>>>
-
+            {history_block}
             USER QUESTION:
             {question.text}
 
             FINAL ANSWER:
             (Answer clearly and concisely. No extra explanations.)
             """
-        
-        # Call Ollama
-        try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "mistral:latest",  # or llama3.2
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,  # ADD THIS: lower temp = less creativity = less hallucination
-                        "top_p": 0.9
-                    }
-                },
-                timeout=60  # mistral needs more time
-            )
-            
-            if response.status_code == 200:
-                answer = response.json().get("response", "No response from AI")
-            else:
-                answer = f"Ollama error: {response.status_code}"
-                
-        except requests.exceptions.ConnectionError:
-            answer = "Ollama is not running. Please start it with 'ollama serve'"
-        except Exception as e:
-            answer = f"AI error: {str(e)}"
-        
-        # Prepare sources
-        sources = []
-        if relevant_chunks:
-            for chunk in relevant_chunks[:2]:
-                sources.append({
-                    "source": chunk.get("filename", "Unknown"),
-                    "content_preview": chunk["chunk_text"][:100] + "...",
-                    "relevance_score": chunk.get("score", 0)
-                })
-        elif context:
+
+
+def _build_followup_prompt(question: QuestionRequest, context: PackedContext) -> str:
+    """Prompt for a turn that continues a previous generation's context.
+
+    The instructions and earlier excerpts are already part of that context,
+    so only new excerpts and the question are sent.
+    """
+    if question.language == "ms":
+        excerpts = context.text or "(Tiada petikan baharu; gunakan konteks dokumen sebelum ini.)"
+        return f"""
+
+            KONTEKS TAMBAHAN:
+            {excerpts}
+
+            SOALAN SUSULAN: {question.text}
+
+            JAWAPAN (berdasarkan konteks dokumen sahaja):
+            """
+
+    excerpts = context.text or "(No new excerpts; use the document context given earlier.)"
+    return f"""
+
+            ADDITIONAL DOCUMENT CONTEXT:
+            <<<BEGIN CONTEXT>>>
+            {excerpts}
+            <<<END CONTEXT>>>
+
+            FOLLOW-UP QUESTION:
+            {question.text}
+
+            FINAL ANSWER:
+            (Same rules as before. Answer clearly and concisely.)
+            """
+
+
+def _prepare_turn(question: QuestionRequest, relevant_chunks: list, filename: str, conversation,
+                  overview: str = ""):
+    """Build the prompt for a question, returns (prompt, context, llm_context)"""
+    llm_context = conversation.get("llm_context") if conversation else None
+    if llm_context:
+        # Excerpts sent in earlier turns are already in the model's context
+        context = _build_context(relevant_chunks, exclude=set(conversation.get("context_chunks", [])))
+        return _build_followup_prompt(question, context), context, llm_context
+
+    context = _build_context(relevant_chunks)
+    history = conversation["messages"][-settings.CONVERSATION_HISTORY_MESSAGES:] if conversation else ()
+    return _build_prompt(question, context, filename, history, overview), context, None
+
+
+async def _load_conversation(question: QuestionRequest):
+    if not question.conversation_id:
+        return None
+    conversation = await conversation_service.get(question.conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if question.session_id is None:
+        question.session_id = conversation.get("session_id")
+    elif question.session_id != conversation.get("session_id"):
+        raise HTTPException(status_code=400, detail="Conversation belongs to a different file")
+    return conversation
+
+
+async def _record_turn(conversation, question: QuestionRequest, answer: str, llm_context, context: PackedContext):
+    if conversation is None:
+        return
+    try:
+        await conversation_service.record_turn(
+            conversation, question.text, answer, llm_context,
+            [_chunk_key(c) for c in context.chunks]
+        )
+    except Exception as e:
+        logger.error(f"Failed to save conversation turn: {e}")
+
+
+def _build_sources(relevant_chunks: list, context: PackedContext, filename: str) -> list:
+    sources = []
+    if context.chunks:
+        # Across files, cite every chunk the answer was given
+        cited = context.chunks if len({c.get("session_id") for c in context.chunks}) > 1 else context.chunks[:2]
+        for chunk in cited:
             sources.append({
-                "source": filename,
-                "content_preview": context[:100] + "..." if context else "No content"
+                "source": chunk.get("filename", "Unknown"),
+                "session_id": chunk.get("session_id"),
+                "content_preview": chunk["chunk_text"][:100] + "...",
+                "relevance_score": chunk.get("score", 0)
             })
-        
+    elif context.text:
+        sources.append({
+            "source": filename,
+            "content_preview": context.text[:100] + "..."
+        })
+    return sources
+
+
+def _answer_cache_key(question: QuestionRequest) -> tuple:
+    return (
+        question.session_id,
+        tuple(sorted(set(question.session_ids or []))),
+        question.all_files,
+        normalize_text(question.text),
+        question.language.value,
+        llm_service.model,
+        settings.CONTEXT_CANDIDATES,
+        settings.CONTEXT_TOKEN_BUDGET
+    )
+
+
+def _answer_tags(question: QuestionRequest) -> list:
+    tags = [question.session_id] if question.session_id else []
+    tags += question.session_ids or []
+    if question.all_files:
+        tags.append(ALL_FILES_TAG)
+    return tags
+
+
+def _answer_generation(question: QuestionRequest) -> int:
+    """Taken before retrieval, so an answer computed across an invalidation is not cached"""
+    return answer_cache.generation(_answer_cache_key(question), _answer_tags(question))
+
+
+def _cache_answer(question: QuestionRequest, response: ChatResponse, generation: Optional[int]):
+    answer_cache.set(_answer_cache_key(question), response, tags=_answer_tags(question), generation=generation)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _overloaded(e: LLMOverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+@router.post("/ask", response_model=ChatResponse)
+async def ask_question(question: QuestionRequest):
+    try:
+        conversation = await _load_conversation(question)
+        if conversation is not None:
+            # Answers depend on the conversation so far; not cacheable
+            return await _answer_question(question, conversation)
+
+        key = _answer_cache_key(question)
+        cached = answer_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Identical concurrent questions share one retrieval + generation
+        return await answer_cache.single_flight(
+            key, lambda: _answer_question(question), tags=_answer_tags(question)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _answer_question(question: QuestionRequest, conversation=None) -> ChatResponse:
+    generation = _answer_generation(question)
+    # "Summarize this document" and the like are answered before any search
+    digest_answer = await _answer_from_digest(question, conversation)
+    if digest_answer is not None:
+        return digest_answer
+
+    # ===== Vector Search =====
+    (relevant_chunks, filename), overview = await asyncio.gather(
+        _retrieve_chunks(question), _load_overview(question)
+    )
+    return await _answer_from_chunks(question, relevant_chunks, filename, conversation, overview, generation)
+
+
+async def _answer_from_chunks(question: QuestionRequest, relevant_chunks: list, filename: str,
+                              conversation=None, overview: str = "",
+                              generation: Optional[int] = None) -> ChatResponse:
+    early_answer = await _early_answer(question, relevant_chunks)
+    if early_answer:
+        await _record_turn(
+            conversation, question, early_answer,
+            conversation.get("llm_context") if conversation else None, PackedContext()
+        )
         return ChatResponse(
-            answer=answer,
+            answer=early_answer,
             language=question.language,
             session_id=question.session_id,
-            sources=sources
+            conversation_id=question.conversation_id,
+            sources=[]
         )
-        
+
+    prompt, context, llm_context = _prepare_turn(question, relevant_chunks, filename, conversation, overview)
+
+    # Call Ollama
+    cacheable = False
+    result = {}
+    try:
+        result = await llm_service.generate(prompt, context=llm_context)
+        answer = result.get("response", "No response from AI")
+        cacheable = "response" in result
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMError as e:
+        answer = str(e)
     except Exception as e:
-        logger.error(f"Chat error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        answer = f"AI error: {str(e)}"
+
+    response = ChatResponse(
+        answer=answer,
+        language=question.language,
+        session_id=question.session_id,
+        conversation_id=question.conversation_id,
+        sources=_build_sources(relevant_chunks, context, filename)
+    )
+    if conversation is not None:
+        await _record_turn(conversation, question, answer, result.get("context"), context)
+    elif cacheable:
+        _cache_answer(question, response, generation)
+    return response
+
+
+async def _retrieve_batch(questions: list) -> list:
+    """Retrieval for many questions over the same file(s).
+
+    All questions are encoded in one batch and each file is searched once
+    for all of them. Returns (chunks, filename) per question.
+    """
+    if not questions:
+        return []
+    embeddings = await vector_service.embed_queries([q.text for q in questions])
+    template = questions[0]
+
+    if _is_multi_file(template):
+        targets = _unique_targets(await _resolve_files(template))
+        per_file = await asyncio.gather(*(
+            vector_service.search_similar_chunks_many(
+                embeddings,
+                session_id=file_doc["session_id"],
+                limit=_cross_file_quota(),
+                doc_id=file_doc.get("doc_id"),
+                queries=[q.text for q in questions]
+            )
+            for file_doc in targets
+        ), return_exceptions=True)
+        return [
+            _merge_file_hits(targets, [
+                hits if isinstance(hits, Exception) else hits[i]
+                for hits in per_file
+            ])
+            for i in range(len(questions))
+        ]
+
+    if not template.session_id:
+        return [([], "General knowledge") for _ in questions]
+
+    file_doc = await document_store.resolve_session(template.session_id)
+    results = await vector_service.search_similar_chunks_many(
+        embeddings,
+        session_id=template.session_id,
+        limit=settings.CONTEXT_CANDIDATES,
+        doc_id=file_doc.get("doc_id") if file_doc else None,
+        queries=[q.text for q in questions]
+    )
+
+    retrieved = []
+    for chunks in results:
+        filename = "General knowledge"
+        if chunks:
+            # Shared chunks carry the first uploader's filename
+            filename = file_doc["filename"] if file_doc else chunks[0]["filename"]
+            for chunk in chunks:
+                chunk["filename"] = filename
+        retrieved.append((chunks, filename))
+    return retrieved
+
+
+async def _answer_batch_question(question: QuestionRequest, relevant_chunks: list, filename: str,
+                                 slots: asyncio.Semaphore, overview: str = "",
+                                 generation: Optional[int] = None) -> ChatResponse:
+    """Answer one question of a batch, waiting out a full generation queue"""
+    early_answer = await _early_answer(question, relevant_chunks)
+    if early_answer:
+        return ChatResponse(answer=early_answer, language=question.language,
+                            session_id=question.session_id, sources=[])
+
+    for attempt in range(settings.BATCH_LLM_RETRIES + 1):
+        async with slots:
+            try:
+                return await _answer_from_chunks(
+                    question, relevant_chunks, filename, overview=overview, generation=generation
+                )
+            except HTTPException as e:
+                # Other traffic filled the queue; back off instead of failing
+                if e.status_code != 503 or attempt == settings.BATCH_LLM_RETRIES:
+                    raise
+                retry_after = int((e.headers or {}).get("Retry-After", 5))
+        await asyncio.sleep(retry_after)
+
+
+@router.post("/ask/batch")
+async def ask_batch(batch: BatchQuestionRequest, request: Request):
+    """Answer many questions about the same file(s), streamed as NDJSON.
+
+    One line per question, in completion order, with its `index` in the
+    request: `{"index", "question", "answer", "sources", "cached"}` or
+    `{"index", "question", "error", "status"}`. A final `{"done": true}`
+    line carries totals and per-stage timings in milliseconds. Questions are
+    encoded and searched together; generations run at most
+    `BATCH_LLM_CONCURRENCY` at a time.
+    """
+    started = asyncio.get_running_loop().time()
+    questions = [
+        QuestionRequest(
+            text=text,
+            session_id=batch.session_id,
+            session_ids=batch.session_ids,
+            all_files=batch.all_files,
+            language=batch.language
+        )
+        for text in batch.questions
+    ]
+
+    cached = {}
+    for index, question in enumerate(questions):
+        response = answer_cache.get(_answer_cache_key(question))
+        if response is not None:
+            cached[index] = response
+    # Every question is about the same file(s): one digest lookup serves all
+    digest, digest_filename = await _load_digest(questions[0])
+    intents = {index: detect_intent(question.text) for index, question in enumerate(questions)} if digest else {}
+    overview = overview_text(digest, settings.DIGEST_CONTEXT_TOKENS) if digest and settings.DIGEST_CONTEXT_TOKENS > 0 else ""
+    pending = [index for index in range(len(questions)) if index not in cached and not intents.get(index)]
+    generations = {index: _answer_generation(questions[index]) for index in pending}
+
+    try:
+        retrieved = dict(zip(pending, await _retrieve_batch([questions[i] for i in pending])))
+    except Exception as e:
+        logger.error(f"Batch retrieval error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    slots = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY or settings.OLLAMA_MAX_CONCURRENCY)
+
+    async def answer(index: int):
+        question = questions[index]
+        line = {"index": index, "question": question.text}
+        try:
+            chunks, filename = retrieved[index]
+            # Repeated questions (in this batch or from /ask) share one answer
+            response = await answer_cache.single_flight(
+                _answer_cache_key(question),
+                lambda: _answer_batch_question(question, chunks, filename, slots, overview, generations[index]),
+                tags=_answer_tags(question)
+            )
+            line.update(answer=response.answer, sources=response.sources, cached=False)
+        except HTTPException as e:
+            line.update(error=e.detail, status=e.status_code)
+        except Exception as e:
+            logger.error(f"Batch question {index} failed: {e}")
+            line.update(error=str(e), status=500)
+        return line
+
+    async def lines():
+        errors = 0
+        for index, response in cached.items():
+            yield json.dumps({
+                "index": index, "question": questions[index].text,
+                "answer": response.answer, "sources": response.sources, "cached": True
+            }) + "\n"
+        for index, intent in intents.items():
+            if intent and index not in cached:
+                response = _digest_response(questions[index], intent, digest, digest_filename)
+                yield json.dumps({
+                    "index": index, "question": questions[index].text,
+                    "answer": response.answer, "sources": response.sources, "cached": False
+                }) + "\n"
+
+        tasks = [asyncio.create_task(answer(index)) for index in pending]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                errors += "error" in line
+                yield json.dumps(line) + "\n"
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling batch")
+                    return
+            yield json.dumps({
+                "done": True,
+                "questions": len(questions),
+                "cached": len(cached),
+                "errors": errors,
+                "seconds": round(asyncio.get_running_loop().time() - started, 3),
+                "timings": stage_timings()
+            }) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(question: QuestionRequest, request: Request):
+    """Stream the answer as Server-Sent Events.
+
+    Emits one `sources` event, then a `token` event per generated fragment,
+    and finally a `done` (or `error`) event. A generated answer's `done`
+    carries per-stage timings in milliseconds, including the LLM stages that
+    run after Server-Timing was sent. Closing the connection cancels the
+    upstream Ollama generation.
+    """
+    conversation = await _load_conversation(question)
+    cached = answer_cache.get(_answer_cache_key(question)) if conversation is None else None
+    if cached is not None:
+        async def cached_stream():
+            yield _sse("sources", {"sources": cached.sources, "session_id": question.session_id})
+            yield _sse("token", {"text": cached.answer})
+            yield _sse("done", {"language": question.language, "cached": True})
+
+        return StreamingResponse(
+            cached_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    digest_answer = await _answer_from_digest(question, conversation)
+    if digest_answer is not None:
+        async def digest_stream():
+            yield _sse("sources", {"sources": digest_answer.sources, "session_id": question.session_id})
+            yield _sse("token", {"text": digest_answer.answer})
+            yield _sse("done", {"language": question.language, "conversation_id": question.conversation_id})
+
+        return StreamingResponse(
+            digest_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    generation = _answer_generation(question)
+    try:
+        (relevant_chunks, filename), overview = await asyncio.gather(
+            _retrieve_chunks(question), _load_overview(question)
+        )
+    except Exception as e:
+        logger.error(f"Chat stream retrieval error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    early_answer = await _early_answer(question, relevant_chunks)
+    prompt, context, llm_context = None, PackedContext(), None
+    if not early_answer:
+        prompt, context, llm_context = _prepare_turn(question, relevant_chunks, filename, conversation, overview)
+
+    if not early_answer:
+        # Reject before the 200 is sent when the generation queue is full
+        try:
+            llm_service.ensure_capacity()
+        except LLMOverloadedError as e:
+            raise _overloaded(e)
+
+    async def event_stream():
+        if early_answer:
+            await _record_turn(
+                conversation, question, early_answer,
+                conversation.get("llm_context") if conversation else None, context
+            )
+            yield _sse("sources", {"sources": [], "session_id": question.session_id})
+            yield _sse("token", {"text": early_answer})
+            yield _sse("done", {"language": question.language, "conversation_id": question.conversation_id})
+            return
+
+        sources = _build_sources(relevant_chunks, context, filename)
+        yield _sse("sources", {"sources": sources, "session_id": question.session_id})
+
+        stream = llm_service.stream_generate(prompt, context=llm_context)
+        answer_parts = []
+        final_context = None
+        try:
+            async for part in stream:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling generation")
+                    return
+                if part.get("response"):
+                    answer_parts.append(part["response"])
+                    yield _sse("token", {"text": part["response"]})
+                if part.get("done"):
+                    final_context = part.get("context")
+
+            answer = "".join(answer_parts)
+            if conversation is not None:
+                await _record_turn(conversation, question, answer, final_context, context)
+            else:
+                _cache_answer(question, ChatResponse(
+                    answer=answer,
+                    language=question.language,
+                    session_id=question.session_id,
+                    sources=sources
+                ), generation)
+            yield _sse("done", {
+                "language": question.language,
+                "conversation_id": question.conversation_id,
+                "timings": stage_timings()
+            })
+
+        except LLMOverloadedError as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except LLMError as e:
+            yield _sse("error", {"detail": str(e)})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _sse("error", {"detail": f"AI error: {str(e)}"})
+        finally:
+            # Closes the upstream connection, which makes Ollama abort the generation
+            await stream.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/conversations", response_model=ConversationResponse)
+async def start_conversation(request: ConversationCreate):
+    """Start a conversation; pass its id as `conversation_id` on follow-up questions"""
+    if request.session_id and not await document_store.resolve_session(request.session_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    conversation = await conversation_service.start(request.session_id, request.language)
+    return _conversation_response(conversation)
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
+async def get_conversation(conversation_id: str):
+    """Message history of a conversation"""
+    conversation = await conversation_service.get(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return _conversation_response(conversation)
+
+
+def _conversation_response(conversation: dict) -> ConversationResponse:
+    return ConversationResponse(
+        conversation_id=conversation["_id"],
+        session_id=conversation.get("session_id"),
+        language=conversation["language"],
+        turns=conversation.get("turns", 0),
+        messages=conversation.get("messages", []),
+        created_at=conversation["created_at"]
+    )
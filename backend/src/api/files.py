@@ -1,182 +1,370 @@
 # backend/src/api/files.py
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
 import os
 import uuid
-from datetime import datetime  # Only import once!
+import hashlib
+from datetime import datetime, timedelta  # Only import once!
 from ..core.config import settings
 from ..core.database import mongodb
-from ..models.file import FileCreate
+from ..models.file import FileCreate, FileType, BulkDeleteRequest
 from ..services.vector_service import vector_service
+from ..services.cache_service import answer_cache, ALL_FILES_TAG
+from ..services.document_store import document_store, DocumentStatus, DocumentBusyError
+from ..services.extraction_service import extraction_service
+from ..services.job_service import job_service, JobState
+from ..services.cleanup_service import cleanup_service
+from ..services.text_store import text_store
+from ..services.index_registry import index_registry
+from ..services.reindex_service import reindex_service
+from ..services.digest_service import digest_service
+from ..core.metrics import INGESTED_DOCUMENTS, timed
 import aiofiles
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
-async def extract_text_from_file(file_path: str, filename: str) -> str:
-    """Process different file types to extract text"""
-    import os
-    
-    _, file_extension = os.path.splitext(filename)
-    file_extension = file_extension.lower()
-    
-    try:
-        if file_extension == ".pdf":
-            import pdfplumber
-            text = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text.strip()
-            
-        elif file_extension == ".txt":
-            with open(file_path, "r", encoding='utf-8') as f:
-                return f.read()
-                
-        elif file_extension == ".docx":
-            from docx import Document
-            doc = Document(file_path)
-            return "\n".join([para.text for para in doc.paragraphs])
-            
-        elif file_extension in [".xlsx", ".xls"]:
-            import pandas as pd
-            df = pd.read_excel(file_path)
-            text = "Excel File Contents:\n\n"
-            if isinstance(df, dict):
-                for sheet_name, sheet_df in df.items():
-                    text += f"\nSheet: {sheet_name}\n"
-                    text += sheet_df.to_string(index=False) + "\n"
-            else:
-                text += df.to_string(index=False)
-            return text.strip()
-            
-        else:
-            return f"Unsupported file type: {file_extension}"
-            
-    except Exception as e:
-        print(f"❌ Error processing {filename}: {e}")
-        return f"Error processing file: {str(e)}"
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Multipart framing around the file: boundaries, part headers, small fields
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+LIST_PROJECTION = {
+    "session_id": 1, "filename": 1, "original_filename": 1, "file_type": 1,
+    "file_size": 1, "content_hash": 1, "doc_id": 1, "created_at": 1, "updated_at": 1,
+    "expires_at": 1
+}
+
+def upload_too_large(content_length: Optional[str]) -> bool:
+    """Whether a request's Content-Length rules out an acceptable upload.
+
+    Checked before the form is parsed: FastAPI spools the whole multipart
+    body to a temporary file before the endpoint runs.
+    """
+    if not content_length or not content_length.isdigit():
+        return False
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    return int(content_length) > max_bytes + UPLOAD_FORM_OVERHEAD
 
-async def process_uploaded_file(file_path: str, filename: str, session_id: str):
-    """Process uploaded file and store in MongoDB"""
+async def save_upload_stream(file: UploadFile, file_path) -> tuple:
+    """Stream an upload to disk in fixed-size chunks, returns (size, sha256 hex)"""
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    digest = hashlib.sha256()
+    size = 0
     try:
-        # Extract text based on file type
-        text_content = await extract_text_from_file(file_path, filename)
-        
-        # DEBUG: Print extracted text
-        print(f"\n📄 DEBUG - Extracted {len(text_content)} chars from {filename}")
-        print(f"First 500 chars: {text_content[:500]}\n")
-        
-        # Store file metadata in MongoDB
-        file_data = FileCreate(
-            filename=filename,
-            original_filename=filename,
-            file_type=filename.split('.')[-1].lower(),
-            file_size=os.path.getsize(file_path),
-            session_id=session_id,
-            text_content=text_content
-        )
-        
-        result = await mongodb.db.files.insert_one({
-            **file_data.dict(),
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        })
-        
-        # ===== Create vector embeddings =====
-        try:
-            metadata = {
-                "session_id": session_id,
-                "filename": filename,
-                "file_id": str(result.inserted_id),
-                "original_text_length": len(text_content)
-            }
-            
-            chunk_ids = vector_service.create_chunks_and_embeddings(text_content, metadata)
-            print(f"✅ Created {len(chunk_ids)} vector embeddings for {filename}")
-        except Exception as e:
-            print(f"⚠️ Vector embedding failed (but file stored): {e}")
-        # ===================================
-        
-        print(f"✅ File processed and stored: {filename}")
-        return str(result.inserted_id)
-        
-    except Exception as e:
-        print(f"❌ Error processing file: {e}")
+        async with aiofiles.open(file_path, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {settings.MAX_FILE_SIZE_MB}MB)"
+                    )
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        # Don't leave partial uploads behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
         raise
+    return size, digest.hexdigest()
+
+async def process_ingestion_job(job: dict):
+    """Extract, chunk and embed an uploaded document (runs on a job worker)"""
+    payload = job["payload"]
+    file_path = payload["file_path"]
+    filename = payload["filename"]
+    content_hash = job["doc_id"]
+    
+    if job["attempts"] > 1:
+        # Retry or resumed after a crash: drop chunks from the partial attempt
+        await vector_service.delete_document_chunks(content_hash)
+    
+    # ===== Extract and embed as a stream of pages/sections =====
+    # Extraction runs in a process pool; each record is chunked and
+    # embedded as soon as it arrives, and its text is streamed to the
+    # compressed text store instead of building one giant string
+    text_writer = await text_store.open_writer(content_hash)
+    
+    async def record_texts():
+        record_count = 0
+        async for record in extraction_service.iter_records(file_path, filename):
+            if record_count:
+                await text_writer.write("\n")
+            await text_writer.write(record["text"])
+            record_count += 1
+            await job_service.update_progress(job, records=record_count)
+            yield record["text"]
+        # Extraction finished; the last batches are still being embedded
+        await job_service.update_progress(job, state=JobState.EMBEDDING, records=record_count)
+    
+    started = asyncio.get_running_loop().time()
+    
+    async def on_chunks(count: int):
+        elapsed = max(asyncio.get_running_loop().time() - started, 1e-9)
+        await job_service.update_progress(
+            job, chunks=count, chunks_per_s=round(count / elapsed, 1)
+        )
+    
+    metadata = {
+        "doc_id": content_hash,
+        "session_id": job["session_id"],
+        "filename": filename,
+        "file_id": payload["file_id"]
+    }
+    # index_records pins the store it starts with; no await in between
+    version = vector_service.version
+    with timed("ingestion"):
+        chunk_count = await vector_service.index_records(record_texts(), metadata, on_progress=on_chunks)
+        text_chars = await text_writer.close()
+    logger.debug("Extracted %d chars from %s", text_chars, filename)
+    
+    await job_service.update_progress(job, force=True, chunks=chunk_count)
+    if not await document_store.mark_ready(content_hash, text_chars, chunk_count):
+        # Every session was deleted while this ran; nothing references the output
+        logger.info(f"🗑️ {filename} was deleted during ingestion, discarding it")
+        await cleanup_service.purge_document(content_hash, file_path)
+        return
+    # Re-index catch-up skips documents the version already holds
+    await index_registry.mark_built(version.name, content_hash, chunk_count)
+    active = await index_registry.active_version()
+    if active != version:
+        # The alias moved while this ran, possibly after the catch-ups of the
+        # switch: the active version must get the document too
+        logger.info(f"🔀 {filename} was ingested into {version.name}, indexing it into {active.name}")
+        await reindex_service.index_document(active, content_hash)
+    INGESTED_DOCUMENTS.inc(status="ready")
+    logger.info(f"✅ File processed and stored: {filename} ({chunk_count} chunks)")
+    # Summary and key points are built in the background, at low priority
+    digest_service.notify()
+
+async def ingestion_job_failed(job: dict, error: Exception):
+    """Called once a job has used up all its attempts"""
+    logger.error(f"❌ Error processing file: {error}")
+    INGESTED_DOCUMENTS.inc(status="failed")
+    await document_store.mark_failed(job["doc_id"], str(error))
 
 @router.post("/upload")
-async def upload_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
-):
+async def upload_file(file: UploadFile = File(...)):
     """Handle file upload"""
     try:
+        # Refuse unsupported types before anything is saved or claimed
+        file_extension = os.path.splitext(file.filename)[1].lower()
+        try:
+            file_type = FileType.from_extension(file_extension)
+        except ValueError:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported file type: {file_extension or 'no extension'}"
+            )
+        
         # Generate unique session ID
         session_id = str(uuid.uuid4())
         
         # Create uploads directory if not exists
         os.makedirs(settings.UPLOAD_PATH, exist_ok=True)
         
-        # Save file
-        file_extension = os.path.splitext(file.filename)[1]
-        file_path = settings.UPLOAD_PATH / f"{session_id}{file_extension}"
-        
-        # Read file content
-        content = await file.read()
+        # Save file under the session id until its content hash is known
+        upload_path = settings.UPLOAD_PATH / f"{session_id}{file_extension}"
         
-        # Check file size (50MB limit)
-        if len(content) > 50 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File too large (max 50MB)")
+        # Stream to disk in bounded chunks, hashing as we go. Announced
+        # oversized bodies were refused before parsing (upload_too_large);
+        # this also caps chunked ones
+        file_size, content_hash = await save_upload_stream(file, upload_path)
         
-        # Save file asynchronously
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
+        # Content-addressed storage: identical uploads share one stored file,
+        # one extraction and one set of vector chunks
+        stored_path = settings.UPLOAD_PATH / f"{content_hash}{file_extension}"
+        try:
+            document, is_new_document = await document_store.acquire(
+                content_hash, str(stored_path), file_size
+            )
+        except DocumentBusyError:
+            # The same content is still being purged from an earlier delete
+            os.remove(upload_path)
+            raise HTTPException(
+                status_code=503,
+                detail="An identical file is being deleted, please retry shortly",
+                headers={"Retry-After": "5"}
+            )
+        if is_new_document:
+            os.replace(upload_path, stored_path)
+        else:
+            os.remove(upload_path)
+        # A previous failed ingestion of the same content is retried
+        needs_processing = is_new_document or document.get("status") == DocumentStatus.FAILED
+        if needs_processing and not is_new_document:
+            await document_store.mark_pending(content_hash)
         
-        # Process file in background
-        background_tasks.add_task(
-            process_uploaded_file,
-            str(file_path),
-            file.filename,
-            session_id
+        # Store file metadata in MongoDB; the extracted text and vector chunks
+        # live on the shared document record keyed by content hash
+        file_data = FileCreate(
+            filename=file.filename,
+            original_filename=file.filename,
+            file_type=file_type,
+            file_size=file_size,
+            session_id=session_id,
+            content_hash=content_hash
         )
+        now = datetime.now()
+        expires_at = now + timedelta(hours=settings.SESSION_TTL_HOURS) if settings.SESSION_TTL_HOURS > 0 else None
+        result = await mongodb.db.files.insert_one({
+            **file_data.dict(),
+            "doc_id": content_hash,
+            "file_path": document["file_path"],
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": expires_at
+        })
+        
+        # Answers across all files may change once this one is searchable
+        answer_cache.invalidate_tag(ALL_FILES_TAG)
+        
+        # Queue extraction + embedding on the ingestion workers
+        if needs_processing:
+            await job_service.enqueue(session_id, content_hash, {
+                "file_path": document["file_path"],
+                "filename": file.filename,
+                "file_id": str(result.inserted_id)
+            })
+        else:
+            logger.info(f"♻️ Reusing existing extraction and embeddings for {file.filename}")
         
         return {
             "status": "success",
             "session_id": session_id,
             "filename": file.filename,
+            "file_size": file_size,
+            "content_hash": content_hash,
+            "deduplicated": not is_new_document,
+            "expires_at": expires_at,
             "message": "File uploaded successfully. Processing in background..."
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Upload failed: {str(e)}")
+        logger.error(f"❌ Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.get("")
+async def list_files(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """List uploaded files, newest first, without their extracted text"""
+    query = {}
+    if cursor:
+        try:
+            query["_id"] = {"$lt": ObjectId(cursor)}
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    file_docs = await mongodb.db.files.find(query, LIST_PROJECTION).sort("_id", -1).limit(limit).to_list(length=limit)
+    
+    # One lookup for the processing status of the whole page
+    documents = await document_store.get_many(
+        {f["doc_id"] for f in file_docs if f.get("doc_id")},
+        {"status": 1, "chunk_count": 1}
+    )
+    
+    files = []
+    for file_doc in file_docs:
+        document = documents.get(file_doc.pop("doc_id", None)) or {}
+        files.append({
+            **file_doc,
+            "_id": str(file_doc["_id"]),
+            "status": document.get("status", DocumentStatus.READY),
+            "chunk_count": document.get("chunk_count")
+        })
+    
+    next_cursor = files[-1]["_id"] if len(files) == limit else None
+    return {"files": files, "next_cursor": next_cursor}
+
+@router.get("/{session_id}/status")
+async def get_file_status(session_id: str):
+    """Processing state of a session's file"""
+    file_doc = await mongodb.db.files.find_one(
+        {"session_id": session_id},
+        {"doc_id": 1, "filename": 1}
+    )
+    if file_doc is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    doc_id = file_doc.get("doc_id")
+    if not doc_id:
+        # Uploaded before ingestion jobs existed
+        return {"session_id": session_id, "filename": file_doc["filename"], "state": JobState.DONE}
+    
+    document = await document_store.get(doc_id, {"status": 1, "chunk_count": 1, "error": 1, "digest.status": 1})
+    job = await job_service.latest_for_document(doc_id)
+    
+    if job is not None:
+        state = job["state"]
+        progress = job.get("progress", {})
+        error = job.get("error")
+        attempts = job.get("attempts", 0)
+    else:
+        state = JobState.DONE if document and document.get("status") == DocumentStatus.READY else JobState.QUEUED
+        progress = {}
+        error = document.get("error") if document else None
+        attempts = 0
+    
+    return {
+        "session_id": session_id,
+        "filename": file_doc["filename"],
+        "state": state,
+        "progress": progress,
+        "chunk_count": document.get("chunk_count", 0) if document else 0,
+        "attempts": attempts,
+        "error": error,
+        "digest": document.get("digest", {}).get("status") if document else None
+    }
+
+@router.get("/{session_id}/digest")
+async def get_file_digest(session_id: str):
+    """Precomputed summary and key points of a session's file"""
+    file_doc = await document_store.resolve_session(session_id)
+    if file_doc is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    document = await document_store.get(file_doc["doc_id"], {"digest": 1}) if file_doc.get("doc_id") else None
+    digest = document.get("digest") if document else None
+    if not digest:
+        raise HTTPException(status_code=404, detail="No digest for this file")
+    digest.pop("lease_until", None)
+    return {"session_id": session_id, "filename": file_doc["filename"], **digest}
+
 @router.delete("/{session_id}")
 async def delete_file(session_id: str):
     """Delete a file by session ID"""
     try:
-        # Delete from MongoDB files collection
-        result = await mongodb.db.files.delete_one({"session_id": session_id})
-        
-        if result.deleted_count == 0:
+        if not await cleanup_service.delete_session(session_id):
             raise HTTPException(status_code=404, detail="File not found")
-        
-        # Delete vector embeddings
-        try:
-            vector_service.delete_session_chunks(session_id)
-        except Exception as e:
-            print(f"⚠️ Failed to delete vector embeddings: {e}")
-        
-        # Delete uploaded file
-        upload_dir = settings.UPLOAD_PATH
-        for file in os.listdir(upload_dir):
-            if file.startswith(session_id):
-                os.remove(os.path.join(upload_dir, file))
-                break
-        
         return {"status": "success", "message": "File and embeddings deleted successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk-delete")
+async def bulk_delete_files(request: BulkDeleteRequest):
+    """Delete several files by session ID; unknown IDs are reported, not an error"""
+    try:
+        deleted = await cleanup_service.delete_sessions(request.session_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    found = set(deleted)
+    return {
+        "status": "success",
+        "deleted": deleted,
+        "not_found": [session_id for session_id in dict.fromkeys(request.session_ids) if session_id not in found]
+    }
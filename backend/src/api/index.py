@@ -0,0 +1,68 @@
+# backend/src/api/index.py
+from fastapi import APIRouter, HTTPException
+from ..models.index import IndexBuildRequest
+from ..services.index_registry import index_registry
+from ..services.reindex_service import reindex_service, new_version
+from ..services.vector_service import vector_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/index", tags=["index"])
+
+
+@router.get("")
+async def list_indexes():
+    """Index versions, their build progress and which one is active"""
+    active = await index_registry.active_version()
+    return {
+        "active": active.name,
+        "serving": vector_service.version.name,
+        "building": reindex_service.current,
+        "versions": [
+            {**record, "name": record.pop("_id")}
+            for record in await index_registry.list()
+        ]
+    }
+
+
+@router.post("/builds", status_code=202)
+async def start_build(request: IndexBuildRequest):
+    """Re-chunk and re-embed every document into a new index version.
+
+    Runs in the background; poll GET /index for progress. Starting a build
+    with the name of an unfinished one resumes it.
+    """
+    version = new_version(request.name, request.model, request.chunk_size, request.chunk_overlap, request.backend)
+    try:
+        # Validate the name and spec before answering
+        await index_registry.create(version)
+        reindex_service.start_build(version, workers=request.workers, activate=request.activate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "started", "name": version.name, **version.spec()}
+
+
+@router.post("/{name}/activate")
+async def activate_index(name: str):
+    """Point the index alias at a built version"""
+    try:
+        return await reindex_service.activate(name)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/{name}")
+async def drop_index(name: str):
+    """Delete an inactive index version and its collection"""
+    try:
+        await reindex_service.drop(name)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "message": f"Index {name} dropped"}
@@ -10,6 +10,7 @@ class Settings(BaseSettings):
     PORT: int = 8000
     HOST: str = "0.0.0.0"
     ENVIRONMENT: str = "development"
+    LOG_LEVEL: str = "INFO"                   # DEBUG adds per-query search details
     CORS_ORIGINS: str = "http://localhost:3000"    
     
     # MongoDB
@@ -22,7 +23,104 @@ class Settings(BaseSettings):
     
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
-    OLLAMA_MODEL: str = "phi:latest"
+    OLLAMA_MODEL: str = "mistral:latest"
+    OLLAMA_MAX_CONCURRENCY: int = 2       # generations running at once
+    OLLAMA_MAX_QUEUE: int = 16            # requests allowed to wait for a slot
+    OLLAMA_QUEUE_TIMEOUT_S: float = 10.0  # max wait for a slot before 503
+    OLLAMA_REQUEST_TIMEOUT_S: float = 60.0
+    OLLAMA_KEEP_ALIVE: str = "30m"            # keep the model (and its KV cache) loaded between turns
+    
+    # Extraction / ingestion
+    EXTRACTION_WORKERS: int = 0              # processes; 0 = one per CPU core
+    EXTRACTION_PAGES_PER_TASK: int = 16      # PDF pages per parallel task
+    INGEST_BATCH_SIZE: int = 64              # chunks embedded and written together
+    INGESTION_WORKERS: int = 2               # documents ingested concurrently
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_S: float = 10.0  # doubled on each retry
+    INGESTION_LEASE_S: float = 120.0         # a job silent this long is reclaimed
+    INGESTION_POLL_S: float = 2.0
+    
+    # Index version used until an alias is set (see src/reindex.py)
+    VECTOR_COLLECTION: str = "document_chunks"
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    CHUNK_SIZE: int = 300                     # words per chunk
+    CHUNK_OVERLAP: int = 50
+    INDEX_REFRESH_S: float = 30.0             # how often workers check which index version is active
+    REINDEX_WORKERS: int = 4                  # documents re-indexed concurrently
+    
+    # Embeddings
+    EMBEDDING_WORKERS: int = 1               # threads running encode()
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0   # how long a query waits for company
+    EMBEDDING_MAX_BATCH: int = 32
+    EMBEDDING_BACKEND: str = "torch"         # "torch", "onnx" or "onnx-int8" (ONNX Runtime, int8 weights);
+                                             # for new index versions, registered ones keep theirs
+    EMBEDDING_QUANTIZATION: str = "avx2"     # onnx-int8 kernels: avx2, avx512, avx512_vnni or arm64
+    EMBEDDING_CACHE_DIR: str = "embedding_models"  # models quantized locally
+    WARMUP_ON_STARTUP: bool = True           # load model/index in the background at startup
+    
+    # Vector store: "embedded" (model + Chroma in this process) or "remote"
+    # (shared index server, see src/index_server.py; needed for >1 worker)
+    VECTOR_STORE_MODE: str = "embedded"
+    VECTOR_STORE_URL: str = "http://localhost:8100"
+    VECTOR_STORE_TIMEOUT_S: float = 30.0
+    
+    # Per-document exact search
+    SMALL_SESSION_MAX_CHUNKS: int = 1000      # larger documents use the ANN index
+    SESSION_INDEX_CACHE_SIZE: int = 128       # documents kept as in-memory matrices
+    SESSION_INDEX_CACHE_TTL_S: float = 600.0
+    VECTOR_STORAGE_DTYPE: str = "float32"     # cached document matrices: float32, float16 or int8
+    VECTOR_RESCORE_FACTOR: int = 4            # compact matrices shortlist limit x this, re-scored in float32
+    
+    # Hybrid retrieval (BM25 + vectors, per document)
+    HYBRID_SEARCH: bool = True                # fuse lexical matches into vector search results
+    HYBRID_RRF_K: int = 60                    # reciprocal rank fusion constant
+    LEXICAL_FAST_PATH: bool = True            # queries whose codes all match skip the embedding
+    MIN_VECTOR_SCORE: float = 0.05            # cosine below this is no evidence of relevance
+    MIN_LEXICAL_SCORE: float = 1.0            # BM25 below this is no evidence (terms common to most chunks)
+    
+    # Prompt context
+    CONTEXT_CANDIDATES: int = 8               # chunks retrieved before packing
+    CONTEXT_TOKEN_BUDGET: int = 900           # approximate tokens of context per prompt
+    CONTEXT_MMR_LAMBDA: float = 0.7           # 1.0 = relevance only, lower = more diversity
+    CROSS_FILE_QUOTA: int = 3                 # max candidates per file in multi-file questions
+    MAX_QUERY_FILES: int = 50                 # files searched by one multi-file question
+    
+    # Document digests: summary + key points built after ingestion, answering
+    # "summarize this" questions without retrieval or generation
+    DIGEST_ENABLED: bool = False
+    DIGEST_SECTION_TOKENS: int = 1500         # text per map step (and partial summaries per reduce step)
+    DIGEST_MAX_SECTIONS: int = 32             # longer documents summarize evenly spaced sections
+    DIGEST_KEY_POINTS: int = 8
+    DIGEST_MAX_TOKENS: int = 400              # generated per map/reduce step
+    DIGEST_CONTEXT_TOKENS: int = 120          # summary added to other questions' prompts; 0 = off
+    DIGEST_REQUEST_TIMEOUT_S: float = 180.0
+    DIGEST_IDLE_POLL_S: float = 1.0           # wait between checks for an idle model
+    DIGEST_POLL_S: float = 30.0               # how often documents without a digest are looked for
+    DIGEST_LEASE_S: float = 600.0             # a digest build silent this long is reclaimed
+    DIGEST_MAX_ATTEMPTS: int = 3
+    DIGEST_RETRY_BACKOFF_S: float = 60.0      # doubled on each retry
+    
+    # Batch questions (/chat/ask/batch)
+    BATCH_LLM_CONCURRENCY: int = 0            # generations one batch runs at once; 0 = OLLAMA_MAX_CONCURRENCY
+    BATCH_LLM_RETRIES: int = 3                # waits for a full generation queue before a question fails
+    
+    # Conversations
+    CONVERSATION_MAX_MESSAGES: int = 40       # stored per conversation
+    CONVERSATION_HISTORY_MESSAGES: int = 6    # replayed when a prompt starts over
+    CONVERSATION_MAX_CONTEXT_TOKENS: int = 3000  # generation state kept before starting over
+    
+    # Session expiry / garbage collection
+    SESSION_TTL_HOURS: float = 0.0            # uploads expire after this; 0 = never (opt-in)
+    GC_INTERVAL_S: float = 600.0              # how often expired sessions and orphans are removed; 0 = off
+    GC_BATCH_SIZE: int = 100                  # records fetched per cleanup query
+    ORPHAN_GRACE_S: float = 3600.0            # documents touched more recently are never treated as orphans
+    
+    # Caches
+    QUERY_CACHE_SIZE: int = 2048
+    QUERY_CACHE_TTL_S: float = 3600.0
+    ANSWER_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_TTL_S: float = 900.0
+    REMOTE_CACHE_TTL_S: float = 15.0          # VECTOR_STORE_MODE=remote: cap on caches other workers can make stale
     
     # Paths
     BASE_DIR: Path = Path(__file__).parent.parent.parent
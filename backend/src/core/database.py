@@ -1,9 +1,38 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from .config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# collection -> indexes the queries in api/ and services/ rely on
+INDEXES = {
+    "files": [
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+        IndexModel([("doc_id", ASCENDING)], name="doc_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+    ],
+    "documents": [
+        IndexModel([("status", ASCENDING), ("digest.status", ASCENDING), ("created_at", DESCENDING)], name="digest_claim"),
+    ],
+    "jobs": [
+        IndexModel([("state", ASCENDING), ("available_at", ASCENDING), ("created_at", ASCENDING)], name="claim"),
+        IndexModel([("doc_id", ASCENDING), ("created_at", DESCENDING)], name="doc_id_created_at"),
+    ],
+    "conversations": [
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+    ],
+    "index_builds": [
+        IndexModel([("version", ASCENDING)], name="version"),
+    ],
+    "lexical_index": [
+        IndexModel([("version", ASCENDING), ("owner", ASCENDING)], name="version_owner"),
+    ],
+    "document_text": [
+        IndexModel([("doc_id", ASCENDING), ("seq", ASCENDING)], name="doc_id_seq"),
+    ],
+}
+
 class MongoDB:
     client: AsyncIOMotorClient = None
     db = None
@@ -18,6 +47,16 @@ class MongoDB:
         except Exception as e:
             logger.error(f"❌ MongoDB connection failed: {e}")
             raise
+        await self.create_indexes()
+    
+    async def create_indexes(self):
+        """Create the indexes in INDEXES (no-op for ones that already exist)"""
+        for collection, indexes in INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(indexes)
+            except Exception as e:
+                # Queries still work without them, just slower
+                logger.warning(f"⚠️ Could not create indexes on {collection}: {e}")
     
     async def disconnect(self):
         """Disconnect from MongoDB"""
@@ -0,0 +1,204 @@
+# backend/src/core/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond vector search up to multi-minute ingestion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._values: Dict[Tuple[str, ...], float] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total) in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                cumulative += counts[-1]
+                inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    "filechat_stage_seconds",
+    "Time spent per pipeline stage",
+    ["stage"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "filechat_http_request_seconds",
+    "HTTP request latency until the response starts",
+    ["method", "route", "status"]
+)
+INGESTED_DOCUMENTS = Counter(
+    "filechat_ingested_documents_total",
+    "Ingestion jobs finished, by outcome",
+    ["status"]
+)
+INGESTED_CHUNKS = Counter(
+    "filechat_ingested_chunks_total",
+    "Chunks embedded and written to the vector index"
+)
+QUEUE_DEPTH = Gauge(
+    "filechat_queue_depth",
+    "Work waiting in each queue",
+    ["queue"]
+)
+CACHE_EVENTS = Gauge(
+    "filechat_cache",
+    "Cache counters (hits, misses, evictions, coalesced, entries)",
+    ["cache", "stat"]
+)
+
+
+# ===== Per-request stage timings (Server-Timing) =====
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float):
+    """Observe a stage duration and attach it to the current request, if any"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def _stage_durations(timings: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Seconds per stage; repeated stages (e.g. one search per file) are summed"""
+    durations: Dict[str, float] = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    return durations
+
+
+def stage_timings() -> Dict[str, float]:
+    """Milliseconds per stage recorded so far for the current request.
+
+    Streaming responses send their headers before generation runs, so
+    Server-Timing only covers retrieval; they report this in their last event.
+    """
+    timings = _request_timings.get() or []
+    return {stage: round(seconds * 1000, 1) for stage, seconds in _stage_durations(timings).items()}
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value, summed per stage"""
+    durations = _stage_durations(timings)
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
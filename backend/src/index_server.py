@@ -0,0 +1,198 @@
+# backend/src/index_server.py
+"""Standalone embedding + vector index server.
+
+Owns the only copy of the embedding model and the Chroma index so that
+several API workers or replicas can share them:
+
+    uvicorn src.index_server:app --port 8100          # one worker
+    VECTOR_STORE_MODE=remote uvicorn src.main:app --workers 4
+
+Query encodes from all API workers land in the same micro-batching
+executor, so they are batched together. Requests name the index version
+(collection, model and embedding backend) they target; each is loaded on first use, so an
+old and a new version can be served side by side during a re-index.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from .core.config import settings
+from .core.metrics import REGISTRY
+from .services.vector_store import EmbeddedVectorStore, decode_array, encode_array
+
+logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+logger = logging.getLogger(__name__)
+
+# (collection, model, backend) -> store
+stores: Dict[Tuple[str, str, str], EmbeddedVectorStore] = {}
+
+
+class IndexSpec(BaseModel):
+    name: str = settings.VECTOR_COLLECTION
+    model: str = settings.EMBEDDING_MODEL
+    backend: str = settings.EMBEDDING_BACKEND
+
+
+def get_store(index: Optional[IndexSpec]) -> EmbeddedVectorStore:
+    index = index or IndexSpec()
+    key = (index.name, index.model, index.backend)
+    if key not in stores:
+        stores[key] = EmbeddedVectorStore(*key)
+    return stores[key]
+
+
+class ArrayPayload(BaseModel):
+    shape: List[int]
+    data: str
+
+
+class IndexRequest(BaseModel):
+    index: Optional[IndexSpec] = None
+
+
+class EncodeRequest(IndexRequest):
+    texts: List[str]
+    query: bool = False
+
+
+class AddRequest(IndexRequest):
+    ids: List[str]
+    embeddings: ArrayPayload
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    partition_key: str
+
+
+class SearchRequest(IndexRequest):
+    embedding: ArrayPayload
+    limit: int = 3
+    where: Optional[Dict[str, Any]] = None
+    partition_key: Optional[str] = None
+
+
+class SearchManyRequest(IndexRequest):
+    embeddings: ArrayPayload
+    limit: int = 3
+    where: Optional[Dict[str, Any]] = None
+    partition_key: Optional[str] = None
+
+
+class GetRequest(IndexRequest):
+    ids: List[str]
+
+
+class DeleteRequest(IndexRequest):
+    where: Dict[str, Any]
+    partition_key: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = asyncio.create_task(get_store(None).warmup())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    for store in stores.values():
+        await store.close()
+
+
+app = FastAPI(title="File Chat Index Server", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "ready": get_store(None).ready}
+
+
+@app.post("/warmup")
+async def warmup(request: IndexRequest):
+    store = get_store(request.index)
+    if not store.ready:
+        await store.warmup()
+    return {"ready": True}
+
+
+@app.post("/encode")
+async def encode(request: EncodeRequest):
+    store = get_store(request.index)
+    if request.query and len(request.texts) == 1:
+        embeddings = (await store.encode_query(request.texts[0]))[None, :]
+    elif request.query:
+        embeddings = await store.encode_queries(request.texts)
+    else:
+        embeddings = await store.encode_documents(request.texts)
+    return {"embeddings": encode_array(embeddings)}
+
+
+@app.post("/chunks/add")
+async def add_chunks(request: AddRequest):
+    await get_store(request.index).add(
+        ids=request.ids,
+        embeddings=decode_array(request.embeddings.dict()),
+        documents=request.documents,
+        metadatas=request.metadatas,
+        partition_key=request.partition_key
+    )
+    return {"added": len(request.ids)}
+
+
+@app.post("/chunks/search")
+async def search_chunks(request: SearchRequest):
+    hits = await get_store(request.index).search(
+        decode_array(request.embedding.dict()),
+        request.limit,
+        request.where,
+        request.partition_key
+    )
+    return {"hits": hits}
+
+
+@app.post("/chunks/search_many")
+async def search_chunks_many(request: SearchManyRequest):
+    hits = await get_store(request.index).search_many(
+        decode_array(request.embeddings.dict()),
+        request.limit,
+        request.where,
+        request.partition_key
+    )
+    return {"hits": hits}
+
+
+@app.post("/chunks/get")
+async def get_chunks(request: GetRequest):
+    return {"chunks": await get_store(request.index).get_chunks(request.ids)}
+
+
+@app.post("/chunks/delete")
+async def delete_chunks(request: DeleteRequest):
+    await get_store(request.index).delete(request.where, request.partition_key)
+    return {"status": "success"}
+
+
+@app.post("/drop")
+async def drop(request: IndexRequest):
+    """Delete a retired index version's collection"""
+    store = get_store(request.index)
+    await store.drop()
+    await store.close()
+    stores.pop((store.collection_name, store.model_name, store.backend), None)
+    return {"status": "success"}
+
+
+@app.get("/stats")
+async def stats(name: Optional[str] = None, model: Optional[str] = None, backend: Optional[str] = None):
+    index = IndexSpec(**{k: v for k, v in (("name", name), ("model", model), ("backend", backend)) if v})
+    return {
+        **await get_store(index).stats(),
+        "loaded_indexes": [name for name, _, _ in stores]
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
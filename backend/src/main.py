@@ -1,13 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 from .core.config import settings
+from .core.metrics import (
+    REGISTRY, HTTP_REQUEST_SECONDS, QUEUE_DEPTH, CACHE_EVENTS,
+    start_trace, server_timing_header
+)
 from .core.database import mongodb
-from .api import files, chat
+from .services.llm_service import llm_service
+from .services.vector_service import vector_service
+from .services.cache_service import answer_cache, query_embedding_cache
+from .services.lexical_index import lexical_partitions
+from .services.extraction_service import extraction_service
+from .services.job_service import job_service
+from .services.cleanup_service import cleanup_service
+from .services.digest_service import digest_service
+from .services.reindex_service import reindex_service
+from .api import files, chat, index
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -15,11 +31,38 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up...")
     await mongodb.connect()
+    job_service.start(files.process_ingestion_job, on_failure=files.ingestion_job_failed)
+    cleanup_service.start()
+    digest_service.start()
+    try:
+        await reindex_service.register_default()
+    except Exception as e:
+        logger.error(f"❌ Default index registration failed: {e}")
+    vector_service.start_refresh()
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        # Load model/index in the background so the server starts accepting
+        # connections immediately; /health/ready reports when it is done
+        warmup_task = asyncio.create_task(_warmup())
     yield
     # Shutdown
     logger.info("Shutting down...")
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await cleanup_service.stop()
+    await digest_service.stop()
+    await job_service.stop()
+    await llm_service.close()
+    await vector_service.close()
+    extraction_service.close()
     await mongodb.disconnect()
 
+async def _warmup():
+    try:
+        await vector_service.warmup()
+    except Exception as e:
+        logger.error(f"❌ Vector service warmup failed: {e}")
+
 app = FastAPI(
     title="File Chat System API",
     version="1.0.0",
@@ -29,8 +72,39 @@ app = FastAPI(
 # Add routes
 app.include_router(files.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
+app.include_router(index.router, prefix="/api")
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Refuse uploads announced as too large before their body is read"""
+    if (request.method == "POST" and request.url.path == "/api/files/upload"
+            and files.upload_too_large(request.headers.get("content-length"))):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large (max {settings.MAX_FILE_SIZE_MB}MB)"}
+        )
+    return await call_next(request)
 
-# CORS middleware
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Time each request and report its pipeline stages in Server-Timing"""
+    timings = start_trace()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    
+    # Label by route template, not raw path, to keep label cardinality bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code
+    )
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+# CORS middleware, added last so it wraps the others and their early responses
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -47,7 +121,68 @@ async def root():
 async def health():
     return {
         "status": "ok",
-        "mongodb": "connected" if mongodb.client else "disconnected"
+        "mongodb": "connected" if mongodb.client else "disconnected",
+        "vector_service": "ready" if vector_service.ready else "loading"
+    }
+
+@app.get("/health/live")
+async def health_live():
+    """Process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Dependencies connected, embedding model and index loaded"""
+    checks = {
+        "mongodb": mongodb.client is not None,
+        "vector_service": vector_service.ready
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks}
+    )
+
+@app.get("/stats")
+async def stats():
+    store_stats = await vector_service.stats()
+    return {
+        "ingestion": {"queued_jobs": await job_service.queue_depth()},
+        "cleanup": cleanup_service.last_run,
+        "digests": digest_service.stats(),
+        "llm": llm_service.stats(),
+        "vector_store": settings.VECTOR_STORE_MODE,
+        "index_version": vector_service.version.name,
+        "embedding": store_stats["embedding"],
+        "cache": {
+            "query_embeddings": query_embedding_cache.stats(),
+            "answers": answer_cache.stats(),
+            "session_partitions": store_stats["session_partitions"],
+            "lexical_partitions": lexical_partitions.stats()
+        }
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    QUEUE_DEPTH.set(await job_service.queue_depth(), queue="ingestion")
+    llm_stats = llm_service.stats()
+    QUEUE_DEPTH.set(llm_stats["waiting"], queue="llm")
+    QUEUE_DEPTH.set(llm_stats["in_flight"], queue="llm_in_flight")
+    
+    cache_stats = {
+        cache.name: cache.stats() for cache in (query_embedding_cache, answer_cache, lexical_partitions)
     }
+    try:
+        store_stats = await vector_service.stats()
+        QUEUE_DEPTH.set(store_stats["embedding"]["queue_depth"], queue="embedding")
+        cache_stats["session_partitions"] = store_stats["session_partitions"]
+    except Exception as e:
+        logger.warning(f"Vector store stats unavailable: {e}")
+    for name, values in cache_stats.items():
+        for stat, value in values.items():
+            if isinstance(value, (int, float)):
+                CACHE_EVENTS.set(value, cache=name, stat=stat)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # We'll add more routes later
\ No newline at end of file
@@ -22,9 +22,32 @@ class QuestionRequest(BaseModel):
     text: str
     session_id: Optional[str] = None
     language: Language = Language.EN
+    conversation_id: Optional[str] = None
+    session_ids: Optional[List[str]] = None  # ask across several files
+    all_files: bool = False                  # ask across every uploaded file
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=200)
+    session_id: Optional[str] = None
+    language: Language = Language.EN
+    session_ids: Optional[List[str]] = None
+    all_files: bool = False
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[dict] = Field(default_factory=list)  
     language: Language
-    session_id: Optional[str] = None
\ No newline at end of file
+    session_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+
+class ConversationCreate(BaseModel):
+    session_id: Optional[str] = None
+    language: Language = Language.EN
+
+class ConversationResponse(BaseModel):
+    conversation_id: str
+    session_id: Optional[str] = None
+    language: Language
+    turns: int = 0
+    messages: List[ChatMessage] = Field(default_factory=list)
+    created_at: datetime
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -9,6 +9,13 @@ class FileType(str, Enum):
     TXT = "txt"
     EXCEL = "excel"
 
+    @classmethod
+    def from_extension(cls, extension: str) -> "FileType":
+        extension = extension.lower().lstrip(".")
+        if extension in ("xlsx", "xls"):
+            return cls.EXCEL
+        return cls(extension)
+
 class FileBase(BaseModel):
     filename: str
     original_filename: str
@@ -17,17 +24,23 @@ class FileBase(BaseModel):
 
 class FileCreate(FileBase):
     session_id: str
+    content_hash: Optional[str] = None
     text_content: Optional[str] = None
 
 class FileResponse(FileBase):
     id: str = Field(alias="_id")
     session_id: str
+    content_hash: Optional[str] = None
     text_content: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    expires_at: Optional[datetime] = None
     
     class Config:
         populate_by_name = True
 
 class FileInDB(FileResponse):
-    pass
\ No newline at end of file
+    pass
+
+class BulkDeleteRequest(BaseModel):
+    session_ids: List[str] = Field(..., min_length=1, max_length=1000)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class IndexBuildRequest(BaseModel):
+    name: Optional[str] = None             # default: chunks_<timestamp>
+    model: Optional[str] = None            # default: EMBEDDING_MODEL
+    backend: Optional[str] = None          # default: EMBEDDING_BACKEND
+    chunk_size: Optional[int] = Field(None, ge=20, le=2000)
+    chunk_overlap: Optional[int] = Field(None, ge=0)
+    workers: Optional[int] = Field(None, ge=1, le=64)
+    activate: bool = False                 # switch the alias once the build is done
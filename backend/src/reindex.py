@@ -0,0 +1,110 @@
+# backend/src/reindex.py
+"""Build, activate and drop vector index versions.
+
+    python -m src.reindex build --name v2 --chunk-size 400 --activate
+    python -m src.reindex status
+    python -m src.reindex activate document_chunks    # roll back
+    python -m src.reindex drop v2
+
+A build re-chunks and re-embeds every document from the stored text into
+a new collection while the API keeps serving the active one; re-running
+an interrupted build resumes it. `activate` moves the index alias, which
+running API processes pick up within INDEX_REFRESH_S.
+
+With VECTOR_STORE_MODE=embedded the Chroma directory must not be in use
+by a running API process; stop it, run the build from the API instead
+(POST /api/index/builds), or use the index server.
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from .core.config import settings
+from .core.database import mongodb
+from .services.embedding_backend import EMBEDDING_BACKENDS
+from .services.index_registry import OverlapMode, index_registry
+from .services.reindex_service import reindex_service, new_version
+
+logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+logger = logging.getLogger(__name__)
+
+
+async def _print_progress(progress):
+    done = progress["docs_done"] + progress["docs_failed"]
+    eta = f", eta {progress['eta_s']:.0f}s" if progress.get("eta_s") else ""
+    print(
+        f"  {done}/{progress['docs_total']} documents, {progress['chunks']} chunks "
+        f"({progress['docs_per_s']:.2f} docs/s, {progress['chunks_per_s']:.0f} chunks/s{eta})",
+        flush=True
+    )
+
+
+async def build(args):
+    version = new_version(args.name, args.model, args.chunk_size, args.chunk_overlap, args.backend)
+    print(f"Building {version.name}: {version.spec()}")
+    progress = await reindex_service.build(version, workers=args.workers, on_progress=_print_progress)
+    print(f"Built {version.name}: {json.dumps(progress)}")
+    if args.activate:
+        await activate_version(version.name)
+
+
+async def activate_version(name: str):
+    print(f"Activating {name} (waits {settings.INDEX_REFRESH_S:.0f}s for API processes to switch)")
+    result = await reindex_service.activate(name, settle=True)
+    print(f"Active: {result['active']} (was {result['previous']}), caught up {result['caught_up']['docs_done']} documents")
+
+
+async def status(args):
+    active = await index_registry.active_version()
+    for record in await index_registry.list():
+        marker = "*" if record["_id"] == active.name else " "
+        progress = record.get("progress") or {}
+        print(
+            f"{marker} {record['_id']:<32} {record['state']:<9} model={record['model']} "
+            f"backend={record.get('backend', settings.EMBEDDING_BACKEND)} "
+            f"chunk_size={record['chunk_size']} overlap={record['chunk_overlap']} ({record.get('overlap_mode', OverlapMode.SENTENCES)}) "
+            f"docs={progress.get('docs_done', '-')} chunks={progress.get('chunks', '-')}"
+        )
+    print(f"Active: {active.name}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="build (or resume) an index version")
+    build_parser.add_argument("--name", help="collection name (default chunks_<timestamp>)")
+    build_parser.add_argument("--model", help=f"embedding model (default {settings.EMBEDDING_MODEL})")
+    build_parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, help=f"embedding backend (default {settings.EMBEDDING_BACKEND})")
+    build_parser.add_argument("--chunk-size", type=int, help=f"words per chunk (default {settings.CHUNK_SIZE})")
+    build_parser.add_argument("--chunk-overlap", type=int, help=f"overlap words (default {settings.CHUNK_OVERLAP})")
+    build_parser.add_argument("--workers", type=int, help=f"documents in parallel (default {settings.REINDEX_WORKERS})")
+    build_parser.add_argument("--activate", action="store_true", help="switch the alias when done")
+
+    activate_parser = commands.add_parser("activate", help="make a built version active")
+    activate_parser.add_argument("name")
+    drop_parser = commands.add_parser("drop", help="delete an inactive version")
+    drop_parser.add_argument("name")
+    commands.add_parser("status", help="list versions")
+    args = parser.parse_args()
+
+    await mongodb.connect()
+    try:
+        if args.command == "build":
+            await build(args)
+        elif args.command == "activate":
+            await activate_version(args.name)
+        elif args.command == "drop":
+            await reindex_service.drop(args.name)
+            print(f"Dropped {args.name}")
+        else:
+            await status(args)
+    except (LookupError, ValueError) as e:
+        parser.exit(1, f"error: {e}\n")
+    finally:
+        await mongodb.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,229 @@
+# backend/src/services/cache_service.py
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from ..core.config import settings
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a question so trivially different phrasings share a key"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+# Generation keys of tags, apart from cache keys
+_TAG = object()
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry and tag-based invalidation.
+
+    Invalidating a key or a tag bumps its generation. A load that read its
+    source before a write passes the generation it started with (of the
+    key and the tags it will be stored with) to `set`, which drops the
+    result if any of them was invalidated meanwhile.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._inflight_tags: Dict[Hashable, tuple] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self._clock = 0
+        self._floor = 0  # generation of keys forgotten by pruning
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, key: Hashable, tags: Iterable[Hashable] = ()) -> int:
+        """Pass to `set` by loads that may race an invalidation of `key` or `tags`"""
+        # Bumps take a fresh clock value, so the newest one changes on any bump
+        return max(
+            [self._generations.get(key, self._floor)]
+            + [self._generations.get((_TAG, tag), self._floor) for tag in tags]
+        )
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (), generation: Optional[int] = None):
+        if self.max_entries <= 0:
+            return
+        tags = tuple(tags)
+        if generation is not None and generation != self.generation(key, tags):
+            # Invalidated while the value was being computed: it's stale
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def values(self) -> List[Any]:
+        """Cached values, expired ones included until they are looked up"""
+        return [entry[1] for entry in self._entries.values()]
+
+    def invalidate(self, key: Hashable):
+        self._remove(key)
+        self._bump(key)
+        # Callers arriving now must not join a load that started before
+        self._forget_inflight(key)
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry stored with `tag`, returns how many were removed"""
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._remove(key)
+        self._bump((_TAG, tag))
+        for key in [key for key, tags in self._inflight_tags.items() if tag in tags]:
+            self._forget_inflight(key)
+        return len(keys)
+
+    def _bump(self, generation_key: Hashable):
+        self._clock += 1
+        self._generations[generation_key] = self._clock
+        if len(self._generations) > max(1024, 4 * self.max_entries):
+            # Forgotten keys all move to a newer generation, so loads in
+            # flight for them are dropped too (one extra miss at worst)
+            self._generations.clear()
+            self._floor = self._clock
+
+    def _forget_inflight(self, key: Hashable):
+        self._inflight.pop(key, None)
+        self._inflight_tags.pop(key, None)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def single_flight(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                            tags: Iterable[Hashable] = ()) -> Any:
+        """Run `compute` once per key; concurrent callers await the same result.
+
+        Invalidating `key` or one of `tags` stops later callers from joining.
+        """
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading caller went away; compute it ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._inflight_tags[key] = tuple(tags)
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                self._forget_inflight(key)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        tags: Iterable[Hashable] = ()
+    ) -> Any:
+        """Return the cached value, or compute it once and cache it"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        tags = tuple(tags)
+
+        async def compute_and_store():
+            generation = self.generation(key, tags)
+            result = await compute()
+            self.set(key, result, tags, generation=generation)
+            return result
+
+        return await self.single_flight(key, compute_and_store, tags)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced
+        }
+
+
+def shared_ttl(ttl_seconds: float) -> float:
+    """TTL for cached data that other processes may change.
+
+    Invalidation only reaches the process that made the write. With
+    VECTOR_STORE_MODE=remote several API workers serve the same documents,
+    so their copies are kept no longer than REMOTE_CACHE_TTL_S.
+    """
+    if settings.VECTOR_STORE_MODE == "remote":
+        return min(ttl_seconds, settings.REMOTE_CACHE_TTL_S)
+    return ttl_seconds
+
+
+# Query vectors depend only on the text, model and backend, never stale
+query_embedding_cache = TTLCache(
+    "query_embeddings",
+    max_entries=settings.QUERY_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_CACHE_TTL_S
+)
+answer_cache = TTLCache(
+    "answers",
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=shared_ttl(settings.ANSWER_CACHE_TTL_S)
+)
+
+# Answer cache tag for questions asked across every uploaded file
+ALL_FILES_TAG = "*"
@@ -0,0 +1,217 @@
+# backend/src/services/cleanup_service.py
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..core.config import settings
+from ..core.database import mongodb
+from .cache_service import answer_cache, ALL_FILES_TAG
+from .conversation_service import conversation_service
+from .document_store import document_store, DocumentStatus
+from .job_service import job_service
+from .text_store import text_store
+from .vector_service import vector_service
+
+logger = logging.getLogger(__name__)
+
+
+class CleanupService:
+    """Deletes sessions and whatever only they reference.
+
+    Used by the delete endpoints and by a background task that, every
+    `GC_INTERVAL_S`, removes sessions past their `expires_at` and then
+    reconciles documents that lost their sessions or failed ingestion.
+    Everything is looked up by id or stored path, never by scanning the
+    upload directory, and handled `GC_BATCH_SIZE` records at a time.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Dict[str, Any] = {}
+
+    # ===== Deletion =====
+
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete one session, returns False if it doesn't exist"""
+        file_doc = await mongodb.db.files.find_one_and_delete({"session_id": session_id})
+        if file_doc is None:
+            return False
+        await self._release_session(file_doc)
+        return True
+
+    async def delete_sessions(self, session_ids: Iterable[str]) -> List[str]:
+        """Delete several sessions, returns the ids that were found"""
+        deleted = []
+        for session_id in dict.fromkeys(session_ids):
+            if await self.delete_session(session_id):
+                deleted.append(session_id)
+        return deleted
+
+    async def _release_session(self, file_doc: Dict[str, Any]):
+        """Clean up after a `files` record that was just removed"""
+        session_id = file_doc["session_id"]
+
+        # Cached answers and conversations about this file are no longer valid
+        answer_cache.invalidate_tag(session_id)
+        answer_cache.invalidate_tag(ALL_FILES_TAG)
+        await conversation_service.delete_for_session(session_id)
+
+        doc_id = file_doc.get("doc_id")
+        if doc_id:
+            # Shared content: only the last session removes chunks and file
+            document = await document_store.release(doc_id)
+            if document is not None:
+                await self.purge_document(doc_id, document.get("file_path"))
+                await document_store.remove(doc_id)
+            return
+
+        # Files uploaded before content addressing own their chunks and were
+        # stored as <session_id><extension>
+        try:
+            await vector_service.delete_session_chunks(session_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete vector embeddings: {e}")
+        extension = os.path.splitext(file_doc.get("filename", ""))[1].lower()
+        _remove_file(settings.UPLOAD_PATH / f"{session_id}{extension}")
+
+    async def purge_document(self, doc_id: str, file_path: Optional[str]):
+        """Remove a document's chunks, text, jobs and stored file"""
+        try:
+            await vector_service.delete_document_chunks(doc_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete vector embeddings: {e}")
+        await text_store.delete(doc_id)
+        await job_service.delete_for_document(doc_id)
+        if file_path:
+            _remove_file(file_path)
+
+    # ===== Garbage collection =====
+
+    async def collect_expired(self) -> int:
+        """Delete every session past its expiry, returns how many"""
+        if settings.SESSION_TTL_HOURS <= 0:
+            return 0
+
+        # Only sessions stamped with an expiry at upload: older uploads were
+        # never told they would expire, so they are kept
+        query = {"expires_at": {"$lte": datetime.now()}}
+        deleted = 0
+        while True:
+            batch = await mongodb.db.files.find(
+                query, {"session_id": 1}
+            ).limit(settings.GC_BATCH_SIZE).to_list(length=settings.GC_BATCH_SIZE)
+            for file_doc in batch:
+                # Claim by _id so concurrent collectors don't release twice
+                claimed = await mongodb.db.files.find_one_and_delete({"_id": file_doc["_id"]})
+                if claimed is not None:
+                    await self._release_session(claimed)
+                    deleted += 1
+            if len(batch) < settings.GC_BATCH_SIZE:
+                return deleted
+
+    async def reconcile_orphans(self) -> Dict[str, int]:
+        """Clean up documents that ingestion or a crash left behind.
+
+        - documents no session references (all references released, or the
+          upload died between storing the file and recording the session)
+          are purged completely, as are deletions that died mid-purge;
+        - documents whose ingestion failed keep their record and stored file
+          (a re-upload retries them) but lose their partial chunks and text.
+
+        Records touched within `ORPHAN_GRACE_S` are skipped, so uploads and
+        retries in progress are never mistaken for orphans.
+        """
+        cutoff = datetime.now() - timedelta(seconds=settings.ORPHAN_GRACE_S)
+        purged = cleared = 0
+        last_id = None
+        while True:
+            query: Dict[str, Any] = {"updated_at": {"$lt": cutoff}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await document_store.collection.find(
+                query, {"file_path": 1, "status": 1, "partial_cleared": 1}
+            ).sort("_id", 1).limit(settings.GC_BATCH_SIZE).to_list(length=settings.GC_BATCH_SIZE)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+
+            ids = [document["_id"] for document in batch]
+            referenced = set(await mongodb.db.files.distinct("doc_id", {"doc_id": {"$in": ids}}))
+
+            for document in batch:
+                doc_id = document["_id"]
+                if document.get("status") == DocumentStatus.DELETING:
+                    # A deletion that died mid-purge; uploads of it wait for us
+                    await self.purge_document(doc_id, document.get("file_path"))
+                    await document_store.remove(doc_id)
+                    purged += 1
+                elif doc_id not in referenced:
+                    # Re-check the cutoff: an upload may have acquired it since
+                    orphan = await document_store.claim_for_deletion(doc_id, {"updated_at": {"$lt": cutoff}})
+                    if orphan is not None:
+                        await self.purge_document(doc_id, orphan.get("file_path"))
+                        await document_store.remove(doc_id)
+                        purged += 1
+                elif document.get("status") == DocumentStatus.FAILED and not document.get("partial_cleared"):
+                    if await document_store.mark_partial_cleared(doc_id, cutoff):
+                        await self._clear_partial(doc_id)
+                        cleared += 1
+
+            if len(batch) < settings.GC_BATCH_SIZE:
+                break
+        return {"purged_documents": purged, "cleared_failed": cleared}
+
+    async def _clear_partial(self, doc_id: str):
+        try:
+            await vector_service.delete_document_chunks(doc_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete vector embeddings: {e}")
+        await text_store.delete(doc_id)
+
+    async def run_once(self) -> Dict[str, Any]:
+        started = asyncio.get_running_loop().time()
+        expired = await self.collect_expired()
+        orphans = await self.reconcile_orphans()
+        self.last_run = {
+            "expired_sessions": expired,
+            **orphans,
+            "seconds": round(asyncio.get_running_loop().time() - started, 3),
+            "finished_at": datetime.now().isoformat()
+        }
+        if expired or any(orphans.values()):
+            logger.info(f"🧹 Cleanup: {self.last_run}")
+        return self.last_run
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Cleanup failed: {e}")
+            await asyncio.sleep(settings.GC_INTERVAL_S)
+
+    def start(self):
+        if settings.GC_INTERVAL_S <= 0:
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"✅ Started cleanup task (every {settings.GC_INTERVAL_S:.0f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"⚠️ Failed to remove {path}: {e}")
+
+
+cleanup_service = CleanupService()
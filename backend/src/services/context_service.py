@@ -0,0 +1,130 @@
+# backend/src/services/context_service.py
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from ..core.config import settings
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of a text.
+
+    Ollama exposes no tokenizer endpoint, so this approximates a BPE
+    tokenizer: roughly one token per word piece or punctuation mark, with
+    long words costing about one token per four characters.
+    """
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _WORD.findall(text))
+
+
+def _sentence_key(sentence: str) -> str:
+    return " ".join(re.findall(r'\w+', sentence.lower()))
+
+
+def _terms(text: str) -> Set[str]:
+    return set(re.findall(r'\w+', text.lower()))
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _trim_to_budget(text: str, budget: int) -> str:
+    words = []
+    tokens = 0
+    for word in text.split():
+        tokens += estimate_tokens(word)
+        if tokens > budget:
+            break
+        words.append(word)
+    return " ".join(words)
+
+
+@dataclass
+class PackedContext:
+    """Context selected for the prompt"""
+    text: str = ""
+    chunks: List[Dict] = field(default_factory=list)  # chunks used, in selection order
+    tokens: int = 0
+    truncated: bool = False  # some relevant content did not fit the budget
+
+
+class ContextService:
+    """Packs retrieved chunks into a token budget.
+
+    Chunks overlap by design (the chunker carries sentences forward), so
+    sentences already taken from a higher-scoring chunk are dropped. The
+    remaining content is picked with maximal marginal relevance: relevance
+    score traded off against similarity to what is already selected.
+    Content is only cut at sentence boundaries.
+    """
+
+    def pack(self, chunks: List[Dict], token_budget: Optional[int] = None,
+             mmr_lambda: Optional[float] = None, label_sources: bool = False) -> PackedContext:
+        """Select and pack chunks; `label_sources` prefixes each with its filename"""
+        budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+        mmr_lambda = settings.CONTEXT_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+
+        # Strip sentences that a better-scoring chunk already contains
+        seen = set()
+        candidates = []
+        for chunk in sorted(chunks, key=lambda c: c.get("score", 0), reverse=True):
+            sentences = []
+            for sentence in _SENTENCE_SPLIT.split(chunk["chunk_text"].strip()):
+                key = _sentence_key(sentence)
+                if key and key not in seen:
+                    seen.add(key)
+                    sentences.append(sentence)
+            if sentences:
+                candidates.append({
+                    "chunk": chunk,
+                    "sentences": sentences,
+                    "terms": _terms(" ".join(sentences))
+                })
+
+        packed = PackedContext()
+        parts = []
+        selected_terms = []
+        while candidates:
+            best = max(candidates, key=lambda c: (
+                mmr_lambda * c["chunk"].get("score", 0)
+                - (1 - mmr_lambda) * max((_jaccard(c["terms"], t) for t in selected_terms), default=0.0)
+            ))
+            candidates.remove(best)
+
+            taken = []
+            label = f"[{best['chunk'].get('filename', 'Unknown')}]" if label_sources else ""
+            if label:
+                packed.tokens += estimate_tokens(label)
+            for sentence in best["sentences"]:
+                cost = estimate_tokens(sentence)
+                if packed.tokens + cost > budget:
+                    if not packed.chunks and not taken:
+                        # A single oversized sentence: keep its leading words
+                        sentence = _trim_to_budget(sentence, budget - packed.tokens)
+                        taken.append(sentence)
+                        packed.tokens += estimate_tokens(sentence)
+                    packed.truncated = True
+                    break
+                taken.append(sentence)
+                packed.tokens += cost
+
+            if taken:
+                parts.append(f"{label}\n{' '.join(taken)}" if label else " ".join(taken))
+                packed.chunks.append(best["chunk"])
+                selected_terms.append(best["terms"])
+            elif label:
+                packed.tokens -= estimate_tokens(label)
+            if packed.truncated:
+                break
+
+        packed.text = "\n\n".join(parts)
+        return packed
+
+
+context_service = ContextService()
@@ -0,0 +1,82 @@
+# backend/src/services/conversation_service.py
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.database import mongodb
+from ..models.chat import ChatMessage, Language, MessageRole
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationService:
+    """Multi-turn conversations persisted in the MongoDB `conversations` collection.
+
+    Besides a bounded window of messages, each conversation keeps Ollama's
+    `context` (the token state returned by the previous generation) and the
+    keys of the document chunks already sent. A follow-up turn then only
+    sends the new excerpts and the question, and Ollama continues from the
+    cached prefix instead of re-reading the whole prompt.
+    """
+
+    @property
+    def collection(self):
+        return mongodb.db.conversations
+
+    async def start(self, session_id: Optional[str], language: Language) -> Dict[str, Any]:
+        now = datetime.now()
+        conversation = {
+            "_id": uuid.uuid4().hex,
+            "session_id": session_id,
+            "language": language.value,
+            "messages": [],
+            "turns": 0,
+            "llm_context": None,
+            "context_chunks": [],
+            "created_at": now,
+            "updated_at": now
+        }
+        await self.collection.insert_one(conversation)
+        return conversation
+
+    async def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": conversation_id})
+
+    async def record_turn(
+        self,
+        conversation: Dict[str, Any],
+        question: str,
+        answer: str,
+        llm_context: Optional[List[int]],
+        context_chunks: List[str]
+    ):
+        """Append a question/answer pair and the generation state it produced"""
+        messages = [
+            ChatMessage(role=MessageRole.USER, content=question).dict(),
+            ChatMessage(role=MessageRole.ASSISTANT, content=answer).dict()
+        ]
+        update: Dict[str, Any] = {
+            "$push": {"messages": {"$each": messages, "$slice": -settings.CONVERSATION_MAX_MESSAGES}},
+            "$inc": {"turns": 1},
+            "$set": {"updated_at": datetime.now()}
+        }
+
+        if llm_context and len(llm_context) <= settings.CONVERSATION_MAX_CONTEXT_TOKENS:
+            update["$set"]["llm_context"] = llm_context
+            update["$push"]["context_chunks"] = {"$each": context_chunks}
+        else:
+            # Past the window (or no state returned): the next turn starts
+            # over with a full prompt and the recent messages
+            update["$set"]["llm_context"] = None
+            update["$set"]["context_chunks"] = []
+
+        await self.collection.update_one({"_id": conversation["_id"]}, update)
+
+    async def delete_for_session(self, session_id: str) -> int:
+        result = await self.collection.delete_many({"session_id": session_id})
+        return result.deleted_count
+
+
+conversation_service = ConversationService()
@@ -0,0 +1,429 @@
+# backend/src/services/digest_service.py
+import asyncio
+import logging
+import math
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from ..core.config import settings
+from ..core.database import mongodb
+from .cache_service import answer_cache, normalize_text
+from .context_service import estimate_tokens
+from .document_store import document_store, DocumentStatus
+from .llm_service import llm_service, LLMOverloadedError, LLMUnavailableError
+from .text_store import text_store
+
+logger = logging.getLogger(__name__)
+
+
+class DigestStatus:
+    PENDING = "pending"
+    BUILDING = "building"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class DigestIntent:
+    SUMMARY = "summary"
+    ABOUT = "about"
+    KEY_POINTS = "key_points"
+
+
+# ===== Question intents the digest answers =====
+# Whole-question patterns only: "summarize the payment terms" is a
+# retrieval question, "summarize this document" is not
+
+_POLITE_PREFIX = re.compile(
+    r"^(?:(?:please|pls|can you|could you|would you|tolong|sila|boleh tak|bolehkah|boleh|cuba) )+"
+)
+_POLITE_SUFFIX = re.compile(r"(?: (?:please|for me|briefly|in brief|ya|sikit|sahaja))+$")
+
+_THING = (
+    r"(?:(?:this|the|my|that)(?: uploaded| attached)? "
+    r"(?:document|doc|file|pdf|text|report|paper|article|contract|spreadsheet)|this|it)"
+)
+_OBJECT = rf"(?:(?:of|in|for) )?{_THING}"
+_THING_MS = r"(?:(?:dokumen|fail|teks|laporan|kertas|artikel|kontrak)(?: ini| tersebut)?|ini)"
+_OBJECT_MS = rf"(?:(?:bagi|untuk|kepada|dalam|daripada|dari) )?{_THING_MS}"
+
+INTENT_PATTERNS = [
+    (DigestIntent.SUMMARY, re.compile(
+        rf"(?:summari[sz]e|(?:give me|write|provide|make) a (?:short |brief )?summary|(?:short |brief )?summary|tl;?dr)"
+        rf"(?: {_OBJECT})?"
+    )),
+    (DigestIntent.ABOUT, re.compile(
+        rf"what(?: is|'s)? {_THING} about|what (?:does|do) {_THING} (?:say|cover|contain|discuss|talk about)"
+        rf"|what is in {_THING}"
+    )),
+    (DigestIntent.KEY_POINTS, re.compile(
+        rf"(?:(?:list|give me|show me|what are|extract) )?(?:the )?(?:key|main|important|major) "
+        rf"(?:points|takeaways|ideas|findings|highlights)(?: {_OBJECT})?|highlights(?: {_OBJECT})?"
+    )),
+    # Malay
+    (DigestIntent.SUMMARY, re.compile(
+        rf"(?:ringkaskan|rumuskan|(?:buat|buatkan|beri|berikan) (?:satu )?(?:ringkasan|rumusan)|ringkasan|rumusan)"
+        rf"(?: {_OBJECT_MS})?"
+    )),
+    (DigestIntent.ABOUT, re.compile(
+        rf"{_THING_MS} (?:adalah |ialah )?(?:tentang|mengenai|berkenaan) apa"
+        rf"|apa(?:kah)? (?:isi|kandungan) {_THING_MS}|(?:tentang|mengenai) apa(?:kah)? {_THING_MS}"
+    )),
+    (DigestIntent.KEY_POINTS, re.compile(
+        rf"(?:(?:senaraikan|apakah|berikan|beri|nyatakan) )?(?:perkara|isi|poin) (?:utama|penting)(?: {_OBJECT_MS})?"
+        rf"|intipati(?: {_OBJECT_MS})?"
+    )),
+]
+
+
+def detect_intent(question: str) -> Optional[str]:
+    """The DigestIntent a question asks for, or None for any other question"""
+    text = normalize_text(question)
+    text = _POLITE_SUFFIX.sub("", _POLITE_PREFIX.sub("", text))
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.fullmatch(text):
+            return intent
+    return None
+
+
+def format_digest(digest: Dict[str, Any], intent: str, language: str = "en") -> str:
+    """Answer text for a DigestIntent"""
+    heading = "Perkara utama:" if language == "ms" else "Key points:"
+    points = "\n".join(f"- {point}" for point in digest.get("key_points", []))
+    if intent == DigestIntent.ABOUT or not points:
+        return digest["summary"]
+    if intent == DigestIntent.KEY_POINTS:
+        return f"{heading}\n{points}"
+    return f"{digest['summary']}\n\n{heading}\n{points}"
+
+
+def overview_text(digest: Dict[str, Any], token_budget: int) -> str:
+    """The leading sentences of a digest summary that fit `token_budget`"""
+    taken = []
+    tokens = 0
+    for sentence in re.split(r"(?<=[.!?])\s+", digest.get("summary", "").strip()):
+        tokens += estimate_tokens(sentence)
+        if tokens > token_budget:
+            break
+        taken.append(sentence)
+    return " ".join(taken)
+
+
+# ===== Map-reduce prompts =====
+
+_FORMAT = """Write in the same language as the text. Use ONLY facts stated in the text.
+            Reply in exactly this format, keeping the two headings in English:
+            SUMMARY: <{sentences} sentences>
+            KEY POINTS:
+            - <point>
+            (at most {points} key points, one per line)"""
+
+
+def _map_prompt(section: str, filename: str, part: int, parts: int) -> str:
+    return f"""
+            You are summarizing part {part} of {parts} of the document "{filename}".
+
+            TEXT:
+            <<<BEGIN TEXT>>>
+            {section}
+            <<<END TEXT>>>
+
+            {_FORMAT.format(sentences="3 to 5", points=5)}
+            """
+
+
+def _reduce_prompt(partials: List[str], filename: str) -> str:
+    summaries = "\n\n".join(f"[Part {i}]\n{partial.strip()}" for i, partial in enumerate(partials, 1))
+    return f"""
+            Below are summaries of consecutive parts of the document "{filename}".
+            Combine them into one summary of everything they cover, merging
+            repeated points and keeping the most important ones.
+
+            PART SUMMARIES:
+            <<<BEGIN TEXT>>>
+            {summaries}
+            <<<END TEXT>>>
+
+            {_FORMAT.format(sentences="4 to 6", points=settings.DIGEST_KEY_POINTS)}
+            """
+
+
+_SUMMARY = re.compile(r"(?:summary|ringkasan)\s*:\s*(.*?)(?=(?:key points|perkara utama)\s*:|$)", re.I | re.S)
+_KEY_POINTS = re.compile(r"(?:key points|perkara utama)\s*:\s*(.*)", re.I | re.S)
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*(.+?)\s*$", re.M)
+
+
+def parse_digest(text: str) -> Tuple[str, List[str]]:
+    """(summary, key points) of a map or reduce reply"""
+    summary = _SUMMARY.search(text)
+    points = _KEY_POINTS.search(text)
+    summary_text = summary.group(1) if summary else text[:points.start()] if points else text
+    key_points = _BULLET.findall(points.group(1)) if points else []
+    return " ".join(summary_text.split()), key_points[:settings.DIGEST_KEY_POINTS]
+
+
+class DigestService:
+    """Precomputed summary and key points of each ready document.
+
+    Built in the background after ingestion by hierarchical map-reduce
+    over the stored text: every section of about DIGEST_SECTION_TOKENS is
+    summarized, then the partial summaries are combined a group at a time
+    until one remains. One generation runs at a time and each only starts
+    while no question is using or waiting for the model, so a question
+    waits for at most one digest step. The digest lives on the document
+    record (shared by every upload of the same content); documents that
+    were ready before digests were enabled are backfilled, newest first.
+
+    Idleness is judged per process: with several API workers, each runs
+    its own builder and a question on one worker can still queue in Ollama
+    behind a digest step started by another.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.current: Optional[str] = None
+        self._built = 0
+        self._failed = 0
+
+    def notify(self):
+        """A document became ready; claim it without waiting for the next poll"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """The digest of a document, if it has been built"""
+        document = await document_store.get(doc_id, {"digest": 1})
+        digest = document.get("digest") if document else None
+        if digest and digest.get("status") == DigestStatus.READY:
+            return digest
+        return None
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now()
+        return await document_store.collection.find_one_and_update(
+            {"status": DocumentStatus.READY, "$or": [
+                {"digest": {"$exists": False}},
+                {"digest.status": DigestStatus.PENDING, "digest.available_at": {"$lte": now}},
+                # Lease expired: the process building it is gone
+                {"digest.status": DigestStatus.BUILDING, "digest.lease_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "digest.status": DigestStatus.BUILDING,
+                    "digest.lease_until": now + timedelta(seconds=settings.DIGEST_LEASE_S)
+                },
+                "$inc": {"digest.attempts": 1}
+            },
+            projection={"digest": 1},
+            # Fresh uploads are the ones about to be asked about
+            sort=[("created_at", -1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _renew(self, doc_id: str):
+        await document_store.collection.update_one(
+            {"_id": doc_id, "digest.status": DigestStatus.BUILDING},
+            {"$set": {"digest.lease_until": datetime.now() + timedelta(seconds=settings.DIGEST_LEASE_S)}}
+        )
+
+    async def _generate(self, doc_id: str, prompt: str) -> str:
+        """One map or reduce generation, run when the model has nothing else to do"""
+        renewed_at = time.monotonic()
+        while True:
+            while not llm_service.idle:
+                if time.monotonic() - renewed_at >= settings.DIGEST_LEASE_S / 3:
+                    # A busy spell can outlast the lease; don't let another process reclaim it
+                    await self._renew(doc_id)
+                    renewed_at = time.monotonic()
+                await asyncio.sleep(settings.DIGEST_IDLE_POLL_S)
+            try:
+                result = await llm_service.generate(
+                    prompt,
+                    options={"num_predict": settings.DIGEST_MAX_TOKENS},
+                    timeout=settings.DIGEST_REQUEST_TIMEOUT_S
+                )
+            except LLMOverloadedError:
+                # Questions arrived meanwhile; they go first
+                continue
+            await self._renew(doc_id)
+            return result.get("response", "")
+
+    async def build_digest(self, doc_id: str, filename: str) -> Dict[str, Any]:
+        """Map-reduce a document's stored text into a digest"""
+        budget = settings.DIGEST_SECTION_TOKENS
+        total_tokens = 0
+        async for block in text_store.iter_text(doc_id):
+            total_tokens += estimate_tokens(block)
+        if not total_tokens:
+            raise ValueError("Document has no text to summarize")
+
+        # Very long documents: summarize evenly spaced sections
+        sections = math.ceil(total_tokens / budget)
+        stride = math.ceil(sections / max(1, settings.DIGEST_MAX_SECTIONS))
+        parts = math.ceil(sections / stride)
+        partials = []
+        index = 0
+        async for section in _sections(doc_id, budget):
+            if index % stride == 0:
+                part = len(partials) + 1
+                partials.append(await self._generate(doc_id, _map_prompt(section, filename, part, max(part, parts))))
+            index += 1
+
+        summarized = len(partials)
+        while len(partials) > 1:
+            partials = [
+                await self._generate(doc_id, _reduce_prompt(group, filename)) if len(group) > 1 else group[0]
+                for group in _groups(partials, budget)
+            ]
+
+        summary, key_points = parse_digest(partials[0])
+        if not summary:
+            raise ValueError("The model returned an empty summary")
+        return {
+            "summary": summary,
+            "key_points": key_points,
+            "sections": index,
+            "sections_summarized": summarized,
+            "model": llm_service.model
+        }
+
+    async def _build(self, document: Dict[str, Any]):
+        doc_id = document["_id"]
+        attempts = document["digest"].get("attempts", 1)
+        started = time.monotonic()
+        self.current = doc_id
+        try:
+            # Shared documents are labelled with the first uploader's file
+            file_doc = await mongodb.db.files.find_one({"doc_id": doc_id}, {"filename": 1}, sort=[("_id", 1)])
+            digest = await self.build_digest(doc_id, file_doc["filename"] if file_doc else "document")
+        except asyncio.CancelledError:
+            # Shutting down: hand the document back instead of waiting for the lease
+            await self._requeue(doc_id, attempts - 1, datetime.now())
+            raise
+        except Exception as e:
+            # Ollama being down says nothing about the document: don't count it
+            counted = attempts - 1 if isinstance(e, LLMUnavailableError) else attempts
+            if counted >= settings.DIGEST_MAX_ATTEMPTS:
+                logger.error(f"❌ Digest of {doc_id} failed: {e}")
+                self._failed += 1
+                await document_store.collection.update_one(
+                    {"_id": doc_id, "digest.status": DigestStatus.BUILDING},
+                    {"$set": {"digest": {"status": DigestStatus.FAILED, "attempts": counted, "error": str(e)}}}
+                )
+            else:
+                logger.warning(f"⚠️ Digest of {doc_id} attempt {attempts} failed: {e}")
+                backoff = settings.DIGEST_RETRY_BACKOFF_S * 2 ** max(0, counted - 1)
+                await self._requeue(doc_id, counted, datetime.now() + timedelta(seconds=backoff), str(e))
+            return
+        finally:
+            self.current = None
+
+        digest.update(
+            status=DigestStatus.READY,
+            build_s=round(time.monotonic() - started, 1),
+            created_at=datetime.now()
+        )
+        result = await document_store.collection.update_one(
+            {"_id": doc_id, "digest.status": DigestStatus.BUILDING},
+            {"$set": {"digest": digest}}
+        )
+        if not result.matched_count:
+            # Deleted (or claimed again after a lost lease) meanwhile
+            return
+        self._built += 1
+        # Answers cached before the digest existed did not use it
+        async for file_doc in mongodb.db.files.find({"doc_id": doc_id}, {"session_id": 1}):
+            answer_cache.invalidate_tag(file_doc["session_id"])
+        logger.info(f"📝 Digest of {doc_id} built from {digest['sections_summarized']} sections in {digest['build_s']}s")
+
+    async def _requeue(self, doc_id: str, attempts: int, available_at: datetime, error: Optional[str] = None):
+        await document_store.collection.update_one(
+            {"_id": doc_id, "digest.status": DigestStatus.BUILDING},
+            {"$set": {"digest": {
+                "status": DigestStatus.PENDING,
+                "attempts": attempts,
+                "available_at": available_at,
+                "error": error
+            }}}
+        )
+
+    async def _loop(self):
+        while True:
+            # Cleared before claiming so a notify during the claim still wakes us
+            self._wakeup.clear()
+            try:
+                document = await self._claim()
+            except Exception as e:
+                logger.error(f"❌ Failed to claim a document digest: {e}")
+                document = None
+
+            if document is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.DIGEST_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._build(document)
+
+    def start(self):
+        if not settings.DIGEST_ENABLED:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info("✅ Started document digest task")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.DIGEST_ENABLED,
+            "building": self.current,
+            "built": self._built,
+            "failed": self._failed
+        }
+
+
+def _groups(partials: List[str], budget: int) -> List[List[str]]:
+    """Consecutive partial summaries, grouped to about `budget` tokens (at least two per group)"""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    tokens = 0
+    for partial in partials:
+        cost = estimate_tokens(partial)
+        if len(current) >= 2 and tokens + cost > budget:
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(partial)
+        tokens += cost
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+
+async def _sections(doc_id: str, budget: int) -> AsyncIterator[str]:
+    """A document's text in sections of about `budget` tokens"""
+    words: List[str] = []
+    tokens = 0
+    async for block in text_store.iter_text(doc_id):
+        for word in block.split():
+            words.append(word)
+            tokens += estimate_tokens(word)
+            if tokens >= budget:
+                yield " ".join(words)
+                words, tokens = [], 0
+    if words:
+        yield " ".join(words)
+
+
+digest_service = DigestService()
@@ -0,0 +1,174 @@
+# backend/src/services/document_store.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..core.database import mongodb
+
+logger = logging.getLogger(__name__)
+
+
+# Uploads of content that is being deleted wait this long for the purge
+ACQUIRE_RETRIES = 50
+ACQUIRE_RETRY_S = 0.1
+
+
+class DocumentStatus:
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    DELETING = "deleting"  # unreferenced; its chunks, text and file are being purged
+
+
+class DocumentBusyError(Exception):
+    """Raised when uploaded content matches a document that is still being deleted"""
+
+
+class DocumentStore:
+    """Content-addressed registry of uploaded documents.
+
+    One record per distinct file content (`_id` is the SHA-256 of the bytes)
+    holds the stored file path and the vector chunk count; the extracted
+    text lives in `text_store`. Sessions reference it through `doc_id` on their `files` record,
+    and `refcount` tracks how many sessions do so.
+
+    Deleting is two-phase: the record is marked `deleting`, its data is
+    purged, and only then is the record removed. Until then the content
+    can't be acquired again, so a re-upload never has its file, job or
+    chunks (all keyed by the content hash) swept up by the purge.
+    """
+
+    @property
+    def collection(self):
+        return mongodb.db.documents
+
+    async def acquire(self, content_hash: str, file_path: str, file_size: int) -> Tuple[Dict[str, Any], bool]:
+        """Add a reference to a document, creating it if new.
+
+        Returns (document, created). When `created` is False the content was
+        already known and `file_path` should be discarded in favour of
+        `document["file_path"]`. Raises DocumentBusyError if the content is
+        still being deleted after a few seconds.
+        """
+        for _ in range(ACQUIRE_RETRIES):
+            now = datetime.now()
+            try:
+                document = await self.collection.find_one_and_update(
+                    {"_id": content_hash, "status": {"$ne": DocumentStatus.DELETING}},
+                    {
+                        "$inc": {"refcount": 1},
+                        "$set": {"updated_at": now},
+                        "$setOnInsert": {
+                            "file_path": file_path,
+                            "file_size": file_size,
+                            "status": DocumentStatus.PENDING,
+                            "chunk_count": 0,
+                            "created_at": now
+                        }
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # A `deleting` record holds the id until its purge is done
+                await asyncio.sleep(ACQUIRE_RETRY_S)
+                continue
+            return document, document["refcount"] == 1
+        raise DocumentBusyError(f"Document {content_hash} is being deleted")
+
+    async def get_many(self, content_hashes, projection: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Fetch several documents in one query, keyed by content hash"""
+        cursor = self.collection.find({"_id": {"$in": list(content_hashes)}}, projection)
+        return {document["_id"]: document async for document in cursor}
+
+    async def get(self, content_hash: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": content_hash}, projection)
+
+    async def resolve_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Look up the file record of a session (doc_id and filename only)"""
+        return await mongodb.db.files.find_one(
+            {"session_id": session_id},
+            {"doc_id": 1, "filename": 1}
+        )
+
+    async def mark_ready(self, content_hash: str, text_chars: int, chunk_count: int) -> bool:
+        """Returns False if the document was deleted while it was ingested"""
+        result = await self.collection.update_one(
+            {"_id": content_hash, "status": {"$ne": DocumentStatus.DELETING}},
+            {
+                "$set": {
+                    "status": DocumentStatus.READY,
+                    "text_chars": text_chars,
+                    "chunk_count": chunk_count,
+                    "updated_at": datetime.now()
+                },
+                "$unset": {"text_content": ""}
+            }
+        )
+        return result.matched_count == 1
+
+    async def mark_pending(self, content_hash: str):
+        """Queue a failed document for another ingestion attempt"""
+        await self.collection.update_one(
+            {"_id": content_hash},
+            {
+                "$set": {"status": DocumentStatus.PENDING, "updated_at": datetime.now()},
+                "$unset": {"error": "", "partial_cleared": ""}
+            }
+        )
+
+    async def mark_failed(self, content_hash: str, error: str):
+        await self.collection.update_one(
+            {"_id": content_hash, "status": {"$ne": DocumentStatus.DELETING}},
+            {"$set": {
+                "status": DocumentStatus.FAILED,
+                "error": error,
+                "updated_at": datetime.now()
+            }}
+        )
+
+    async def mark_partial_cleared(self, content_hash: str, before: datetime) -> bool:
+        """Claim a failed document (untouched since `before`) for cleanup of
+        its partial chunks; False if it was retried or claimed meanwhile"""
+        result = await self.collection.update_one(
+            {
+                "_id": content_hash,
+                "status": DocumentStatus.FAILED,
+                "partial_cleared": {"$ne": True},
+                "updated_at": {"$lt": before}
+            },
+            {"$set": {"partial_cleared": True}}
+        )
+        return result.modified_count == 1
+
+    async def release(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Drop one reference. Returns the document if this was the last one.
+
+        The record is marked `deleting` in that case; the caller owns
+        cleanup of the stored file and vector chunks, then calls `remove`.
+        """
+        await self.collection.update_one(
+            {"_id": content_hash},
+            {"$inc": {"refcount": -1}}
+        )
+        # Only if no new reference raced in after the decrement
+        return await self.claim_for_deletion(content_hash, {"refcount": {"$lte": 0}})
+
+    async def claim_for_deletion(self, content_hash: str, conditions: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Mark a document `deleting` if it matches `conditions`, returns it if so"""
+        return await self.collection.find_one_and_update(
+            {"_id": content_hash, "status": {"$ne": DocumentStatus.DELETING}, **conditions},
+            {"$set": {"status": DocumentStatus.DELETING, "updated_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def remove(self, content_hash: str):
+        """Delete the record of a `deleting` document once its data is purged"""
+        await self.collection.delete_one({"_id": content_hash, "status": DocumentStatus.DELETING})
+
+
+document_store = DocumentStore()
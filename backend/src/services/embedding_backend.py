@@ -0,0 +1,63 @@
+# backend/src/services/embedding_backend.py
+import logging
+import re
+from pathlib import Path
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Dynamically quantized ONNX files, as published with sentence-transformers
+# models and as written by export_dynamic_quantized_onnx_model
+QUANTIZED_FILES = {
+    "arm64": "model_qint8_arm64.onnx",
+    "avx2": "model_quint8_avx2.onnx",
+    "avx512": "model_qint8_avx512.onnx",
+    "avx512_vnni": "model_qint8_avx512_vnni.onnx",
+}
+
+
+def load_embedding_model(name: str, backend: str):
+    """A SentenceTransformer for `name` running on `backend`.
+
+    - torch: the PyTorch model in float32
+    - onnx: the same weights on ONNX Runtime
+    - onnx-int8: ONNX Runtime with int8 weights (EMBEDDING_QUANTIZATION
+      picks the CPU kernels); models published without a quantized file
+      are exported and quantized once into EMBEDDING_CACHE_DIR
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(name)
+    if backend == "onnx":
+        return SentenceTransformer(name, backend="onnx")
+    if backend == "onnx-int8":
+        return _load_quantized(name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend} (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+
+
+def _load_quantized(name: str):
+    from sentence_transformers import SentenceTransformer
+
+    config = settings.EMBEDDING_QUANTIZATION
+    if config not in QUANTIZED_FILES:
+        raise ValueError(f"Unknown EMBEDDING_QUANTIZATION: {config} (expected one of {', '.join(QUANTIZED_FILES)})")
+    file_name = f"onnx/{QUANTIZED_FILES[config]}"
+
+    try:
+        return SentenceTransformer(name, backend="onnx", model_kwargs={"file_name": file_name})
+    except Exception as e:
+        logger.info(f"📦 No published {file_name} for {name} ({e}), quantizing locally")
+
+    export_dir = Path(settings.EMBEDDING_CACHE_DIR) / re.sub(r"[^A-Za-z0-9._-]", "_", name)
+    if not (export_dir / file_name).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        model = SentenceTransformer(name, backend="onnx")
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, config, str(export_dir))
+        logger.info(f"✅ Quantized {name} to {export_dir / file_name}")
+    return SentenceTransformer(str(export_dir), backend="onnx", model_kwargs={"file_name": file_name})
@@ -0,0 +1,186 @@
+# backend/src/services/embedding_executor.py
+import asyncio
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+QUERY_PRIORITY = 0
+INGEST_PRIORITY = 1
+
+
+@dataclass(order=True)
+class _EncodeJob:
+    priority: int
+    seq: int
+    texts: List[str] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class EmbeddingExecutor:
+    """Runs encode calls in a worker pool, micro-batching concurrent queries.
+
+    Query encodes that arrive within `EMBEDDING_BATCH_WINDOW_MS` of each other
+    are merged into one `encode()` call of at most `EMBEDDING_MAX_BATCH` texts.
+    Ingestion encodes are split into batches of the same size and queued at a
+    lower priority, so interactive queries overtake them between batches.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray]):
+        self._encode_fn = encode_fn
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._stats = {
+            "batches": 0,
+            "texts": 0,
+            "max_batch_size": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+            "jobs": 0
+        }
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        worker_count = max(1, settings.EMBEDDING_WORKERS)
+        self._queue = asyncio.PriorityQueue()
+        self._pool = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="embedding")
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(worker_count)
+        ]
+
+    async def _submit(self, texts: List[str], priority: int) -> np.ndarray:
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        job = _EncodeJob(
+            priority=priority,
+            seq=next(self._seq),
+            texts=texts,
+            future=loop.create_future(),
+            enqueued_at=loop.time()
+        )
+        self._queue.put_nowait(job)
+        return await job.future
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        """Encode a single interactive query, returns a 1-D vector"""
+        embeddings = await self._submit([text], QUERY_PRIORITY)
+        return embeddings[0]
+
+    async def encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode many interactive queries in one batch, returns a 2-D matrix"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return await self._submit(list(texts), QUERY_PRIORITY)
+
+    async def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Encode ingestion texts at low priority, returns a 2-D matrix"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batch_size = max(1, settings.EMBEDDING_MAX_BATCH)
+        parts = await asyncio.gather(*[
+            self._submit(texts[i:i + batch_size], INGEST_PRIORITY)
+            for i in range(0, len(texts), batch_size)
+        ])
+        return np.vstack(parts)
+
+    async def _collect_batch(self, first: _EncodeJob) -> List[_EncodeJob]:
+        """Gather more queued queries behind `first` within the batch window"""
+        batch = [first]
+        if first.priority != QUERY_PRIORITY:
+            return batch
+
+        loop = asyncio.get_running_loop()
+        size = len(first.texts)
+        deadline = loop.time() + settings.EMBEDDING_BATCH_WINDOW_MS / 1000
+        while size < settings.EMBEDDING_MAX_BATCH:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if job.priority != QUERY_PRIORITY:
+                # Ingestion work waits for the next round
+                self._queue.put_nowait(job)
+                break
+            batch.append(job)
+            size += len(job.texts)
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = await self._collect_batch(first)
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+
+            started = loop.time()
+            texts = [text for job in batch for text in job.texts]
+            try:
+                embeddings = await loop.run_in_executor(self._pool, self._encode_fn, texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            offset = 0
+            for job in batch:
+                count = len(job.texts)
+                if not job.future.done():
+                    job.future.set_result(embeddings[offset:offset + count])
+                offset += count
+
+            # Observed directly: this task outlives the request that started it
+            STAGE_SECONDS.observe(loop.time() - started, stage="embedding_batch")
+            self._record(batch, len(texts), started)
+
+    def _record(self, batch: List[_EncodeJob], size: int, started: float):
+        stats = self._stats
+        stats["batches"] += 1
+        stats["texts"] += size
+        stats["jobs"] += len(batch)
+        stats["max_batch_size"] = max(stats["max_batch_size"], size)
+        for job in batch:
+            wait_ms = (started - job.enqueued_at) * 1000
+            stats["queue_wait_ms_total"] += wait_ms
+            stats["queue_wait_ms_max"] = max(stats["queue_wait_ms_max"], wait_ms)
+
+    def stats(self) -> Dict[str, float]:
+        stats = self._stats
+        return {
+            "batches": stats["batches"],
+            "texts": stats["texts"],
+            "avg_batch_size": stats["texts"] / stats["batches"] if stats["batches"] else 0.0,
+            "max_batch_size": stats["max_batch_size"],
+            "avg_queue_wait_ms": stats["queue_wait_ms_total"] / stats["jobs"] if stats["jobs"] else 0.0,
+            "max_queue_wait_ms": stats["queue_wait_ms_max"],
+            "queue_depth": self._queue.qsize() if self._queue else 0
+        }
+
+    async def close(self):
+        """Stop workers and the thread pool"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pool:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,292 @@
+# backend/src/services/extraction_service.py
+import asyncio
+import datetime
+import itertools
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from ..core.config import settings
+from ..core.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+DOCX_PARAGRAPHS_PER_SECTION = 50
+TXT_BLOCK_CHARS = 64 * 1024
+# Words per spreadsheet record; kept under TextChunker's 300-word chunks
+SPREADSHEET_GROUP_WORDS = 200
+# Records pulled from the spreadsheet reader per thread hop
+SPREADSHEET_RECORDS_PER_STEP = 16
+
+
+# ===== Worker functions (run in child processes, must stay top-level) =====
+
+def _pdf_page_count(file_path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) of a PDF, one record per non-empty page"""
+    import pdfplumber
+    records = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_number in range(start, end):
+            page_text = pdf.pages[page_number].extract_text()
+            if page_text:
+                records.append({"page": page_number + 1, "text": page_text})
+    return records
+
+
+def _extract_docx(file_path: str) -> List[Dict]:
+    from docx import Document
+    doc = Document(file_path)
+    paragraphs = [para.text for para in doc.paragraphs]
+    return [
+        {"section": i // DOCX_PARAGRAPHS_PER_SECTION + 1,
+         "text": "\n".join(paragraphs[i:i + DOCX_PARAGRAPHS_PER_SECTION])}
+        for i in range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_SECTION)
+    ]
+
+
+def _extract_xls(file_path: str) -> List[Dict]:
+    """Legacy .xls (no streaming reader available): every sheet via pandas"""
+    import pandas as pd
+    sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+    records = []
+    for sheet_name, sheet_df in sheets.items():
+        rows = sheet_df.itertuples(index=False, name=None)
+        records.extend(_sheet_row_groups(str(sheet_name), rows))
+    return _number_sections(records)
+
+
+# ==========================================================================
+
+# ===== Spreadsheet row groups =====
+
+def _format_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN from pandas
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+def _sheet_row_groups(sheet_name: str, rows: Iterable[Sequence]) -> Iterator[Dict]:
+    """Compact records of consecutive rows, each repeating the sheet's header.
+
+    The first non-empty row is taken as the header. Rows are written as
+    ` | `-joined cells ending in a period, so the chunker treats every row
+    as a sentence; groups stay under a chunk in size so each chunk knows
+    which sheet and columns its values belong to.
+    """
+    header = None
+    lines: List[str] = []
+    words = 0
+    first_row = last_row = 0
+
+    def record() -> Dict:
+        text = f"Sheet {sheet_name}, rows {first_row}-{last_row}. Columns: {header}.\n" + "\n".join(lines)
+        return {"sheet": sheet_name, "text": text}
+
+    for row_number, row in enumerate(rows, start=1):
+        cells = [_format_cell(value) for value in row]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        line = " | ".join(cells)
+        if header is None:
+            header = line
+            continue
+
+        if not lines:
+            first_row = row_number
+        last_row = row_number
+        lines.append(line + ".")
+        words += len(line.split())
+        if words >= SPREADSHEET_GROUP_WORDS:
+            yield record()
+            lines, words = [], 0
+
+    if lines:
+        yield record()
+    elif header is not None and first_row == 0:
+        # Header-only sheet (or a single row of values)
+        yield {"sheet": sheet_name, "text": f"Sheet {sheet_name}. {header}."}
+
+
+def _number_sections(records: Iterable[Dict], start: int = 0) -> List[Dict]:
+    numbered = []
+    for section, record in enumerate(records, start=start + 1):
+        record["section"] = section
+        numbered.append(record)
+    return numbered
+
+
+def _open_xlsx_groups(file_path: str) -> Iterator[Dict]:
+    """Row groups of every sheet, read with openpyxl's streaming reader.
+
+    Read-only mode parses the sheet XML lazily, so memory stays flat no
+    matter how many rows the workbook has.
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _sheet_row_groups(sheet.title, sheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def _take(iterator: Iterator[Dict], count: int) -> List[Dict]:
+    return list(itertools.islice(iterator, count))
+
+
+class ExtractionService:
+    """Extracts document text in a process pool, as a stream of records.
+
+    Records are dicts with a `text` key plus `page` (PDF) or `section`.
+    Large PDFs are split into page ranges extracted in parallel; records
+    still come out in document order.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.worker_count = settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that holds model threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        with timed("extraction"):
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def iter_records(self, file_path: str, filename: str) -> AsyncIterator[Dict]:
+        """Yield text records of a file in document order"""
+        _, file_extension = os.path.splitext(filename)
+        file_extension = file_extension.lower()
+
+        if file_extension == ".pdf":
+            async for record in self._iter_pdf(file_path):
+                yield record
+            return
+
+        if file_extension == ".txt":
+            async for record in self._iter_txt(file_path):
+                yield record
+            return
+
+        if file_extension == ".xlsx":
+            async for record in self._iter_xlsx(file_path):
+                yield record
+            return
+
+        if file_extension == ".docx":
+            records = await self._run(_extract_docx, file_path)
+        elif file_extension == ".xls":
+            records = await self._run(_extract_xls, file_path)
+        else:
+            records = [{"section": 1, "text": f"Unsupported file type: {file_extension}"}]
+
+        for record in records:
+            yield record
+
+    async def _iter_txt(self, file_path: str) -> AsyncIterator[Dict]:
+        """Plain text needs no parsing; stream it in blocks cut at whitespace"""
+        section = 0
+        carry = ""
+        with open(file_path, "r", encoding='utf-8') as f:
+            while True:
+                block = await asyncio.to_thread(f.read, TXT_BLOCK_CHARS)
+                if not block:
+                    break
+                block = carry + block
+                # Keep words whole so none is split across records
+                cut = max(block.rfind("\n"), block.rfind(" "))
+                if cut > 0:
+                    block, carry = block[:cut], block[cut + 1:]
+                else:
+                    carry = ""
+                section += 1
+                yield {"section": section, "text": block}
+        if carry:
+            yield {"section": section + 1, "text": carry}
+
+    async def _iter_xlsx(self, file_path: str) -> AsyncIterator[Dict]:
+        """Stream row groups of every sheet, a few records per thread hop.
+
+        openpyxl's reader can't be resumed in another process, so it runs
+        on a thread here, like the plain text reader.
+        """
+        groups = await asyncio.to_thread(_open_xlsx_groups, file_path)
+        section = 0
+        try:
+            while True:
+                with timed("extraction"):
+                    batch = await asyncio.to_thread(_take, groups, SPREADSHEET_RECORDS_PER_STEP)
+                if not batch:
+                    break
+                for record in _number_sections(batch, section):
+                    yield record
+                section += len(batch)
+        finally:
+            # Closes the workbook (and its zip file) even when abandoned early
+            await asyncio.to_thread(groups.close)
+
+    async def _iter_pdf(self, file_path: str) -> AsyncIterator[Dict]:
+        page_count = await self._run(_pdf_page_count, file_path)
+        pages_per_task = max(1, settings.EXTRACTION_PAGES_PER_TASK)
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+
+        # Keep a bounded window of ranges in flight and release them in order
+        window = self.worker_count * 2
+        pending = deque()
+        try:
+            for start, end in ranges:
+                pending.append(asyncio.ensure_future(
+                    self._run(_extract_pdf_pages, file_path, start, end)
+                ))
+                if len(pending) >= window:
+                    for record in await pending.popleft():
+                        yield record
+            while pending:
+                for record in await pending.popleft():
+                    yield record
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def extract_text(self, file_path: str, filename: str) -> str:
+        """Extract the whole text of a file as one string"""
+        parts = [record["text"] async for record in self.iter_records(file_path, filename)]
+        return "\n".join(parts).strip()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+extraction_service = ExtractionService()
@@ -0,0 +1,228 @@
+# backend/src/services/index_registry.py
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import settings
+from ..core.database import mongodb
+from .embedding_backend import EMBEDDING_BACKENDS
+
+# Chroma's collection name rules
+VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{1,61}[A-Za-z0-9]$")
+ACTIVE_ALIAS = "active"
+
+
+class IndexState:
+    BUILDING = "building"
+    READY = "ready"
+    ACTIVE = "active"
+    RETIRED = "retired"
+
+
+class OverlapMode:
+    # The original chunking: the last two sentences, whatever their length
+    SENTENCES = "sentences"
+    # Trailing text of up to `chunk_overlap` words
+    WORDS = "words"
+
+
+@dataclass(frozen=True)
+class IndexVersion:
+    """Everything that determines the contents of a vector collection"""
+    name: str
+    model: str
+    backend: str
+    chunk_size: int
+    chunk_overlap: int
+    overlap_mode: str = OverlapMode.SENTENCES
+
+    @classmethod
+    def default(cls) -> "IndexVersion":
+        """The version described by settings, used until an alias exists.
+
+        It keeps the original sentence overlap: its collection was chunked
+        that way before versions existed.
+        """
+        return cls(
+            name=settings.VECTOR_COLLECTION,
+            model=settings.EMBEDDING_MODEL,
+            backend=settings.EMBEDDING_BACKEND,
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            overlap_mode=OverlapMode.SENTENCES
+        )
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "IndexVersion":
+        return cls(
+            name=record["_id"],
+            model=record["model"],
+            # Records from before backends were versioned served the setting's
+            backend=record.get("backend", settings.EMBEDDING_BACKEND),
+            chunk_size=record["chunk_size"],
+            chunk_overlap=record["chunk_overlap"],
+            overlap_mode=record.get("overlap_mode", OverlapMode.SENTENCES)
+        )
+
+    def spec(self) -> Dict[str, Any]:
+        spec = asdict(self)
+        spec.pop("name")
+        return spec
+
+
+class IndexRegistry:
+    """Vector index versions and the alias that selects the live one.
+
+    `index_versions` holds one record per collection (spec, state, build
+    progress); `index_builds` records which documents a build has already
+    written, so an interrupted build resumes where it stopped. The alias
+    in `index_alias` is a single record, so switching versions is one
+    atomic write that every API process picks up on its next refresh.
+    """
+
+    @property
+    def versions(self):
+        return mongodb.db.index_versions
+
+    @property
+    def builds(self):
+        return mongodb.db.index_builds
+
+    @property
+    def alias(self):
+        return mongodb.db.index_alias
+
+    async def active_version(self) -> IndexVersion:
+        """The version the alias selects, else the default collection.
+
+        Once the default is registered its record governs it too, so
+        changing settings cannot alter how an existing collection embeds.
+        """
+        alias = await self.alias.find_one({"_id": ACTIVE_ALIAS})
+        name = alias["version"] if alias is not None else settings.VECTOR_COLLECTION
+        record = await self.versions.find_one({"_id": name})
+        if record is not None:
+            return IndexVersion.from_record(record)
+        return IndexVersion.default()
+
+    async def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return await self.versions.find_one({"_id": name})
+
+    async def list(self) -> List[Dict[str, Any]]:
+        return await self.versions.find().sort("created_at", -1).to_list(length=None)
+
+    async def create(self, version: IndexVersion) -> Dict[str, Any]:
+        """Register a version to build, or return it to resume its build.
+
+        Raises ValueError for an invalid name, or when a version of that
+        name exists with a different spec.
+        """
+        if not VERSION_NAME.match(version.name):
+            raise ValueError(f"Invalid index name: {version.name!r} (3-63 letters, digits, '.', '_' or '-')")
+        if version.backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {version.backend} (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+        now = datetime.now()
+        try:
+            await self.versions.insert_one({
+                "_id": version.name,
+                **version.spec(),
+                "state": IndexState.BUILDING,
+                "progress": {},
+                "created_at": now,
+                "updated_at": now
+            })
+        except DuplicateKeyError:
+            pass
+
+        record = await self.get(version.name)
+        if IndexVersion.from_record(record) != version:
+            raise ValueError(f"Index {version.name} already exists with a different spec: {IndexVersion.from_record(record).spec()}")
+        return record
+
+    async def ensure_registered(self, version: IndexVersion):
+        """Record a version that is serving without having been built (the default)"""
+        await self.versions.update_one(
+            {"_id": version.name},
+            {"$setOnInsert": {
+                **version.spec(),
+                "state": IndexState.ACTIVE,
+                "progress": {},
+                "created_at": datetime.now(),
+                "updated_at": datetime.now()
+            }},
+            upsert=True
+        )
+
+    async def set_state(self, name: str, state: str):
+        await self.versions.update_one(
+            {"_id": name},
+            {"$set": {"state": state, "updated_at": datetime.now()}}
+        )
+
+    async def update_progress(self, name: str, progress: Dict[str, Any]):
+        await self.versions.update_one(
+            {"_id": name},
+            {"$set": {"progress": progress, "updated_at": datetime.now()}}
+        )
+
+    async def activate(self, name: str) -> Optional[str]:
+        """Point the alias at `name`, returns the previously active version"""
+        previous = await self.alias.find_one_and_update(
+            {"_id": ACTIVE_ALIAS},
+            {"$set": {"version": name, "switched_at": datetime.now()}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        previous_name = previous["version"] if previous else settings.VECTOR_COLLECTION
+        if previous_name != name:
+            await self.set_state(previous_name, IndexState.RETIRED)
+        await self.set_state(name, IndexState.ACTIVE)
+        return previous_name
+
+    async def remove(self, name: str):
+        await self.versions.delete_one({"_id": name})
+        await self.builds.delete_many({"version": name})
+
+    # ===== Build progress =====
+
+    async def built_owners(self, name: str) -> Set[str]:
+        cursor = self.builds.find({"version": name}, {"owner": 1})
+        return {item["owner"] async for item in cursor}
+
+    async def is_built(self, name: str, owner: str) -> bool:
+        return await self.builds.find_one({"_id": f"{name}:{owner}"}, {"_id": 1}) is not None
+
+    async def mark_built(self, name: str, owner: str, chunk_count: int):
+        await self.builds.update_one(
+            {"_id": f"{name}:{owner}"},
+            {"$set": {
+                "version": name,
+                "owner": owner,
+                "chunk_count": chunk_count,
+                "built_at": datetime.now()
+            }},
+            upsert=True
+        )
+
+    async def mark_built_many(self, name: str, owners: List[str], batch_size: int = 1000):
+        """Record documents that are already in a collection (chunk counts unknown)"""
+        now = datetime.now()
+        for start in range(0, len(owners), batch_size):
+            await self.builds.bulk_write([
+                UpdateOne(
+                    {"_id": f"{name}:{owner}"},
+                    {"$setOnInsert": {"version": name, "owner": owner, "built_at": now}},
+                    upsert=True
+                )
+                for owner in owners[start:start + batch_size]
+            ], ordered=False)
+
+    async def unmark_built(self, name: str, owner: str):
+        await self.builds.delete_one({"_id": f"{name}:{owner}"})
+
+
+index_registry = IndexRegistry()
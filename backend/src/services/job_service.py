@@ -0,0 +1,242 @@
+# backend/src/services/job_service.py
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from ..core.config import settings
+from ..core.database import mongodb
+
+logger = logging.getLogger(__name__)
+
+
+class JobState:
+    QUEUED = "queued"
+    EXTRACTING = "extracting"
+    EMBEDDING = "embedding"
+    DONE = "done"
+    FAILED = "failed"
+
+    RUNNING = [EXTRACTING, EMBEDDING]
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobLostError(Exception):
+    """Raised when another worker has reclaimed a job this worker was running"""
+
+
+class JobService:
+    """Ingestion job queue persisted in the MongoDB `jobs` collection.
+
+    A fixed pool of `INGESTION_WORKERS` tasks claims queued jobs. A claim
+    holds a lease that a heartbeat renews while the job runs; jobs whose
+    lease expires (the process died mid-job) are picked up again, so work
+    survives restarts. Every write about a running job is conditional on
+    the worker and attempt that claimed it, so an attempt that lost its
+    lease can't overwrite its successor. Failed attempts are retried with
+    backoff up to `INGESTION_MAX_ATTEMPTS` times.
+    """
+
+    def __init__(self):
+        self._handler: Optional[JobHandler] = None
+        self._on_failure = None
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_id = uuid.uuid4().hex[:8]
+        self._last_progress: Dict[Any, float] = {}
+
+    @property
+    def collection(self):
+        return mongodb.db.jobs
+
+    async def enqueue(self, session_id: str, doc_id: str, payload: Dict[str, Any]) -> str:
+        now = datetime.now()
+        result = await self.collection.insert_one({
+            "session_id": session_id,
+            "doc_id": doc_id,
+            "state": JobState.QUEUED,
+            "attempts": 0,
+            "progress": {"records": 0, "chunks": 0},
+            "payload": payload,
+            "error": None,
+            "available_at": now,
+            "created_at": now,
+            "updated_at": now
+        })
+        if self._wakeup:
+            self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def latest_for_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"doc_id": doc_id},
+            {"payload": 0}
+        ).sort("created_at", -1).limit(1)
+        jobs = await cursor.to_list(length=1)
+        return jobs[0] if jobs else None
+
+    async def delete_for_document(self, doc_id: str):
+        """Drop the job history of a deleted document (running jobs finish first)"""
+        await self.collection.delete_many({"doc_id": doc_id, "state": {"$nin": JobState.RUNNING}})
+
+    def _owned(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter matching a job only while this attempt still holds it"""
+        return {"_id": job["_id"], "worker": self._worker_id, "attempts": job["attempts"]}
+
+    async def update_progress(self, job: Dict[str, Any], state: Optional[str] = None, force: bool = False, **progress):
+        """Record progress and renew the lease (throttled unless state changes).
+
+        Raises JobLostError if another worker has reclaimed the job.
+        """
+        now = time.monotonic()
+        if not force and state is None and now - self._last_progress.get(job["_id"], 0) < 1.0:
+            return
+        self._last_progress[job["_id"]] = now
+
+        update = {f"progress.{key}": value for key, value in progress.items()}
+        update["lease_until"] = datetime.now() + timedelta(seconds=settings.INGESTION_LEASE_S)
+        update["updated_at"] = datetime.now()
+        if state:
+            update["state"] = state
+        result = await self.collection.update_one(self._owned(job), {"$set": update})
+        if result.matched_count == 0:
+            raise JobLostError(f"Job {job['_id']} was reclaimed by another worker")
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"state": JobState.QUEUED, "available_at": {"$lte": now}},
+                # Lease expired: the worker that held it is gone
+                {"state": {"$in": JobState.RUNNING}, "lease_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "state": JobState.EXTRACTING,
+                    "worker": self._worker_id,
+                    "lease_until": now + timedelta(seconds=settings.INGESTION_LEASE_S),
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _heartbeat(self, job: Dict[str, Any], handler: asyncio.Task, lost: asyncio.Event):
+        """Renew the lease while the handler runs; stop it if the job was reclaimed.
+
+        Progress updates are throttled and a single extraction step can take
+        longer than the lease, so the lease can't rely on them.
+        """
+        while True:
+            await asyncio.sleep(settings.INGESTION_LEASE_S / 3)
+            try:
+                result = await self.collection.update_one(
+                    self._owned(job),
+                    {"$set": {"lease_until": datetime.now() + timedelta(seconds=settings.INGESTION_LEASE_S)}}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to renew lease of job {job['_id']}: {e}")
+                continue
+            if result.matched_count == 0:
+                lost.set()
+                handler.cancel()
+                return
+
+    async def _run(self, job: Dict[str, Any]):
+        lost = asyncio.Event()
+        handler = asyncio.create_task(self._handler(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, handler, lost))
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if lost.is_set():
+                logger.warning(f"⚠️ Job {job['_id']} attempt {job['attempts']} was reclaimed by another worker, abandoned")
+                return
+            # Shutting down: hand the job back instead of waiting for the lease
+            await self.collection.update_one(
+                self._owned(job),
+                {"$set": {"state": JobState.QUEUED, "updated_at": datetime.now()},
+                 "$inc": {"attempts": -1}}
+            )
+            raise
+        except JobLostError as e:
+            logger.warning(f"⚠️ {e}, attempt {job['attempts']} abandoned")
+        except Exception as e:
+            logger.error(f"❌ Job {job['_id']} attempt {job['attempts']} failed: {e}")
+            final = job["attempts"] >= settings.INGESTION_MAX_ATTEMPTS
+            backoff = settings.INGESTION_RETRY_BACKOFF_S * 2 ** (job["attempts"] - 1)
+            result = await self.collection.update_one(
+                self._owned(job),
+                {"$set": {
+                    "state": JobState.FAILED if final else JobState.QUEUED,
+                    "error": str(e),
+                    "available_at": datetime.now() + timedelta(seconds=backoff),
+                    "updated_at": datetime.now()
+                }}
+            )
+            if final and self._on_failure and result.matched_count:
+                await self._on_failure(job, e)
+        else:
+            await self.collection.update_one(
+                self._owned(job),
+                {"$set": {
+                    "state": JobState.DONE,
+                    "error": None,
+                    "finished_at": datetime.now(),
+                    "updated_at": datetime.now()
+                }}
+            )
+        finally:
+            heartbeat.cancel()
+            self._last_progress.pop(job["_id"], None)
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming so an enqueue during the claim still wakes us
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"❌ Failed to claim ingestion job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INGESTION_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    def start(self, handler: JobHandler, on_failure: Optional[Callable[[Dict[str, Any], Exception], Awaitable[None]]] = None):
+        """Start the worker pool; jobs left over from a previous run resume"""
+        self._handler = handler
+        self._on_failure = on_failure
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(max(1, settings.INGESTION_WORKERS))
+        ]
+        logger.info(f"✅ Started {len(self._workers)} ingestion workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def queue_depth(self) -> int:
+        return await self.collection.count_documents({"state": JobState.QUEUED})
+
+
+job_service = JobService()
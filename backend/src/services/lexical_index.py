@@ -0,0 +1,282 @@
+# backend/src/services/lexical_index.py
+import json
+import math
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from bson import Binary
+
+from ..core.config import settings
+from ..core.database import mongodb
+from .cache_service import TTLCache, shared_ttl
+
+# Words joined by - / . : stay one token as well (INV-2024001, 12/03/2024)
+_TOKEN = re.compile(r"\w+(?:[-/.:]\w+)*")
+_WORD = re.compile(r"\w+")
+_QUOTED = re.compile(r'"([^"]+)"')
+
+STOPWORDS = frozenset((
+    # English
+    "a an and are as at be but by do does for from has have how i in is it its "
+    "me my of on or our so that the their there these this to was were what when "
+    "where which who why will with you your "
+    # Malay
+    "adakah ada adalah akan apa apakah atau bagaimana bagi berapa dalam dan dari "
+    "dengan di ia ialah ini itu ke kepada mana oleh pada saya siapa tidak untuk yang"
+).split())
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """Lowercased terms; joined tokens are emitted whole and as their parts"""
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if token not in STOPWORDS:
+            yield token
+        if len(token) > len(_WORD.match(token).group()):
+            for part in _WORD.findall(token):
+                if part not in STOPWORDS:
+                    yield part
+
+
+def _is_code(token: str) -> bool:
+    """Letters mixed with digits (a12345), or digits joined by - / . : (INV-2024001, 12/03/2024).
+
+    Plain numbers are not codes: a year or an amount in a question says
+    nothing about which chunk is meant.
+    """
+    if len(token) < 3 or not any(ch.isdigit() for ch in token):
+        return False
+    return any(ch.isalpha() for ch in token) or len(_WORD.findall(token)) > 1
+
+
+def identifier_terms(query: str) -> Set[str]:
+    """Terms that must match exactly: codes and quoted phrases"""
+    terms = {match.group() for match in _TOKEN.finditer(query.lower()) if _is_code(match.group())}
+    for phrase in _QUOTED.findall(query):
+        terms.update(tokenize(phrase))
+    return terms
+
+
+@dataclass
+class LexicalPartition:
+    """BM25 postings of one document's chunks, assembled from its batches"""
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]]  # term -> (chunk indexes, term frequencies)
+    lengths: np.ndarray  # terms per chunk, by chunk index
+    chunk_count: int
+
+    @property
+    def avg_length(self) -> float:
+        return float(self.lengths.sum()) / self.chunk_count if self.chunk_count else 0.0
+
+
+@dataclass
+class LexicalMatch:
+    hits: List[Tuple[int, float]] = field(default_factory=list)  # (chunk index, BM25), best first
+    exact_rows: Set[int] = field(default_factory=set)  # chunks containing every code the query names
+
+    @property
+    def identifiers_matched(self) -> bool:
+        return bool(self.exact_rows)
+
+
+class LexicalIndex:
+    """Per-document BM25 index over the same chunks as the vector index.
+
+    Written by ingestion next to each batch of Chroma chunks, as one
+    zlib-compressed record per batch keyed by index version and owner
+    (doc_id, or session_id for legacy chunks). Searches load a document's
+    records once into in-memory postings, cached like the per-document
+    vector matrices.
+    """
+
+    @property
+    def collection(self):
+        return mongodb.db.lexical_index
+
+    async def add(self, version: str, owner: str, start_index: int, chunks: List[str]):
+        postings: Dict[str, List[int]] = {}
+        lengths = []
+        for offset, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).extend((offset, tf))
+
+        data = json.dumps({"lengths": lengths, "postings": postings}, separators=(",", ":"))
+        # Keyed by batch, so a retried ingestion overwrites its earlier attempt
+        await self.collection.replace_one(
+            {"_id": f"{version}:{owner}:{start_index}"},
+            {
+                "version": version,
+                "owner": owner,
+                "start": start_index,
+                "data": Binary(zlib.compress(data.encode("utf-8"), 6))
+            },
+            upsert=True
+        )
+        lexical_partitions.invalidate((version, owner))
+
+    async def delete(self, version: str, owner: str):
+        await self.collection.delete_many({"version": version, "owner": owner})
+        lexical_partitions.invalidate((version, owner))
+
+    async def drop(self, version: str):
+        """Delete everything of an index version"""
+        await self.collection.delete_many({"version": version})
+
+    async def lookup(self, version: str, owner: str, query: str, limit: int) -> LexicalMatch:
+        partition = await self._get_partition(version, owner)
+        if not partition.chunk_count:
+            return LexicalMatch()
+        return LexicalMatch(
+            hits=bm25_top_k(partition, list(dict.fromkeys(tokenize(query))), limit),
+            exact_rows=_exact_rows(partition, identifier_terms(query))
+        )
+
+    async def _get_partition(self, version: str, owner: str) -> LexicalPartition:
+        key = (version, owner)
+        partition = lexical_partitions.get(key)
+        if partition is not None:
+            return partition
+
+        async def load():
+            generation = lexical_partitions.generation(key)
+            records = await self.collection.find(
+                {"version": version, "owner": owner}, {"start": 1, "data": 1}
+            ).to_list(length=None)
+            # No postings (not ingested yet, or from before lexical indexing)
+            # assemble to an empty partition, cached like any other so legacy
+            # documents don't query MongoDB on every search; add() invalidates it
+            partition = _assemble(records)
+            lexical_partitions.set(key, partition, generation=generation)
+            return partition
+
+        return await lexical_partitions.single_flight(key, load)
+
+
+def _assemble(records: List[Dict]) -> LexicalPartition:
+    postings: Dict[str, List[List[int]]] = {}
+    lengths: Dict[int, int] = {}
+    for record in records:
+        batch = json.loads(zlib.decompress(record["data"]).decode("utf-8"))
+        start = record["start"]
+        for offset, length in enumerate(batch["lengths"]):
+            lengths[start + offset] = length
+        for term, pairs in batch["postings"].items():
+            rows, tfs = postings.setdefault(term, [[], []])
+            rows.extend(start + offset for offset in pairs[0::2])
+            tfs.extend(pairs[1::2])
+
+    length_array = np.zeros(max(lengths) + 1 if lengths else 0, dtype=np.float32)
+    for row, length in lengths.items():
+        length_array[row] = length
+    return LexicalPartition(
+        postings={
+            term: (np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        },
+        lengths=length_array,
+        chunk_count=len(lengths)
+    )
+
+
+def _exact_rows(partition: LexicalPartition, terms: Set[str]) -> Set[int]:
+    rows: Optional[Set[int]] = None
+    for term in terms:
+        entry = partition.postings.get(term)
+        if entry is None:
+            return set()
+        found = set(entry[0].tolist())
+        rows = found if rows is None else rows & found
+    return rows or set()
+
+
+def bm25_top_k(partition: LexicalPartition, terms: List[str], k: int) -> List[Tuple[int, float]]:
+    """Chunks matching any term, by BM25, best first"""
+    if not partition.chunk_count or k <= 0:
+        return []
+    scores = np.zeros(len(partition.lengths), dtype=np.float32)
+    avg_length = partition.avg_length or 1.0
+    for term in terms:
+        entry = partition.postings.get(term)
+        if entry is None:
+            continue
+        rows, tfs = entry
+        idf = math.log(1 + (partition.chunk_count - len(rows) + 0.5) / (len(rows) + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * partition.lengths[rows] / avg_length)
+        scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+    matched = np.flatnonzero(scores)
+    if len(matched) > k:
+        matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+    matched = matched[np.argsort(-scores[matched])]
+    return [(int(row), float(scores[row])) for row in matched]
+
+
+def reciprocal_rank_fusion(chunks: List[Dict], limit: int) -> List[Dict]:
+    """Order chunks by reciprocal rank fusion of their two rankings.
+
+    Chunks carry `vector_score` (cosine) and/or `lexical_score` (BM25);
+    entries with the same `chunk_id` are merged. `score` becomes the fused
+    score, scaled so that a chunk ranked first by both is 1.0. Chunks with
+    `exact_match` (every code the query names) come first, at 1.0: a
+    vector model is no judge of invoice numbers.
+    """
+    k = settings.HYBRID_RRF_K
+    merged: Dict[str, Dict] = {}
+    for chunk in chunks:
+        entry = merged.setdefault(chunk["chunk_id"], {})
+        entry.update({key: value for key, value in chunk.items() if value is not None})
+
+    fused = dict.fromkeys(merged, 0.0)
+    for key in ("vector_score", "lexical_score"):
+        ranked = sorted(
+            (chunk for chunk in merged.values() if chunk.get(key) is not None),
+            key=lambda chunk: chunk[key], reverse=True
+        )
+        for rank, chunk in enumerate(ranked, 1):
+            fused[chunk["chunk_id"]] += 1 / (k + rank)
+
+    results = sorted(
+        merged.values(),
+        key=lambda chunk: (bool(chunk.get("exact_match")), fused[chunk["chunk_id"]]),
+        reverse=True
+    )[:limit]
+    for chunk in results:
+        chunk["score"] = 1.0 if chunk.get("exact_match") else fused[chunk["chunk_id"]] * (k + 1) / 2
+    return results
+
+
+def has_evidence(chunk: Dict) -> bool:
+    """Whether a chunk's raw scores show it matches the query.
+
+    The fused `score` only ranks: whatever comes first scores high, however
+    poor the match. Chunks without raw scores are judged by `score`.
+    """
+    if chunk.get("exact_match"):
+        return True
+    vector_score, lexical_score = chunk.get("vector_score"), chunk.get("lexical_score")
+    if vector_score is None and lexical_score is None:
+        return chunk.get("score", 0) >= settings.MIN_VECTOR_SCORE
+    return (
+        (vector_score or 0) >= settings.MIN_VECTOR_SCORE
+        or (lexical_score or 0) >= settings.MIN_LEXICAL_SCORE
+    )
+
+
+# (index version, owner) -> LexicalPartition; the postings live in MongoDB,
+# so every API worker caches them
+lexical_partitions = TTLCache(
+    "lexical_partitions",
+    max_entries=settings.SESSION_INDEX_CACHE_SIZE,
+    ttl_seconds=shared_ttl(settings.SESSION_INDEX_CACHE_TTL_S)
+)
+
+lexical_index = LexicalIndex()
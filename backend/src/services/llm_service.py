@@ -0,0 +1,227 @@
+# backend/src/services/llm_service.py
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from ..core.config import settings
+from ..core.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """Base error for LLM calls"""
+
+
+class LLMOverloadedError(LLMError):
+    """Raised when the generation queue is full or waiting took too long"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a generation misses its deadline"""
+
+
+class LLMUnavailableError(LLMError):
+    """Raised when Ollama cannot be reached or returns an error status"""
+
+
+class LLMService:
+    """Async Ollama client with a shared connection pool and admission control.
+
+    At most `OLLAMA_MAX_CONCURRENCY` generations run at once. Up to
+    `OLLAMA_MAX_QUEUE` more may wait for a slot; anything beyond that is
+    rejected immediately so callers can answer 503 instead of piling up.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    @property
+    def model(self) -> str:
+        return settings.OLLAMA_MODEL
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            pool_size = settings.OLLAMA_MAX_CONCURRENCY
+            self._client = httpx.AsyncClient(
+                base_url=settings.OLLAMA_BASE_URL,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size
+                ),
+                timeout=httpx.Timeout(settings.OLLAMA_REQUEST_TIMEOUT_S, connect=5)
+            )
+        return self._client
+
+    def ensure_capacity(self):
+        """Raise LLMOverloadedError if a new generation would be rejected"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.OLLAMA_MAX_CONCURRENCY)
+
+        if self._slots.locked() and self._waiting >= settings.OLLAMA_MAX_QUEUE:
+            self._rejected += 1
+            raise LLMOverloadedError("Too many questions in progress, please retry shortly")
+
+    @asynccontextmanager
+    async def _slot(self, deadline: float):
+        """Wait for a generation slot, failing fast when the queue is full"""
+        self.ensure_capacity()
+
+        loop = asyncio.get_running_loop()
+        wait_budget = min(settings.OLLAMA_QUEUE_TIMEOUT_S, deadline - loop.time())
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(wait_budget, 0))
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise LLMOverloadedError("Timed out waiting for a free model slot")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def _deadline(self, timeout: Optional[float]) -> float:
+        timeout = timeout or settings.OLLAMA_REQUEST_TIMEOUT_S
+        return asyncio.get_running_loop().time() + timeout
+
+    def _payload(
+        self,
+        prompt: str,
+        stream: bool,
+        options: Optional[Dict[str, Any]],
+        context: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": 0.1,  # lower temp = less creativity = less hallucination
+                "top_p": 0.9,
+                **(options or {})
+            }
+        }
+        if context:
+            # Continue from a previous generation's state (multi-turn)
+            payload["context"] = context
+        return payload
+
+    async def generate(
+        self,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        context: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """Run a non-streaming generation and return Ollama's JSON reply"""
+        deadline = self._deadline(timeout)
+        async with self._slot(deadline):
+            started = asyncio.get_running_loop().time()
+            remaining = deadline - started
+            try:
+                response = await asyncio.wait_for(
+                    self.client.post("/api/generate", json=self._payload(prompt, False, options, context)),
+                    timeout=max(remaining, 0)
+                )
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise LLMTimeoutError("Generation exceeded its deadline")
+            except httpx.TimeoutException:
+                self._timeouts += 1
+                raise LLMTimeoutError("Ollama did not respond in time")
+            except httpx.ConnectError:
+                raise LLMUnavailableError("Ollama is not running. Please start it with 'ollama serve'")
+
+            if response.status_code != 200:
+                raise LLMUnavailableError(f"Ollama error: {response.status_code}")
+            record_stage("llm_total", asyncio.get_running_loop().time() - started)
+            return response.json()
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        context: Optional[List[int]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield Ollama's streamed JSON parts until the final `done` part.
+
+        Closing the iterator early closes the upstream connection, which
+        makes Ollama stop generating.
+        """
+        deadline = self._deadline(timeout)
+        loop = asyncio.get_running_loop()
+        async with self._slot(deadline):
+            started = loop.time()
+            first_token = True
+            try:
+                async with self.client.stream(
+                    "POST",
+                    "/api/generate",
+                    json=self._payload(prompt, True, options, context)
+                ) as response:
+                    if response.status_code != 200:
+                        raise LLMUnavailableError(f"Ollama error: {response.status_code}")
+
+                    async for line in response.aiter_lines():
+                        if loop.time() > deadline:
+                            self._timeouts += 1
+                            raise LLMTimeoutError("Generation exceeded its deadline")
+                        if not line:
+                            continue
+                        part = json.loads(line)
+                        if first_token and part.get("response"):
+                            first_token = False
+                            record_stage("llm_ttft", loop.time() - started)
+                        if part.get("done"):
+                            record_stage("llm_total", loop.time() - started)
+                        yield part
+                        if part.get("done"):
+                            return
+            except httpx.TimeoutException:
+                self._timeouts += 1
+                raise LLMTimeoutError("Ollama did not respond in time")
+            except httpx.ConnectError:
+                raise LLMUnavailableError("Ollama is not running. Please start it with 'ollama serve'")
+
+    @property
+    def idle(self) -> bool:
+        """No generation running or waiting for a slot"""
+        return self._in_flight == 0 and self._waiting == 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts
+        }
+
+    async def close(self):
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_service = LLMService()
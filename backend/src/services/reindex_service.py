@@ -0,0 +1,317 @@
+# backend/src/services/reindex_service.py
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.database import mongodb
+from .document_store import document_store, DocumentStatus
+from .index_registry import IndexState, IndexVersion, OverlapMode, index_registry
+from .lexical_index import lexical_index
+from .text_store import text_store
+from .vector_service import VectorService, vector_service
+from .vector_store import create_vector_store
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Prefix of build owners for sessions uploaded before content addressing
+LEGACY_PREFIX = "session:"
+
+
+class ReindexService:
+    """Builds index versions from the stored document text.
+
+    A build re-chunks and re-embeds every ready document into a new
+    collection while the active one keeps serving. Documents are handled
+    by REINDEX_WORKERS concurrent tasks and recorded as they finish, so an
+    interrupted build resumes with the documents it has not done yet.
+    Activating a version moves the alias, then catches up with documents
+    ingested into the previous version while the switch propagated.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.current: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start_build(self, version: IndexVersion, workers: Optional[int] = None, activate: bool = False):
+        """Run `build` as a background task of this process"""
+        if self.running:
+            raise RuntimeError(f"Index build {self.current} is already running")
+        self._task = asyncio.create_task(self.build(version, workers, activate))
+
+    async def build(self, version: IndexVersion, workers: Optional[int] = None, activate: bool = False,
+                    on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        record = await index_registry.create(version)
+        self.current = version.name
+        service = VectorService(version)
+        try:
+            logger.info(f"🏗️ Building index {version.name}: {version.spec()}")
+            progress = await self._build_pending(service, workers, on_progress)
+            if record["state"] == IndexState.BUILDING:
+                await index_registry.set_state(version.name, IndexState.READY)
+            logger.info(f"✅ Index {version.name} built: {progress}")
+            if activate:
+                await self.activate(version.name)
+            return progress
+        except Exception as e:
+            logger.error(f"❌ Index build {version.name} failed: {e}")
+            raise
+        finally:
+            self.current = None
+            await service.close()
+
+    async def activate(self, name: str, settle: bool = False) -> Dict[str, Any]:
+        """Make `name` the active version.
+
+        With `settle`, also wait INDEX_REFRESH_S for every process to
+        switch and catch up once more; otherwise that second catch-up runs
+        in the background.
+        """
+        record = await index_registry.get(name)
+        if record is None:
+            raise LookupError(f"Index {name} does not exist")
+        if record["state"] == IndexState.BUILDING:
+            raise ValueError(f"Index {name} is still building")
+
+        await self._register_serving(await index_registry.active_version())
+        previous = await index_registry.activate(name)
+        logger.info(f"🔀 Index alias switched from {previous} to {name}")
+        if vector_service.ready:
+            # This process serves requests: switch now rather than on the next refresh
+            await vector_service.refresh_index()
+
+        version = IndexVersion.from_record(record)
+        caught_up = await self.catch_up(version)
+        if settle:
+            await asyncio.sleep(settings.INDEX_REFRESH_S)
+            caught_up = await self.catch_up(version)
+        else:
+            asyncio.create_task(self._settle(version))
+        return {"previous": previous, "active": name, "caught_up": caught_up}
+
+    async def catch_up(self, version: IndexVersion) -> Dict[str, Any]:
+        """Index documents that became ready after the build covered them"""
+        service = VectorService(version)
+        try:
+            return await self._build_pending(service, None, None, record=False)
+        finally:
+            await service.close()
+
+    async def _settle(self, version: IndexVersion):
+        # Processes that had not refreshed yet may still have ingested into the old version
+        await asyncio.sleep(settings.INDEX_REFRESH_S)
+        try:
+            await self.catch_up(version)
+        except Exception as e:
+            logger.error(f"❌ Catch-up of index {version.name} failed: {e}")
+
+    async def drop(self, name: str):
+        """Delete a version that is not active, collection and records"""
+        record = await index_registry.get(name)
+        if record is None:
+            raise LookupError(f"Index {name} does not exist")
+        if (await index_registry.active_version()).name == name:
+            raise ValueError(f"Index {name} is active")
+        if self.current == name:
+            raise ValueError(f"Index {name} is being built")
+
+        store = create_vector_store(name, record["model"], IndexVersion.from_record(record).backend)
+        try:
+            await store.drop()
+        finally:
+            await store.close()
+        await lexical_index.drop(name)
+        await index_registry.remove(name)
+        logger.info(f"🗑️ Dropped index {name}")
+
+    async def index_document(self, version: IndexVersion, doc_id: str) -> int:
+        """Index one ready document into `version` unless it is there already.
+
+        For ingestions that finished into a version the alias moved away
+        from after the catch-ups of the switch had run.
+        """
+        if await index_registry.is_built(version.name, doc_id):
+            return 0
+        service = vector_service if vector_service.version == version else VectorService(version)
+        try:
+            return await self._index_owner(service, doc_id)
+        finally:
+            if service is not vector_service:
+                await service.close()
+
+    async def register_default(self):
+        """Pin the spec of the default version while it is serving.
+
+        Unregistered, it follows settings: a changed EMBEDDING_BACKEND would
+        embed queries differently from the chunks already stored. Changing
+        an existing version's backend takes a re-index build.
+        """
+        version = await index_registry.active_version()
+        if version.name == settings.VECTOR_COLLECTION:
+            await self._register_serving(version)
+
+    async def _register_serving(self, version: IndexVersion):
+        """Record the serving version before switching away from it.
+
+        The default version was never built by this service; every document
+        ready now was ingested into it, so they are recorded as built and a
+        later switch back only has to catch up with newer ones.
+        """
+        if await index_registry.get(version.name) is not None:
+            return
+        await index_registry.ensure_registered(version)
+        await index_registry.mark_built_many(version.name, await self._owners())
+
+    async def _owners(self) -> List[str]:
+        """Everything that has chunks: ready documents and legacy sessions"""
+        owners = [
+            document["_id"]
+            async for document in document_store.collection.find({"status": DocumentStatus.READY}, {"_id": 1})
+        ]
+        legacy = mongodb.db.files.find(
+            {"doc_id": {"$exists": False}, "text_content": {"$nin": [None, ""]}},
+            {"session_id": 1}
+        )
+        owners.extend([LEGACY_PREFIX + file_doc["session_id"] async for file_doc in legacy])
+        return owners
+
+    async def _build_pending(self, service: VectorService, workers: Optional[int],
+                             on_progress: Optional[ProgressCallback], record: bool = True) -> Dict[str, Any]:
+        """Index every owner the version lacks; `record` stores progress on the version"""
+        name = service.version.name
+        progress = {"docs_total": 0, "docs_done": 0, "docs_failed": 0, "docs_removed": 0, "chunks": 0}
+        started = time.monotonic()
+        last_report = 0.0
+
+        async def report(force: bool = False):
+            nonlocal last_report
+            elapsed = max(time.monotonic() - started, 1e-9)
+            remaining = progress["docs_total"] - progress["docs_done"] - progress["docs_failed"]
+            docs_per_s = progress["docs_done"] / elapsed
+            progress.update(
+                elapsed_s=round(elapsed, 1),
+                docs_per_s=round(docs_per_s, 2),
+                chunks_per_s=round(progress["chunks"] / elapsed, 1),
+                eta_s=round(remaining / docs_per_s, 1) if docs_per_s else None
+            )
+            if force or time.monotonic() - last_report >= 1.0:
+                last_report = time.monotonic()
+                if record:
+                    await index_registry.update_progress(name, progress)
+                if on_progress:
+                    await on_progress(dict(progress))
+
+        # Documents becoming ready while we work are picked up by the next round
+        while True:
+            owners = await self._owners()
+            built = await index_registry.built_owners(name)
+
+            # Deleted since they were built: their chunks are unreachable
+            for owner in built - set(owners):
+                await self._remove_owner(service, owner)
+                await index_registry.unmark_built(name, owner)
+                progress["docs_removed"] += 1
+
+            pending = [owner for owner in owners if owner not in built]
+            if not pending:
+                break
+            progress["docs_total"] += len(pending)
+            await report(force=True)
+
+            queue: asyncio.Queue = asyncio.Queue()
+            for owner in pending:
+                queue.put_nowait(owner)
+
+            async def worker():
+                while not queue.empty():
+                    owner = queue.get_nowait()
+                    try:
+                        chunk_count = await self._index_owner(service, owner)
+                        progress["chunks"] += chunk_count
+                        progress["docs_done"] += 1
+                    except Exception as e:
+                        logger.error(f"❌ Re-indexing {owner} into {name} failed: {e}")
+                        progress["docs_failed"] += 1
+                    await report()
+
+            await asyncio.gather(*(
+                worker() for _ in range(max(1, workers or settings.REINDEX_WORKERS))
+            ))
+            if progress["docs_failed"]:
+                # Failed documents stay pending for the next run
+                break
+
+        await report(force=True)
+        return progress
+
+    async def _index_owner(self, service: VectorService, owner: str) -> int:
+        name = service.version.name
+        if owner.startswith(LEGACY_PREFIX):
+            session_id = owner[len(LEGACY_PREFIX):]
+            file_doc = await mongodb.db.files.find_one(
+                {"session_id": session_id}, {"filename": 1, "text_content": 1}
+            )
+            if file_doc is None:
+                return 0
+            metadata = {"session_id": session_id, "filename": file_doc["filename"], "file_id": str(file_doc["_id"])}
+            records = _single(file_doc.get("text_content") or "")
+            # Chunks of an interrupted earlier attempt
+            await service.delete_session_chunks(session_id)
+        else:
+            # Shared chunks are labelled with the first uploader's file
+            file_doc = await mongodb.db.files.find_one(
+                {"doc_id": owner}, {"session_id": 1, "filename": 1}, sort=[("_id", 1)]
+            )
+            if file_doc is None:
+                return 0
+            metadata = {
+                "doc_id": owner,
+                "session_id": file_doc["session_id"],
+                "filename": file_doc["filename"],
+                "file_id": str(file_doc["_id"])
+            }
+            records = text_store.iter_text(owner)
+            await service.delete_document_chunks(owner)
+
+        chunk_count = await service.index_records(records, metadata)
+        await index_registry.mark_built(name, owner, chunk_count)
+        return chunk_count
+
+    async def _remove_owner(self, service: VectorService, owner: str):
+        if owner.startswith(LEGACY_PREFIX):
+            await service.delete_session_chunks(owner[len(LEGACY_PREFIX):])
+        else:
+            await service.delete_document_chunks(owner)
+
+
+def new_version(name: Optional[str] = None, model: Optional[str] = None,
+                chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                backend: Optional[str] = None) -> IndexVersion:
+    """An index version spec, with unset parts taken from settings.
+
+    New versions carry overlap by word count rather than the default
+    version's two sentences.
+    """
+    default = IndexVersion.default()
+    return IndexVersion(
+        name=name or time.strftime("chunks_%Y%m%d_%H%M%S"),
+        model=model or default.model,
+        backend=backend or default.backend,
+        chunk_size=chunk_size or default.chunk_size,
+        chunk_overlap=default.chunk_overlap if chunk_overlap is None else chunk_overlap,
+        overlap_mode=OverlapMode.WORDS
+    )
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+reindex_service = ReindexService()
@@ -0,0 +1,157 @@
+# backend/src/services/session_index.py
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from .cache_service import TTLCache
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+@dataclass
+class SessionPartition:
+    """All chunks of one document as a contiguous, L2-normalized matrix.
+
+    The matrix is float32, float16, or int8 with one scale per row; compact
+    matrices only shortlist candidates, which are re-scored against the
+    exact float32 vectors (see `rescore`).
+    """
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    matrix: Optional[np.ndarray]  # None: too large, use the ANN index instead
+    ids: List[str] = field(default_factory=list)
+    scales: Optional[np.ndarray] = None  # int8 only
+
+    @property
+    def is_large(self) -> bool:
+        return self.matrix is None
+
+    @property
+    def is_compact(self) -> bool:
+        return self.matrix is not None and self.matrix.dtype != np.float32
+
+    @property
+    def nbytes(self) -> int:
+        if self.matrix is None:
+            return 0
+        return self.matrix.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+
+LARGE_PARTITION = SessionPartition(documents=[], metadatas=[], matrix=None)
+
+
+def build_partition(documents: List[str], metadatas: List[Dict[str, Any]], embeddings,
+                    ids: Optional[List[str]] = None, dtype: str = "float32") -> SessionPartition:
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown VECTOR_STORAGE_DTYPE: {dtype} (expected one of {', '.join(STORAGE_DTYPES)})")
+    if not documents:
+        return SessionPartition(documents=[], metadatas=[], matrix=np.empty((0, 0), dtype=np.float32))
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(documents), -1)
+    matrix = _normalize(matrix)
+
+    scales = None
+    if dtype == "float16":
+        matrix = matrix.astype(np.float16)
+    elif dtype == "int8":
+        # Symmetric per-row quantization: row ~= int8 row * scale
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+        scales = scales.astype(np.float32)
+    return SessionPartition(
+        documents=list(documents),
+        metadatas=list(metadatas),
+        matrix=matrix,
+        ids=list(ids or []),
+        scales=scales
+    )
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def dequantize(partition: SessionPartition, rows: List[int]) -> np.ndarray:
+    """Float32 approximation of some rows of a partition's matrix"""
+    vectors = partition.matrix[rows].astype(np.float32)
+    if partition.scales is not None:
+        vectors *= partition.scales[rows, None]
+    return vectors
+
+
+def _scores(partition: SessionPartition, queries: np.ndarray) -> np.ndarray:
+    """Cosine scores of every chunk against normalized queries, chunks x queries"""
+    matrix = partition.matrix
+    if matrix.dtype == np.float32:
+        return matrix @ queries.T
+    # BLAS has no float16/int8 products: widen, and apply row scales after
+    scores = matrix.astype(np.float32) @ queries.T
+    if partition.scales is not None:
+        scores *= partition.scales[:, None]
+    return scores
+
+
+def _top(column: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    if k < len(column):
+        top = np.argpartition(-column, k - 1)[:k]
+    else:
+        top = np.arange(len(column))
+    top = top[np.argsort(-column[top])]
+    return [(int(i), float(column[i])) for i in top]
+
+
+def exact_top_k(partition: SessionPartition, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Cosine top-k over a partition, returns (row, score) best first"""
+    return exact_top_k_many(partition, np.asarray(query)[None, :], k)[0]
+
+
+def exact_top_k_many(partition: SessionPartition, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+    """exact_top_k for each row of `queries`, with one matrix product"""
+    if partition.matrix is None or not len(partition.documents):
+        return [[] for _ in range(len(queries))]
+    queries = _normalize(np.asarray(queries, dtype=np.float32))
+    scores = _scores(partition, queries)
+    k = min(k, scores.shape[0])
+    return [_top(column, k) for column in scores.T]
+
+
+def rescore(queries: np.ndarray, shortlists: List[List[Tuple[int, float]]],
+            rows: List[int], exact: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+    """Re-rank each query's shortlist by cosine against float32 vectors.
+
+    `exact[i]` is the stored vector of partition row `rows[i]`; every row
+    in the shortlists must be among `rows`.
+    """
+    position = {row: i for i, row in enumerate(rows)}
+    queries = _normalize(np.asarray(queries, dtype=np.float32))
+    scores = _normalize(np.asarray(exact, dtype=np.float32)) @ queries.T  # rows x queries
+    results = []
+    for column, shortlist in enumerate(shortlists):
+        rescored = [(row, float(scores[position[row], column])) for row, _ in shortlist]
+        rescored.sort(key=lambda item: -item[1])
+        results.append(rescored[:k])
+    return results
+
+
+def partition_stats() -> Dict[str, Any]:
+    return {
+        **session_partitions.stats(),
+        "dtype": settings.VECTOR_STORAGE_DTYPE,
+        "bytes": sum(partition.nbytes for partition in session_partitions.values())
+    }
+
+
+# Partition key (doc_id, or session_id for legacy chunks) -> SessionPartition.
+# With VECTOR_STORE_MODE=remote only the index server holds these, and
+# every write goes through it
+session_partitions = TTLCache(
+    "session_partitions",
+    max_entries=settings.SESSION_INDEX_CACHE_SIZE,
+    ttl_seconds=settings.SESSION_INDEX_CACHE_TTL_S
+)
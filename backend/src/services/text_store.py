@@ -0,0 +1,89 @@
+# backend/src/services/text_store.py
+import zlib
+from typing import AsyncIterator, Optional
+
+from bson import Binary
+
+from ..core.database import mongodb
+
+BLOCK_CHARS = 256 * 1024
+
+
+class TextWriter:
+    """Writes one document's text as a sequence of compressed blocks"""
+
+    def __init__(self, store: "TextStore", doc_id: str):
+        self._store = store
+        self._doc_id = doc_id
+        self._buffer = []
+        self._buffered = 0
+        self._seq = 0
+        self.chars = 0
+
+    async def write(self, text: str):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        self.chars += len(text)
+        if self._buffered >= BLOCK_CHARS:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        data = zlib.compress("".join(self._buffer).encode("utf-8"), 6)
+        await self._store.collection.insert_one({
+            "_id": f"{self._doc_id}:{self._seq:06d}",
+            "doc_id": self._doc_id,
+            "seq": self._seq,
+            "data": Binary(data)
+        })
+        self._seq += 1
+        self._buffer = []
+        self._buffered = 0
+
+    async def close(self) -> int:
+        """Flush the last block, returns the number of characters written"""
+        await self._flush()
+        return self.chars
+
+
+class TextStore:
+    """Extracted document text, kept out of the metadata collections.
+
+    Text is stored zlib-compressed in blocks in the `document_text`
+    collection, keyed by content hash, so `files` and `documents` queries
+    never load it and it can be written and read as a stream.
+    """
+
+    @property
+    def collection(self):
+        return mongodb.db.document_text
+
+    async def open_writer(self, doc_id: str) -> TextWriter:
+        # Drop blocks from an earlier, interrupted attempt
+        await self.delete(doc_id)
+        return TextWriter(self, doc_id)
+
+    async def iter_text(self, doc_id: str) -> AsyncIterator[str]:
+        """Yield the text of a document block by block"""
+        found = False
+        cursor = self.collection.find({"doc_id": doc_id}).sort("seq", 1)
+        async for block in cursor:
+            found = True
+            yield zlib.decompress(block["data"]).decode("utf-8")
+        if found:
+            return
+        # Documents stored before text moved out of the record
+        document = await mongodb.db.documents.find_one({"_id": doc_id}, {"text_content": 1})
+        if document and document.get("text_content"):
+            yield document["text_content"]
+
+    async def get_text(self, doc_id: str) -> Optional[str]:
+        parts = [part async for part in self.iter_text(doc_id)]
+        return "".join(parts) if parts else None
+
+    async def delete(self, doc_id: str):
+        await self.collection.delete_many({"doc_id": doc_id})
+
+
+text_store = TextStore()
@@ -1,113 +1,478 @@
 import os
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-import chromadb
+import re
+import asyncio
+import logging
+import time
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional
 from datetime import datetime
+import numpy as np
+from ..core.config import settings
+from ..core.metrics import INGESTED_CHUNKS, record_stage, timed
+from .cache_service import query_embedding_cache, normalize_text
+from .index_registry import IndexVersion, OverlapMode, index_registry
+from .lexical_index import LexicalMatch, lexical_index, reciprocal_rank_fusion
+from .vector_store import create_vector_store
+
+logger = logging.getLogger(__name__)
 
 class VectorService:
-    def __init__(self):
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Initialize ChromaDB with PersistentClient
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="document_chunks",
-            metadata={"hnsw:space": "cosine"}
+    """Chunking, ingestion pipeline and search on top of a VectorStore.
+
+    The store (embedded, or a remote index server) is selected by
+    VECTOR_STORE_MODE, and serves one index version: a collection with its
+    embedding model and chunk parameters. The shared instance follows the
+    version the index alias points at (see `index_registry`), re-checking
+    every INDEX_REFRESH_S; the re-index job builds its own instance for the
+    version it writes. Nothing heavy happens at import time; call
+    `warmup()` from the app's lifespan before the first request arrives.
+    """
+
+    def __init__(self, version: Optional[IndexVersion] = None):
+        self.follows_alias = version is None
+        self.version = version or IndexVersion.default()
+        self.store = create_vector_store(self.version.name, self.version.model, self.version.backend)
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.store.ready
+
+    async def warmup(self):
+        if self.follows_alias:
+            await self.refresh_index()
+        await self.store.warmup()
+
+    async def refresh_index(self) -> bool:
+        """Switch to the active index version if it changed, returns True if so.
+
+        The new store is warmed up before it replaces the old one, so
+        requests never wait for a model load; the old store is closed once
+        requests still using it have had time to finish.
+        """
+        async with self._refresh_lock:
+            version = await index_registry.active_version()
+            if version == self.version:
+                return False
+            store = create_vector_store(version.name, version.model, version.backend)
+            await store.warmup()
+            previous = self.store
+            self.store, self.version = store, version
+        logger.info(f"🔀 Switched to index version {version.name} ({version.model}, {version.backend})")
+        asyncio.create_task(self._close_later(previous))
+        return True
+
+    async def _close_later(self, store):
+        await asyncio.sleep(settings.VECTOR_STORE_TIMEOUT_S)
+        await store.close()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.INDEX_REFRESH_S)
+            try:
+                await self.refresh_index()
+            except Exception as e:
+                logger.warning(f"⚠️ Index version refresh failed: {e}")
+
+    def start_refresh(self):
+        if self.follows_alias and settings.INDEX_REFRESH_S > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self.store.stats()
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        await self.store.close()
+
+    def chunker(self) -> "TextChunker":
+        return TextChunker(
+            chunk_size=self.version.chunk_size,
+            overlap=self.version.chunk_overlap,
+            overlap_mode=self.version.overlap_mode
         )
-    
-    def create_chunks_and_embeddings(self, text: str, metadata: Dict[str, Any]) -> List[str]:
+
+    async def create_chunks_and_embeddings(self, text: str, metadata: Dict[str, Any]) -> List[str]:
         """Create embeddings for text and store in vector DB"""
         # Split text into chunks
-        chunks = self._chunk_text(text, chunk_size=300, overlap=50)
-        
-        # Generate embeddings for each chunk
-        embeddings = self.embedding_model.encode(chunks).tolist()
-        
-        # Generate IDs
-        ids = [f"{metadata['session_id']}_{i}" for i in range(len(chunks))]
+        chunks = self._chunk_text(text)
+        embeddings = await self.store.encode_documents(chunks)
+        return await self._write_chunks(chunks, embeddings, metadata, start_index=0)
+
+    async def index_records(
+        self,
+        records: AsyncIterator[str],
+        metadata: Dict[str, Any],
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> int:
+        """Chunk, embed and store a stream of text records (pages/sections).
+
+        Works in batches of `INGEST_BATCH_SIZE` chunks so memory stays flat
+        however large the document is; encoding of one batch overlaps with
+        the Chroma write of the previous one. `on_progress` is awaited with
+        the number of chunks written so far. Returns the total chunk count.
+        """
+        # Captured once, so an index version switch mid-document cannot
+        # split a document across two collections
+        store, version = self.store, self.version
+        chunker = self.chunker()
+        batch_size = max(1, settings.INGEST_BATCH_SIZE)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        pending: List[str] = []
+        submitted = 0
+        chunking_s = 0.0
+        write_task: Optional[asyncio.Task] = None
+
+        async def submit(batch: List[str]):
+            nonlocal submitted, write_task
+            embeddings = await store.encode_documents(batch)
+            # Only one write in flight: wait for the previous batch to land
+            if write_task is not None:
+                await write_task
+                if on_progress:
+                    await on_progress(submitted)
+            write_task = asyncio.create_task(
+                self._write_chunks(batch, embeddings, metadata, start_index=submitted, store=store, version=version)
+            )
+            submitted += len(batch)
+
+        try:
+            async for text in records:
+                chunk_started = time.perf_counter()
+                pending.extend(chunker.feed(text))
+                chunking_s += time.perf_counter() - chunk_started
+                while len(pending) >= batch_size:
+                    batch, pending = pending[:batch_size], pending[batch_size:]
+                    await submit(batch)
+
+            pending.extend(chunker.flush())
+            if pending:
+                await submit(pending)
+            if write_task is not None:
+                await write_task
+        except BaseException:
+            if write_task is not None and not write_task.done():
+                write_task.cancel()
+            raise
+
+        record_stage("chunking", chunking_s)
+        INGESTED_CHUNKS.inc(submitted)
+        elapsed = max(loop.time() - started, 1e-9)
+        logger.info(
+            f"Indexed {submitted} chunks in {elapsed:.1f}s "
+            f"({submitted / elapsed:.0f} chunks/s)"
+        )
+        if on_progress:
+            await on_progress(submitted)
+        return submitted
+
+    async def _write_chunks(
+        self,
+        chunks: List[str],
+        embeddings,
+        metadata: Dict[str, Any],
+        start_index: int,
+        store=None,
+        version: Optional[IndexVersion] = None
+    ) -> List[str]:
+        # Generate IDs (shared documents are keyed by content hash)
+        owner = metadata.get("doc_id") or metadata["session_id"]
+        indexes = range(start_index, start_index + len(chunks))
+        ids = [f"{owner}_{i}" for i in indexes]
         
-        # Store in ChromaDB
-        self.collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=[{**metadata, "chunk_index": i} for i in range(len(chunks))],
-            ids=ids
+        # The BM25 postings of a batch are written next to its vectors
+        await asyncio.gather(
+            (store or self.store).add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=chunks,
+                metadatas=[{**metadata, "chunk_index": i} for i in indexes],
+                partition_key=owner
+            ),
+            lexical_index.add((version or self.version).name, owner, start_index, chunks)
         )
         
         return ids
     
-    def search_similar_chunks(self, query: str, session_id: str = None, limit: int = 3) -> List[Dict]:
-        query_embedding = self.embedding_model.encode(query).tolist()
-        where_filter = {"session_id": session_id} if session_id else None
-
-        # ADD THIS
-        print(f"DEBUG - Searching with session_id: {session_id}")
-        print(f"DEBUG - Total chunks in collection: {self.collection.count()}")
-
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=limit,
-            where=where_filter,
-            include=["documents", "metadatas", "distances"]
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Encode a query, reusing cached vectors for repeated questions.
+
+        Cached as float32 arrays: a 384-d list of Python floats is ~8x larger.
+        """
+        store = self.store
+        with timed("query_embedding"):
+            return await query_embedding_cache.get_or_compute(
+                self._query_key(query),
+                lambda: self._encode_query(store, query)
+            )
+
+    def _query_key(self, query: str):
+        # Vectors of different index versions' models (or backends) are not interchangeable
+        return (self.version.model, self.version.backend, normalize_text(query))
+
+    async def _encode_query(self, store, query: str) -> np.ndarray:
+        # A copy: the encoded row is a view of the whole micro-batch
+        return np.array(await store.encode_query(query), dtype=np.float32)
+
+    async def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Encode many queries; cache misses go to the model as one batch"""
+        store = self.store
+        with timed("query_embedding"):
+            keys = [self._query_key(query) for query in queries]
+            embeddings = [query_embedding_cache.get(key) for key in keys]
+            missing = list(dict.fromkeys(
+                key for key, embedding in zip(keys, embeddings) if embedding is None
+            ))
+            if missing:
+                originals = {}
+                for key, query in zip(keys, queries):
+                    originals.setdefault(key, query)
+                encoded = await store.encode_queries([originals[key] for key in missing])
+                computed = {key: np.array(row, dtype=np.float32) for key, row in zip(missing, encoded)}
+                for key, embedding in computed.items():
+                    query_embedding_cache.set(key, embedding)
+                embeddings = [computed[key] if embedding is None else embedding
+                              for key, embedding in zip(keys, embeddings)]
+            return embeddings
+
+    def _where(self, session_id: str = None, doc_id: str = None):
+        """Chroma filter for one document; legacy chunks only carry session_id"""
+        if doc_id:
+            return {"doc_id": doc_id}
+        if session_id:
+            return {"session_id": session_id}
+        return None
+
+    async def search_similar_chunks(
+        self,
+        query: str,
+        session_id: str = None,
+        limit: int = 3,
+        doc_id: str = None,
+        lexical_only: bool = True
+    ) -> List[Dict]:
+        """Vector search in one document (or all), fused with BM25 matches.
+
+        Queries naming codes (invoice numbers, ids, quoted terms) that all
+        occur in the document are answered from the lexical index alone,
+        without encoding the query, unless `lexical_only` is False (results
+        that will be fused again across files need their vector scores).
+        """
+        partition_key = doc_id or session_id
+        store, version = self.store, self.version
+        lexical = None
+        if settings.HYBRID_SEARCH and partition_key:
+            with timed("lexical_search"):
+                lexical = await lexical_index.lookup(version.name, partition_key, query, limit)
+            if lexical.identifiers_matched and lexical_only and settings.LEXICAL_FAST_PATH:
+                chunks = await self._lexical_chunks(store, partition_key, lexical)
+                if chunks:
+                    logger.debug("Search %s: lexical only", partition_key)
+                    return reciprocal_rank_fusion(chunks, limit)
+
+        query_embedding = await self.embed_query(query)
+        with timed("vector_search"):
+            hits = await store.search(query_embedding, limit, self._where(session_id, doc_id), partition_key)
+        chunks = self._format_hits(hits, partition_key)
+        if not lexical or not lexical.hits:
+            return chunks
+        return reciprocal_rank_fusion(
+            chunks + await self._lexical_chunks(store, partition_key, lexical), limit
+        )
+
+    async def search_similar_chunks_many(
+        self,
+        query_embeddings: List[np.ndarray],
+        session_id: str = None,
+        limit: int = 3,
+        doc_id: str = None,
+        queries: Optional[List[str]] = None
+    ) -> List[List[Dict]]:
+        """Search one document for many pre-encoded queries at once.
+
+        With the query texts, each result is fused with its BM25 matches.
+        """
+        if not query_embeddings:
+            return []
+        partition_key = doc_id or session_id
+        store, version = self.store, self.version
+        with timed("vector_search"):
+            results = await store.search_many(
+                np.asarray(query_embeddings, dtype=np.float32), limit,
+                self._where(session_id, doc_id), partition_key
+            )
+        results = [self._format_hits(hits, partition_key) for hits in results]
+        if not (settings.HYBRID_SEARCH and queries and partition_key):
+            return results
+
+        with timed("lexical_search"):
+            matches = [await lexical_index.lookup(version.name, partition_key, query, limit) for query in queries]
+        # One chunk fetch for the lexical hits of every query
+        found = await self._fetch_chunks(
+            store, partition_key, {row for match in matches for row, _ in match.hits}
         )
+        fused = []
+        for chunks, match in zip(results, matches):
+            lexical = _scored(found, match)
+            fused.append(reciprocal_rank_fusion(chunks + lexical, limit) if lexical else chunks)
+        return fused
+
+    async def _lexical_chunks(self, store, partition_key: str, match: LexicalMatch) -> List[Dict]:
+        """Chunk dicts for the BM25 hits of one document"""
+        found = await self._fetch_chunks(store, partition_key, [row for row, _ in match.hits])
+        return _scored(found, match)
 
-        print(f"DEBUG - Raw results: {results['distances']}")
+    async def _fetch_chunks(self, store, partition_key: str, rows) -> Dict[int, Dict]:
+        """Chunks of one document by chunk index; rows deleted since are missing"""
+        ids = {f"{partition_key}_{row}": row for row in rows}
+        if not ids:
+            return {}
+        with timed("lexical_fetch"):
+            chunks = await store.get_chunks(list(ids))
+        return {
+            ids[chunk_id]: {
+                "chunk_text": doc,
+                "filename": meta.get("filename", "Unknown"),
+                "session_id": meta.get("session_id"),
+                "chunk_id": chunk_id
+            }
+            for chunk_id, doc, meta in chunks
+        }
+
+    def _format_hits(self, hits, partition_key: Optional[str]) -> List[Dict]:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Search %s: scores %s", partition_key or "all",
+                [round(score, 3) for _, _, score in hits]
+            )
 
         formatted = []
-        if results['documents']:
-            for doc, meta, dist in zip(
-                results['documents'][0],
-                results['metadatas'][0],
-                results['distances'][0]
-            ):
-                score = 1 - dist
-                print(f"DEBUG chunk score: {score}")
-                if score < 0.05:
-                    continue
-                formatted.append({
-                    "chunk_text": doc,
-                    "filename": meta.get("filename", "Unknown"),
-                    "session_id": meta.get("session_id"),
-                    "score": score
-                })
+        for doc, meta, score in hits:
+            if score < settings.MIN_VECTOR_SCORE:
+                continue
+            owner = meta.get("doc_id") or meta.get("session_id")
+            formatted.append({
+                "chunk_text": doc,
+                "filename": meta.get("filename", "Unknown"),
+                "session_id": meta.get("session_id"),
+                "score": score,
+                "chunk_id": f"{owner}_{meta.get('chunk_index')}",
+                "vector_score": score
+            })
 
         return formatted
+
+    async def delete_session_chunks(self, session_id: str):
+        """Delete all embeddings and lexical postings for a session"""
+        await asyncio.gather(
+            self.store.delete({"session_id": session_id}, partition_key=session_id),
+            lexical_index.delete(self.version.name, session_id)
+        )
+
+    async def delete_document_chunks(self, doc_id: str):
+        """Delete all embeddings and lexical postings for a content-addressed document"""
+        await asyncio.gather(
+            self.store.delete({"doc_id": doc_id}, partition_key=doc_id),
+            lexical_index.delete(self.version.name, doc_id)
+        )
     
-    def delete_session_chunks(self, session_id: str):
-        """Delete all embeddings for a session"""
-        self.collection.delete(where={"session_id": session_id})   
-    
-    def _chunk_text(self, text: str, chunk_size: int = 300, overlap: int = 50) -> List[str]:
-        import re
+    def _chunk_text(self, text: str) -> List[str]:
+        chunker = self.chunker()
+        chunks = chunker.feed(text) + chunker.flush()
+        logger.debug("Created %d chunks", len(chunks))
+        return chunks
+
 
-        text = re.sub(r'\n+', ' ', text)
+def _scored(found: Dict[int, Dict], match: LexicalMatch) -> List[Dict]:
+    chunks = []
+    for row, score in match.hits:
+        if row in found:
+            chunk = {**found[row], "lexical_score": score}
+            if row in match.exact_rows:
+                chunk["exact_match"] = True
+            chunks.append(chunk)
+    return chunks
+
+
+class TextChunker:
+    """Sentence-based chunker that accepts text incrementally.
+
+    Feeding a document piece by piece yields the same chunks as chunking the
+    concatenated text, without ever holding the whole document.
+    """
+
+    def __init__(self, chunk_size: int = 300, overlap: int = 50, overlap_mode: str = OverlapMode.SENTENCES):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.overlap_mode = overlap_mode
+        self._pending = ""  # trailing, possibly unfinished sentence
+        self._current_chunk: List[str] = []
+        self._current_length = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Add text, returns the chunks completed by it"""
         text = re.sub(r'\s+', ' ', text).strip()
+        if not text:
+            return []
 
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        buffer = f"{self._pending} {text}" if self._pending else text
+        sentences = re.split(r'(?<=[.!?])\s+', buffer)
+        self._pending = sentences.pop()
 
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        # Text without sentence punctuation must not grow without bound
+        if len(self._pending.split()) >= self.chunk_size:
+            sentences.append(self._pending)
+            self._pending = ""
 
-        for sentence in sentences:
-            word_count = len(sentence.split())
-            current_chunk.append(sentence)
-            current_length += word_count  # ADD FIRST, THEN CHECK
+        return self._add_sentences(sentences)
 
-            if current_length >= chunk_size:  # flush when we hit the limit
-                chunks.append(" ".join(current_chunk))
-                # keep last 2 sentences as overlap for next chunk
-                current_chunk = current_chunk[-2:]
-                current_length = sum(len(s.split()) for s in current_chunk)
+    def flush(self) -> List[str]:
+        """Return the remaining chunks at the end of the document"""
+        chunks = self._add_sentences([self._pending] if self._pending else [])
+        self._pending = ""
 
         # Don't forget remaining sentences
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+        if self._current_chunk:
+            chunks.append(" ".join(self._current_chunk))
+        self._current_chunk = []
+        self._current_length = 0
+        return chunks
+
+    def _add_sentences(self, sentences: List[str]) -> List[str]:
+        chunks = []
+        for sentence in sentences:
+            word_count = len(sentence.split())
+            self._current_chunk.append(sentence)
+            self._current_length += word_count  # ADD FIRST, THEN CHECK
 
-        print(f"DEBUG - Created {len(chunks)} chunks")
+            if self._current_length >= self.chunk_size:  # flush when we hit the limit
+                chunks.append(" ".join(self._current_chunk))
+                self._current_chunk = self._overlap_sentences()
+                self._current_length = sum(len(s.split()) for s in self._current_chunk)
         return chunks
 
+    def _overlap_sentences(self) -> List[str]:
+        """Text carried into the next chunk"""
+        if self.overlap_mode == OverlapMode.SENTENCES:
+            # keep last 2 sentences as overlap for next chunk
+            return self._current_chunk[-2:]
+
+        # Trailing sentences of up to `overlap` words; a longer last
+        # sentence contributes its tail instead of nothing
+        kept, words = [], 0
+        for sentence in reversed(self._current_chunk):
+            sentence_words = sentence.split()
+            if words + len(sentence_words) > self.overlap:
+                if not kept and self.overlap > 0:
+                    kept.append(" ".join(sentence_words[-self.overlap:]))
+                break
+            words += len(sentence_words)
+            kept.append(sentence)
+        return kept[::-1]
+
+
 vector_service = VectorService()
\ No newline at end of file
@@ -0,0 +1,465 @@
+# backend/src/services/vector_store.py
+import asyncio
+import base64
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from ..core.config import settings
+from .embedding_backend import load_embedding_model
+from .embedding_executor import EmbeddingExecutor
+from .session_index import (
+    SessionPartition, LARGE_PARTITION, build_partition, dequantize, exact_top_k_many, partition_stats,
+    rescore, session_partitions
+)
+
+logger = logging.getLogger(__name__)
+
+# (document, metadata, cosine score), best first
+Hit = Tuple[str, Dict[str, Any], float]
+
+
+CHROMA_PATH = "./chroma_db"
+
+# Loaded models by (name, backend), shared by all stores (index versions) in the process
+_models: Dict[Tuple[str, str], Any] = {}
+_chroma_client = None
+_load_lock = threading.Lock()
+
+
+def _load_model(name: str, backend: str):
+    key = (name, backend)
+    model = _models.get(key)
+    if model is None:
+        with _load_lock:
+            model = _models.get(key)
+            if model is None:
+                model = _models[key] = load_embedding_model(*key)
+    return model
+
+
+def _get_chroma_client():
+    global _chroma_client
+    if _chroma_client is None:
+        with _load_lock:
+            if _chroma_client is None:
+                import chromadb
+                _chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _chroma_client
+
+
+class VectorStoreError(Exception):
+    """Raised when the vector store cannot serve a request"""
+
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    """Compact JSON form of a float32 array (base64 of the raw bytes)"""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {
+        "shape": list(array.shape),
+        "data": base64.b64encode(array.tobytes()).decode("ascii")
+    }
+
+
+def decode_array(payload: Dict[str, Any]) -> np.ndarray:
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(payload["shape"])
+
+
+class VectorStore(ABC):
+    """Embedding model plus chunk index, as used by VectorService.
+
+    `partition_key` is the doc_id (or session_id for legacy chunks) that
+    owns the chunks; stores use it to cache and invalidate per-document
+    state.
+    """
+
+    ready: bool = False
+
+    @abstractmethod
+    async def warmup(self):
+        ...
+
+    @abstractmethod
+    async def encode_query(self, text: str) -> np.ndarray:
+        """Encode one interactive query, returns a 1-D vector"""
+
+    @abstractmethod
+    async def encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode many queries in one call, returns a 2-D matrix"""
+
+    @abstractmethod
+    async def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Encode ingestion texts at low priority, returns a 2-D matrix"""
+
+    @abstractmethod
+    async def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+                  metadatas: List[Dict[str, Any]], partition_key: str):
+        ...
+
+    @abstractmethod
+    async def search(self, query_embedding: List[float], limit: int,
+                     where: Optional[Dict[str, Any]], partition_key: Optional[str]) -> List[Hit]:
+        ...
+
+    @abstractmethod
+    async def search_many(self, query_embeddings: np.ndarray, limit: int,
+                          where: Optional[Dict[str, Any]], partition_key: Optional[str]) -> List[List[Hit]]:
+        """`search` for each row of a query matrix, as one index operation"""
+
+    @abstractmethod
+    async def get_chunks(self, ids: List[str]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(id, document, metadata) of the chunks that exist among `ids`"""
+
+    @abstractmethod
+    async def delete(self, where: Dict[str, Any], partition_key: str):
+        ...
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def drop(self):
+        """Delete the whole collection (a retired index version)"""
+
+    async def close(self):
+        pass
+
+
+class EmbeddedVectorStore(VectorStore):
+    """Embedding model + Chroma collection in this process, both loaded on first use.
+
+    Only one process may use a given Chroma directory; to run several API
+    workers, run this store once in the index server and point the workers
+    at it with VECTOR_STORE_MODE=remote.
+    """
+
+    def __init__(self, collection_name: str, model_name: str, backend: str):
+        self.collection_name = collection_name
+        self.model_name = model_name
+        self.backend = backend
+        self._collection = None
+        self.ready = False
+
+        # Encodes run in a worker pool; concurrent queries share one batch
+        self.embedder = EmbeddingExecutor(self._encode)
+
+    @property
+    def embedding_model(self):
+        return _load_model(self.model_name, self.backend)
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            client = _get_chroma_client()
+            with _load_lock:
+                if self._collection is None:
+                    self._collection = client.get_or_create_collection(
+                        name=self.collection_name,
+                        metadata={"hnsw:space": "cosine"}
+                    )
+        return self._collection
+
+    def _partition_key(self, key: str):
+        # Versions share the partition cache; their matrices must not mix
+        return (self.collection_name, key)
+
+    def _encode(self, texts: List[str]):
+        return self.embedding_model.encode(texts)
+
+    async def warmup(self):
+        """Load model and index, then run a dummy encode and query"""
+        started = asyncio.get_running_loop().time()
+        embedding = await self.embedder.encode_query("warmup")
+        await asyncio.to_thread(
+            lambda: self.collection.query(
+                query_embeddings=np.asarray(embedding, dtype=np.float32)[None, :],
+                n_results=1,
+                include=["distances"]
+            )
+        )
+        self.ready = True
+        elapsed = asyncio.get_running_loop().time() - started
+        logger.info(f"✅ Vector store warmed up in {elapsed:.1f}s")
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        return await self.embedder.encode_query(text)
+
+    async def encode_queries(self, texts: List[str]) -> np.ndarray:
+        return await self.embedder.encode_queries(texts)
+
+    async def encode_documents(self, texts: List[str]) -> np.ndarray:
+        return await self.embedder.encode_documents(texts)
+
+    async def add(self, ids, embeddings, documents, metadatas, partition_key):
+        # The float32 matrix is passed as-is, without a Python list-of-lists copy
+        await asyncio.to_thread(
+            lambda: self.collection.add(
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
+        )
+        # After the write: a load in between would re-cache the old matrix
+        session_partitions.invalidate(self._partition_key(partition_key))
+
+    async def search(self, query_embedding, limit, where, partition_key):
+        # Small documents: exact cosine top-k over a cached in-memory matrix,
+        # independent of how many chunks the whole collection holds
+        if partition_key:
+            partition = await self._get_partition(partition_key, where)
+            if not partition.is_large:
+                queries = np.asarray(query_embedding, dtype=np.float32)[None, :]
+                return (await self._exact_search(partition, queries, limit))[0]
+
+        # Large documents and cross-session queries use the ANN index
+        return await self._ann_search(query_embedding, limit, where)
+
+    async def search_many(self, query_embeddings, limit, where, partition_key):
+        if partition_key:
+            partition = await self._get_partition(partition_key, where)
+            if not partition.is_large:
+                return await self._exact_search(partition, query_embeddings, limit)
+
+        # Chroma takes all query vectors in a single query call
+        return await self._ann_search_many(np.asarray(query_embeddings, dtype=np.float32), limit, where)
+
+    async def _exact_search(self, partition: SessionPartition, queries: np.ndarray, limit: int) -> List[List[Hit]]:
+        if partition.is_compact:
+            # Shortlist on the compact matrix, then rank the shortlist by the
+            # float32 vectors Chroma stores
+            shortlists = exact_top_k_many(partition, queries, limit * max(1, settings.VECTOR_RESCORE_FACTOR))
+            rows = sorted({row for shortlist in shortlists for row, _ in shortlist})
+            exact = await asyncio.to_thread(self._exact_vectors, partition, rows)
+            tops = rescore(queries, shortlists, rows, exact, limit)
+        else:
+            tops = exact_top_k_many(partition, queries, limit)
+        return [
+            [(partition.documents[row], partition.metadatas[row], score) for row, score in top]
+            for top in tops
+        ]
+
+    def _exact_vectors(self, partition: SessionPartition, rows: List[int]) -> np.ndarray:
+        vectors = dequantize(partition, rows)
+        if not rows:
+            return vectors
+        result = self.collection.get(ids=[partition.ids[row] for row in rows], include=["embeddings"])
+        stored = dict(zip(result["ids"], result["embeddings"]))
+        for i, row in enumerate(rows):
+            # Deleted since the partition was cached: keep the approximation
+            if partition.ids[row] in stored:
+                vectors[i] = stored[partition.ids[row]]
+        return vectors
+
+    async def _ann_search(self, query_embedding, limit: int, where) -> List[Hit]:
+        queries = np.asarray(query_embedding, dtype=np.float32)[None, :]
+        return (await self._ann_search_many(queries, limit, where))[0]
+
+    async def _ann_search_many(self, query_embeddings, limit: int, where) -> List[List[Hit]]:
+        results = await asyncio.to_thread(
+            lambda: self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=limit,
+                where=where,
+                include=["documents", "metadatas", "distances"]
+            )
+        )
+
+        if not results['documents']:
+            return [[] for _ in query_embeddings]
+        return [
+            [(doc, meta, 1 - dist) for doc, meta, dist in zip(documents, metadatas, distances)]
+            for documents, metadatas, distances in zip(
+                results['documents'],
+                results['metadatas'],
+                results['distances']
+            )
+        ]
+
+    async def _get_partition(self, key: str, where) -> SessionPartition:
+        key = self._partition_key(key)
+        partition = session_partitions.get(key)
+        if partition is not None:
+            return partition
+
+        async def load():
+            generation = session_partitions.generation(key)
+            partition = await asyncio.to_thread(self._load_partition, where)
+            # An empty partition may still be ingesting; don't pin it
+            if partition.is_large or partition.documents:
+                session_partitions.set(key, partition, generation=generation)
+            return partition
+
+        return await session_partitions.single_flight(key, load)
+
+    def _load_partition(self, where) -> SessionPartition:
+        max_chunks = settings.SMALL_SESSION_MAX_CHUNKS
+        result = self.collection.get(
+            where=where,
+            limit=max_chunks + 1,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if len(result["ids"]) > max_chunks:
+            return LARGE_PARTITION
+        return build_partition(
+            result["documents"], result["metadatas"], result["embeddings"],
+            ids=result["ids"], dtype=settings.VECTOR_STORAGE_DTYPE
+        )
+
+    async def get_chunks(self, ids):
+        if not ids:
+            return []
+        result = await asyncio.to_thread(
+            lambda: self.collection.get(ids=ids, include=["documents", "metadatas"])
+        )
+        return list(zip(result["ids"], result["documents"], result["metadatas"]))
+
+    async def delete(self, where, partition_key):
+        await asyncio.to_thread(lambda: self.collection.delete(where=where))
+        session_partitions.invalidate(self._partition_key(partition_key))
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding": {"backend": self.backend, **self.embedder.stats()},
+            "session_partitions": partition_stats()
+        }
+
+    async def drop(self):
+        await asyncio.to_thread(_get_chroma_client().delete_collection, self.collection_name)
+        self._collection = None
+
+    async def close(self):
+        await self.embedder.close()
+
+
+class RemoteVectorStore(VectorStore):
+    """Client for the index server (`src/index_server.py`).
+
+    The server owns the embedding model, the Chroma index and the
+    per-document cache, so any number of API workers or replicas share one
+    loaded copy and query encodes from all of them are batched together.
+    """
+
+    def __init__(self, base_url: str, collection_name: str, model_name: str, backend: str):
+        self.base_url = base_url
+        self.index = {"name": collection_name, "model": model_name, "backend": backend}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.ready = False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(settings.VECTOR_STORE_TIMEOUT_S, connect=5),
+                limits=httpx.Limits(max_keepalive_connections=32)
+            )
+        return self._client
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise VectorStoreError(f"Index server unreachable at {self.base_url}: {e}")
+        if response.status_code != 200:
+            raise VectorStoreError(f"Index server error {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def warmup(self):
+        """Wait until the index server is up, then have it load this index"""
+        while True:
+            try:
+                health = await self._request("GET", "/health")
+                if health.get("ready"):
+                    break
+            except VectorStoreError as e:
+                logger.warning(f"⚠️ {e}")
+            await asyncio.sleep(1.0)
+        await self._request("POST", "/warmup", json={"index": self.index})
+        self.ready = True
+        logger.info(f"✅ Connected to index server at {self.base_url} ({self.index['name']})")
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        result = await self._request("POST", "/encode", json={"texts": [text], "query": True, "index": self.index})
+        return decode_array(result["embeddings"])[0]
+
+    async def encode_queries(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        result = await self._request("POST", "/encode", json={"texts": texts, "query": True, "index": self.index})
+        return decode_array(result["embeddings"])
+
+    async def encode_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        result = await self._request("POST", "/encode", json={"texts": texts, "query": False, "index": self.index})
+        return decode_array(result["embeddings"])
+
+    async def add(self, ids, embeddings, documents, metadatas, partition_key):
+        await self._request("POST", "/chunks/add", json={
+            "ids": ids,
+            "embeddings": encode_array(embeddings),
+            "documents": documents,
+            "metadatas": metadatas,
+            "partition_key": partition_key,
+            "index": self.index
+        })
+
+    async def search(self, query_embedding, limit, where, partition_key):
+        result = await self._request("POST", "/chunks/search", json={
+            "embedding": encode_array(np.asarray(query_embedding)),
+            "limit": limit,
+            "where": where,
+            "partition_key": partition_key,
+            "index": self.index
+        })
+        return [tuple(hit) for hit in result["hits"]]
+
+    async def search_many(self, query_embeddings, limit, where, partition_key):
+        result = await self._request("POST", "/chunks/search_many", json={
+            "embeddings": encode_array(np.asarray(query_embeddings)),
+            "limit": limit,
+            "where": where,
+            "partition_key": partition_key,
+            "index": self.index
+        })
+        return [[tuple(hit) for hit in hits] for hits in result["hits"]]
+
+    async def get_chunks(self, ids):
+        if not ids:
+            return []
+        result = await self._request("POST", "/chunks/get", json={"ids": ids, "index": self.index})
+        return [tuple(chunk) for chunk in result["chunks"]]
+
+    async def delete(self, where, partition_key):
+        await self._request("POST", "/chunks/delete", json={
+            "where": where,
+            "partition_key": partition_key,
+            "index": self.index
+        })
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self._request("GET", "/stats", params=self.index)
+
+    async def drop(self):
+        await self._request("POST", "/drop", json={"index": self.index})
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_vector_store(collection_name: str, model_name: str, backend: str) -> VectorStore:
+    """A store for one index version, of the kind selected by VECTOR_STORE_MODE"""
+    if settings.VECTOR_STORE_MODE == "remote":
+        return RemoteVectorStore(settings.VECTOR_STORE_URL, collection_name, model_name, backend)
+    if settings.VECTOR_STORE_MODE != "embedded":
+        raise ValueError(f"Unknown VECTOR_STORE_MODE: {settings.VECTOR_STORE_MODE}")
+    return EmbeddedVectorStore(collection_name, model_name, backend)
@@ -0,0 +1,23 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the app as `src.…`, like `uvicorn src.main:app` run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """The FastAPI app on an in-memory MongoDB, without running its lifespan"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from src.core.config import settings
+    from src.core.database import mongodb
+    from src.main import app
+
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(mongodb, "client", client)
+    monkeypatch.setattr(mongodb, "db", client["test"])
+    monkeypatch.setattr(settings, "UPLOAD_PATH", tmp_path / "uploads")
+    return app
@@ -0,0 +1,111 @@
+# backend/tests/test_cache_service.py
+import asyncio
+
+from src.services.cache_service import TTLCache, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("  What is   the TOTAL?? ") == "what is the total"
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    cache = TTLCache("test", max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    expired = TTLCache("test", max_entries=2, ttl_seconds=-1)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+
+def test_invalidate_tag_drops_tagged_entries():
+    cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+    cache.set("a", 1, tags=["s1"])
+    cache.set("b", 2, tags=["s1", "s2"])
+    cache.set("c", 3, tags=["s2"])
+
+    assert cache.invalidate_tag("s1") == 2
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, None, 3)
+
+
+def test_set_drops_values_loaded_across_an_invalidation():
+    cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+
+    generation = cache.generation("k")
+    cache.invalidate("k")
+    cache.set("k", "stale", generation=generation)
+    assert cache.get("k") is None
+
+    generation = cache.generation("k", ["s1"])
+    cache.invalidate_tag("s1")
+    cache.set("k", "stale", tags=["s1"], generation=generation)
+    assert cache.get("k") is None
+
+    generation = cache.generation("k", ["s1"])
+    cache.invalidate("other")
+    cache.invalidate_tag("s2")
+    cache.set("k", "fresh", tags=["s1"], generation=generation)
+    assert cache.get("k") == "fresh"
+
+
+def test_pruned_generations_still_drop_loads_in_flight():
+    cache = TTLCache("test", max_entries=1, ttl_seconds=60)
+    generation = cache.generation("k")
+    for i in range(2000):
+        cache.invalidate(i)
+    cache.set("k", "maybe stale", generation=generation)
+    assert cache.get("k") is None
+
+
+def test_single_flight_shares_one_computation():
+    cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        return await asyncio.gather(*(cache.single_flight("k", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert cache.coalesced == 4
+
+
+def test_invalidating_a_tag_stops_callers_joining_a_stale_computation():
+    cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+    results = iter(["stale", "fresh"])
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return next(results)
+
+    async def run():
+        first = asyncio.create_task(cache.single_flight("k", compute, tags=["s1"]))
+        await asyncio.sleep(0)
+        cache.invalidate_tag("s1")
+        second = asyncio.create_task(cache.single_flight("k", compute, tags=["s1"]))
+        return await first, await second
+
+    assert asyncio.run(run()) == ("stale", "fresh")
+
+
+def test_get_or_compute_caches_unless_invalidated_meanwhile():
+    cache = TTLCache("test", max_entries=10, ttl_seconds=60)
+
+    async def compute():
+        cache.invalidate_tag("s1")
+        return "value"
+
+    assert asyncio.run(cache.get_or_compute("k", compute, tags=["s1"])) == "value"
+    assert cache.get("k") is None
+
+    async def stable():
+        return "value"
+
+    asyncio.run(cache.get_or_compute("k", stable, tags=["s1"]))
+    assert cache.get("k") == "value"
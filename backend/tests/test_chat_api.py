@@ -0,0 +1,67 @@
+# backend/tests/test_chat_api.py
+import asyncio
+import json
+
+import httpx
+
+from src.api import chat
+from src.core.metrics import record_stage
+from src.services.llm_service import llm_service
+
+
+def _request(app, method, url, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_completed_stream_is_served_from_the_answer_cache(app, monkeypatch):
+    chunk = {"chunk_id": "c1", "chunk_text": "The invoice total is 4500 dollars.",
+             "filename": "invoice.pdf", "score": 0.9, "vector_score": 0.9}
+
+    async def retrieve(question):
+        return [dict(chunk)], "invoice.pdf"
+
+    async def stream_generate(prompt, context=None):
+        yield {"response": "It is 4500 "}
+        yield {"response": "dollars."}
+        yield {"done": True}
+
+    async def generate(*args, **kwargs):
+        raise AssertionError("the second ask should be answered from the cache")
+
+    monkeypatch.setattr(chat, "_retrieve_chunks", retrieve)
+    monkeypatch.setattr(llm_service, "stream_generate", stream_generate)
+    monkeypatch.setattr(llm_service, "generate", generate)
+    question = {"text": "What is the streamed invoice total?", "session_id": "s-stream"}
+
+    streamed = _request(app, "POST", "/api/chat/ask/stream", json=question)
+    assert streamed.status_code == 200
+    assert "event: done" in streamed.text
+
+    answered = _request(app, "POST", "/api/chat/ask", json=question)
+    assert answered.status_code == 200
+    assert answered.json()["answer"] == "It is 4500 dollars."
+
+
+def test_stream_reports_llm_timings_in_its_done_event(app, monkeypatch):
+    async def retrieve(question):
+        return [{"chunk_id": "c1", "chunk_text": "The vendor is Acme Corp.", "filename": "a.pdf",
+                 "score": 0.9, "vector_score": 0.9}], "a.pdf"
+
+    async def stream_generate(prompt, context=None):
+        yield {"response": "Acme Corp."}
+        record_stage("llm_total", 0.25)
+        yield {"done": True}
+
+    monkeypatch.setattr(chat, "_retrieve_chunks", retrieve)
+    monkeypatch.setattr(llm_service, "stream_generate", stream_generate)
+
+    response = _request(app, "POST", "/api/chat/ask/stream", json={"text": "Who is the vendor?", "session_id": "s-timing"})
+
+    done = response.text.split("event: done\ndata: ")[1].splitlines()[0]
+    assert json.loads(done)["timings"]["llm_total"] == 250.0
+    assert "llm_total" not in response.headers["server-timing"]
@@ -0,0 +1,30 @@
+# backend/tests/test_cleanup_service.py
+import asyncio
+from datetime import datetime, timedelta
+
+from src.core.config import settings
+from src.core.database import mongodb
+from src.services.cleanup_service import cleanup_service
+from src.services.vector_service import vector_service
+
+
+def test_only_sessions_stamped_with_an_expiry_are_collected(app, monkeypatch):
+    async def delete_session_chunks(session_id):
+        pass
+
+    monkeypatch.setattr(settings, "SESSION_TTL_HOURS", 1.0)
+    monkeypatch.setattr(vector_service, "delete_session_chunks", delete_session_chunks)
+    long_ago = datetime.now() - timedelta(days=365)
+
+    async def run():
+        await mongodb.db.files.insert_many([
+            {"session_id": "legacy", "filename": "old.pdf", "created_at": long_ago},
+            {"session_id": "kept", "filename": "kept.pdf", "created_at": long_ago, "expires_at": None},
+            {"session_id": "expired", "filename": "a.pdf", "created_at": long_ago,
+             "expires_at": datetime.now() - timedelta(minutes=1)},
+        ])
+        deleted = await cleanup_service.collect_expired()
+        remaining = await mongodb.db.files.distinct("session_id")
+        return deleted, sorted(remaining)
+
+    assert asyncio.run(run()) == (1, ["kept", "legacy"])
@@ -0,0 +1,70 @@
+# backend/tests/test_context_service.py
+from src.services.context_service import context_service, estimate_tokens
+
+
+def _chunk(text, score, filename="a.txt"):
+    return {"chunk_text": text, "score": score, "filename": filename}
+
+
+def test_estimate_tokens_counts_words_punctuation_and_long_words():
+    assert estimate_tokens("It is, ok!") == 5
+    assert estimate_tokens("internationalization") == 5
+    assert estimate_tokens("") == 0
+
+
+def test_overlapping_sentences_are_packed_once():
+    chunks = [
+        _chunk("The total is 4500. Payment is due March 3.", 0.9),
+        _chunk("Payment is due March 3. The vendor is Acme.", 0.8),
+    ]
+
+    packed = context_service.pack(chunks, token_budget=500)
+
+    assert packed.text.count("Payment is due March 3.") == 1
+    assert "The vendor is Acme." in packed.text
+    assert packed.chunks == chunks
+    assert not packed.truncated
+
+
+def test_chunks_are_packed_by_relevance():
+    chunks = [_chunk("Least relevant.", 0.2), _chunk("Most relevant.", 0.9), _chunk("Middle.", 0.5)]
+    packed = context_service.pack(chunks, token_budget=500, mmr_lambda=1.0)
+    assert packed.text == "Most relevant.\n\nMiddle.\n\nLeast relevant."
+
+
+def test_mmr_prefers_new_content_over_near_duplicates():
+    chunks = [
+        _chunk("Acme Corp invoice total 4500 dollars due March.", 0.90),
+        _chunk("Acme Corp invoice total 4500 dollars due in March!", 0.89),
+        _chunk("Warranty covers parts for two years.", 0.80),
+    ]
+    packed = context_service.pack(chunks, token_budget=500, mmr_lambda=0.5)
+    assert [chunk["score"] for chunk in packed.chunks] == [0.90, 0.80, 0.89]
+
+
+def test_budget_cuts_at_sentence_boundaries():
+    chunks = [_chunk("One two three. Four five six. Seven eight nine.", 0.9)]
+
+    packed = context_service.pack(chunks, token_budget=9)
+
+    assert packed.text == "One two three. Four five six."
+    assert packed.tokens <= 9
+    assert packed.truncated
+
+
+def test_an_oversized_first_sentence_is_trimmed_to_the_budget():
+    packed = context_service.pack([_chunk(" ".join(["word"] * 50) + ".", 0.9)], token_budget=10)
+    assert packed.text == " ".join(["word"] * 10)
+    assert packed.tokens == 10
+    assert packed.truncated
+
+
+def test_sources_are_labelled_on_request():
+    chunks = [_chunk("From the first file.", 0.9, "a.txt"), _chunk("From the second file.", 0.8, "b.pdf")]
+    packed = context_service.pack(chunks, token_budget=500, label_sources=True)
+    assert packed.text == "[a.txt]\nFrom the first file.\n\n[b.pdf]\nFrom the second file."
+
+
+def test_nothing_to_pack():
+    packed = context_service.pack([], token_budget=100)
+    assert packed.text == "" and packed.chunks == [] and packed.tokens == 0
@@ -0,0 +1,79 @@
+# backend/tests/test_digest_service.py
+import pytest
+
+from src.services.context_service import estimate_tokens
+from src.services.digest_service import DigestIntent, _groups, detect_intent, format_digest, parse_digest
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("Summarize this document", DigestIntent.SUMMARY),
+    ("Can you please summarise the file?", DigestIntent.SUMMARY),
+    ("tl;dr", DigestIntent.SUMMARY),
+    ("Give me a brief summary of this PDF please", DigestIntent.SUMMARY),
+    ("What is this document about?", DigestIntent.ABOUT),
+    ("What does the contract cover", DigestIntent.ABOUT),
+    ("List the key points", DigestIntent.KEY_POINTS),
+    ("What are the main takeaways of this report?", DigestIntent.KEY_POINTS),
+    ("Tolong ringkaskan dokumen ini", DigestIntent.SUMMARY),
+    ("Dokumen ini tentang apa?", DigestIntent.ABOUT),
+    ("Senaraikan perkara utama", DigestIntent.KEY_POINTS),
+])
+def test_detect_intent(question, intent):
+    assert detect_intent(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "Summarize the payment terms",
+    "What is the total of invoice INV-2024001?",
+    "What are the key points of the warranty clause?",
+    "Who is the vendor?",
+    "",
+])
+def test_retrieval_questions_have_no_intent(question):
+    assert detect_intent(question) is None
+
+
+def _partials(count, words):
+    return [" ".join(f"p{i}w{j}" for j in range(words)) for i in range(count)]
+
+
+def test_groups_fill_the_budget_in_order():
+    partials = _partials(6, 10)
+    cost = estimate_tokens(partials[0])
+
+    groups = _groups(partials, budget=3 * cost)
+
+    assert groups == [partials[:3], partials[3:]]
+
+
+def test_groups_take_at_least_two_partials_even_over_budget():
+    partials = _partials(4, 50)
+    assert _groups(partials, budget=1) == [partials[:2], partials[2:]]
+
+
+def test_a_lone_last_partial_joins_the_previous_group():
+    partials = _partials(5, 10)
+    cost = estimate_tokens(partials[0])
+
+    groups = _groups(partials, budget=2 * cost)
+
+    assert groups == [partials[:2], partials[2:]]
+    assert all(len(group) >= 2 for group in groups)
+
+
+def test_groups_of_few_partials():
+    assert _groups(_partials(2, 10), budget=1) == [_partials(2, 10)]
+    assert _groups([], budget=100) == []
+
+
+def test_parse_digest_reads_summary_and_points():
+    summary, points = parse_digest("SUMMARY: An invoice\nfrom Acme.\nKEY POINTS:\n- Total 4500\n* Due March 3\n")
+    assert summary == "An invoice from Acme."
+    assert points == ["Total 4500", "Due March 3"]
+
+
+def test_format_digest_by_intent():
+    digest = {"summary": "An invoice.", "key_points": ["Total 4500"]}
+    assert format_digest(digest, DigestIntent.ABOUT) == "An invoice."
+    assert format_digest(digest, DigestIntent.KEY_POINTS, "ms") == "Perkara utama:\n- Total 4500"
+    assert format_digest(digest, DigestIntent.SUMMARY) == "An invoice.\n\nKey points:\n- Total 4500"
@@ -0,0 +1,49 @@
+# backend/tests/test_extraction_service.py
+import datetime
+
+from src.services.extraction_service import SPREADSHEET_GROUP_WORDS, _sheet_row_groups
+
+
+def test_rows_are_grouped_with_the_header_repeated():
+    rows = [("Invoice", "Amount", "Date")] + [(f"INV-{i}", 100.0 + i, datetime.datetime(2024, 3, i + 1)) for i in range(3)]
+
+    groups = list(_sheet_row_groups("Sales", rows))
+
+    assert groups == [{
+        "sheet": "Sales",
+        "text": "Sheet Sales, rows 2-4. Columns: Invoice | Amount | Date.\n"
+                "INV-0 | 100 | 2024-03-01.\nINV-1 | 101 | 2024-03-02.\nINV-2 | 102 | 2024-03-03."
+    }]
+
+
+def test_groups_stay_under_the_word_limit_and_number_rows():
+    width = 10
+    rows = [tuple(f"h{i}" for i in range(width))] + [tuple(f"r{n}c{i}" for i in range(width)) for n in range(100)]
+
+    groups = list(_sheet_row_groups("Big", rows))
+
+    assert len(groups) > 1
+    rows_per_group = SPREADSHEET_GROUP_WORDS // (2 * width - 1) + 1
+    assert groups[0]["text"].startswith(f"Sheet Big, rows 2-{1 + rows_per_group}. Columns: h0 | ")
+    assert groups[1]["text"].startswith(f"Sheet Big, rows {2 + rows_per_group}-")
+    assert all(group["text"].count("\n") <= rows_per_group for group in groups)
+    # Every row appears exactly once
+    assert sum(group["text"].count(" | r") for group in groups) == 100 * (width - 1)
+
+
+def test_empty_rows_and_trailing_empty_cells_are_skipped():
+    rows = [(None, None), ("Name", "Qty", None), (None,), ("Bolt", 4.0, float("nan")), ()]
+
+    groups = list(_sheet_row_groups("Parts", rows))
+
+    assert groups == [{"sheet": "Parts", "text": "Sheet Parts, rows 4-4. Columns: Name | Qty.\nBolt | 4."}]
+
+
+def test_header_only_sheet_yields_one_record():
+    assert list(_sheet_row_groups("Notes", [("Only a header",)])) == [
+        {"sheet": "Notes", "text": "Sheet Notes. Only a header."}
+    ]
+
+
+def test_empty_sheet_yields_nothing():
+    assert list(_sheet_row_groups("Empty", [(), (None, None)])) == []
@@ -0,0 +1,39 @@
+# backend/tests/test_files_api.py
+import asyncio
+
+import httpx
+
+from src.core.config import settings
+from src.core.database import mongodb
+
+
+def _request(app, method, url, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_oversized_upload_is_refused_with_cors_headers(app):
+    origin = "http://localhost:3000"
+    too_large = settings.MAX_FILE_SIZE_MB * 1024 * 1024 * 2
+
+    response = _request(app, "POST", "/api/files/upload", content=b"", headers={
+        "Origin": origin,
+        "Content-Length": str(too_large),
+        "Content-Type": "multipart/form-data; boundary=x",
+    })
+
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == origin
+
+
+def test_unsupported_file_type_is_refused_before_it_is_stored(app):
+    response = _request(app, "POST", "/api/files/upload", files={"file": ("data.csv", b"a,b\n1,2\n", "text/csv")})
+
+    assert response.status_code == 415
+    assert not settings.UPLOAD_PATH.exists()
+    assert asyncio.run(mongodb.db.documents.count_documents({})) == 0
+    assert asyncio.run(mongodb.db.files.count_documents({})) == 0
@@ -0,0 +1,144 @@
+# backend/tests/test_lexical_index.py
+import asyncio
+import json
+import zlib
+from collections import Counter
+
+import pytest
+
+from src.core.config import settings
+from src.services.lexical_index import (
+    _assemble, _exact_rows, bm25_top_k, has_evidence, identifier_terms, lexical_index, lexical_partitions,
+    reciprocal_rank_fusion, tokenize
+)
+
+
+def _partition(chunks, start=0):
+    """A partition as LexicalIndex.add stores it and lookups assemble it"""
+    postings, lengths = {}, []
+    for offset, chunk in enumerate(chunks):
+        counts = Counter(tokenize(chunk))
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).extend((offset, tf))
+    data = json.dumps({"lengths": lengths, "postings": postings}).encode("utf-8")
+    return _assemble([{"start": start, "data": zlib.compress(data)}])
+
+
+CHUNKS = [
+    "Invoice INV-2024001 from Acme Corp, total 4500 dollars.",
+    "Payment is due on 12/03/2024 by bank transfer.",
+    "The vendor Acme Corp is located in Kuala Lumpur.",
+    "Delivery was made in 2023 to the Penang warehouse.",
+]
+
+
+def test_tokenize_keeps_joined_tokens_whole_and_by_part():
+    assert list(tokenize("Invoice INV-2024001")) == ["invoice", "inv-2024001", "inv", "2024001"]
+
+
+def test_tokenize_drops_stopwords():
+    assert list(tokenize("Where is the vendor? Apakah dalam fail")) == ["vendor", "fail"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is the total of INV-2024001?", {"inv-2024001"}),
+    ("Find order a12345", {"a12345"}),
+    ("What is due on 12/03/2024?", {"12/03/2024"}),
+    ('Where is "Acme Corp"?', {"acme", "corp"}),
+    ("What happened in 2023?", set()),
+    ("Is the total 4500?", set()),
+    ("a1 b2", set()),
+])
+def test_identifier_terms(query, expected):
+    assert identifier_terms(query) == expected
+
+
+def test_bm25_ranks_chunks_with_rarer_and_more_terms_first():
+    partition = _partition(CHUNKS)
+    hits = bm25_top_k(partition, ["acme", "kuala", "lumpur"], 4)
+
+    assert [row for row, _ in hits] == [2, 0]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_bm25_limits_to_k_and_ignores_unknown_terms():
+    partition = _partition(CHUNKS)
+    assert len(bm25_top_k(partition, ["acme"], 1)) == 1
+    assert bm25_top_k(partition, ["nonexistent"], 3) == []
+    assert bm25_top_k(partition, ["acme"], 0) == []
+
+
+def test_bm25_rows_are_offset_by_the_batch_start():
+    partition = _partition(CHUNKS, start=10)
+    assert bm25_top_k(partition, ["penang"], 3)[0][0] == 13
+
+
+def test_exact_rows_need_every_term():
+    partition = _partition(CHUNKS)
+    assert _exact_rows(partition, {"inv-2024001"}) == {0}
+    assert _exact_rows(partition, {"acme", "corp"}) == {0, 2}
+    assert _exact_rows(partition, {"inv-2024001", "lumpur"}) == set()
+    assert _exact_rows(partition, {"inv-9999999"}) == set()
+
+
+def _chunk(chunk_id, **scores):
+    return {"chunk_id": chunk_id, "chunk_text": chunk_id, **scores}
+
+
+def test_rrf_favours_chunks_ranked_by_both():
+    chunks = [
+        _chunk("a", vector_score=0.9), _chunk("b", vector_score=0.8), _chunk("c", vector_score=0.7),
+        _chunk("b", lexical_score=5.0), _chunk("c", lexical_score=4.0),
+    ]
+    fused = reciprocal_rank_fusion(chunks, 3)
+
+    assert [chunk["chunk_id"] for chunk in fused] == ["b", "c", "a"]
+    # Merged entries keep both raw scores
+    assert fused[0]["vector_score"] == 0.8 and fused[0]["lexical_score"] == 5.0
+
+
+def test_rrf_scales_first_by_both_to_one_and_puts_exact_matches_first():
+    chunks = [
+        _chunk("a", vector_score=0.9), _chunk("a", lexical_score=3.0),
+        _chunk("b", lexical_score=1.0, exact_match=True),
+    ]
+    fused = reciprocal_rank_fusion(chunks, 2)
+
+    assert [chunk["chunk_id"] for chunk in fused] == ["b", "a"]
+    assert fused[0]["score"] == 1.0
+    # "a" is first in both rankings; "b" only counts as second by BM25
+    assert fused[1]["score"] == pytest.approx(1.0)
+
+
+def test_rrf_score_of_a_single_ranking():
+    k = settings.HYBRID_RRF_K
+    fused = reciprocal_rank_fusion([_chunk("a", vector_score=0.9), _chunk("b", vector_score=0.2)], 2)
+    assert [chunk["score"] for chunk in fused] == pytest.approx([1 / 2, (k + 1) / (k + 2) / 2])
+
+
+def test_has_evidence_uses_raw_scores_not_the_fused_score():
+    assert not has_evidence({"score": 0.98, "vector_score": 0.01, "lexical_score": 0.2})
+    assert has_evidence({"score": 0.5, "vector_score": settings.MIN_VECTOR_SCORE})
+    assert has_evidence({"score": 0.5, "lexical_score": settings.MIN_LEXICAL_SCORE})
+    assert has_evidence({"score": 0.5, "lexical_score": 0.1, "exact_match": True})
+    # Chunks without raw scores are judged by their score
+    assert has_evidence({"score": 0.3})
+    assert not has_evidence({"score": 0.01})
+
+
+def test_documents_without_postings_are_cached_until_indexed(app):
+    key = ("v1", "legacy-doc")
+
+    async def run():
+        before = await lexical_index.lookup(*key, "acme", 5)
+        cached = lexical_partitions.get(key)
+        await lexical_index.add(*key, 0, CHUNKS)
+        after = await lexical_index.lookup(*key, "acme", 5)
+        return before, cached, after
+
+    before, cached, after = asyncio.run(run())
+
+    assert not before.hits and not before.exact_rows
+    assert cached is not None and cached.chunk_count == 0
+    assert sorted(row for row, _ in after.hits) == [0, 2]
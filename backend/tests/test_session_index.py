@@ -0,0 +1,83 @@
+# backend/tests/test_session_index.py
+import numpy as np
+import pytest
+
+from src.services.session_index import build_partition, exact_top_k, exact_top_k_many, rescore
+
+
+def _embeddings(rows=20, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+def _partition(embeddings, dtype="float32"):
+    documents = [f"chunk {i}" for i in range(len(embeddings))]
+    return build_partition(documents, [{"chunk_index": i} for i in range(len(documents))], embeddings, dtype=dtype)
+
+
+def _cosine_ranking(embeddings, query):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)), scores
+
+
+def test_exact_top_k_matches_brute_force_cosine():
+    embeddings = _embeddings()
+    query = embeddings[3] + 0.1
+    ranking, scores = _cosine_ranking(embeddings, query)
+
+    top = exact_top_k(_partition(embeddings), query, 5)
+
+    assert [row for row, _ in top] == ranking[:5]
+    assert [score for _, score in top] == pytest.approx([scores[row] for row in ranking[:5]], abs=1e-5)
+
+
+def test_exact_top_k_caps_k_at_partition_size():
+    embeddings = _embeddings(rows=3)
+    assert len(exact_top_k(_partition(embeddings), embeddings[0], 10)) == 3
+
+
+def test_exact_top_k_of_empty_or_large_partition_is_empty():
+    empty = build_partition([], [], [])
+    assert exact_top_k(empty, np.ones(4, dtype=np.float32), 3) == []
+    assert exact_top_k_many(empty, np.ones((2, 4), dtype=np.float32), 3) == [[], []]
+
+
+def test_exact_top_k_many_matches_single_queries():
+    embeddings = _embeddings()
+    partition = _partition(embeddings)
+    queries = embeddings[[1, 7, 12]]
+
+    many = exact_top_k_many(partition, queries, 4)
+
+    for query, result in zip(queries, many):
+        single = exact_top_k(partition, query, 4)
+        assert [row for row, _ in result] == [row for row, _ in single]
+        assert [score for _, score in result] == pytest.approx([score for _, score in single], abs=1e-5)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_partitions_find_the_nearest_chunk(dtype):
+    embeddings = _embeddings()
+    top = exact_top_k(_partition(embeddings, dtype), embeddings[5], 1)
+    assert top[0][0] == 5
+    assert top[0][1] == pytest.approx(1.0, abs=0.02)
+
+
+def test_build_partition_rejects_unknown_dtype():
+    with pytest.raises(ValueError):
+        _partition(_embeddings(), dtype="bfloat16")
+
+
+def test_rescore_reranks_shortlists_by_exact_vectors():
+    embeddings = _embeddings()
+    query = embeddings[9]
+    # A shortlist in the wrong order, with made-up approximate scores
+    shortlist = [(2, 0.9), (9, 0.5), (4, 0.4)]
+    rows = [4, 9, 2]
+
+    result = rescore(query[None, :], [shortlist], rows, embeddings[rows], k=2)
+
+    _, scores = _cosine_ranking(embeddings, query)
+    expected = sorted((row for row, _ in shortlist), key=lambda row: -scores[row])[:2]
+    assert [row for row, _ in result[0]] == expected
+    assert result[0][0] == (9, pytest.approx(1.0, abs=1e-5))
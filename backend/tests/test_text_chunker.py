@@ -0,0 +1,72 @@
+# backend/tests/test_text_chunker.py
+from src.services.index_registry import OverlapMode
+from src.services.vector_service import TextChunker
+
+
+def _sentences(count, words=10, prefix="s"):
+    return " ".join(
+        " ".join(f"{prefix}{i}w{j}" for j in range(words - 1)) + f" {prefix}{i}end."
+        for i in range(count)
+    )
+
+
+def _chunk(chunker, text):
+    return chunker.feed(text) + chunker.flush()
+
+
+def test_chunks_close_at_the_first_sentence_reaching_chunk_size():
+    chunks = _chunk(TextChunker(chunk_size=30, overlap=0, overlap_mode=OverlapMode.WORDS), _sentences(9))
+    assert [len(chunk.split()) for chunk in chunks] == [30, 30, 30]
+
+
+def test_feeding_pieces_matches_feeding_the_whole_text():
+    text = _sentences(40, words=7)
+    whole = _chunk(TextChunker(chunk_size=50, overlap=10), text)
+
+    # Pieces end at whitespace, like extracted pages and sections
+    words = text.split()
+    chunker = TextChunker(chunk_size=50, overlap=10)
+    pieces = []
+    for start in range(0, len(words), 13):
+        pieces.extend(chunker.feed(" ".join(words[start:start + 13])))
+    pieces.extend(chunker.flush())
+
+    assert pieces == whole
+
+
+def test_sentence_overlap_carries_the_last_two_sentences():
+    chunks = _chunk(TextChunker(chunk_size=30, overlap=50), _sentences(6))
+    assert chunks[1].startswith("s1w0")
+    assert chunks[0].endswith("s2end.")
+
+
+def test_sentence_overlap_is_the_default():
+    assert TextChunker().overlap_mode == OverlapMode.SENTENCES
+
+
+def test_word_overlap_keeps_whole_sentences_within_the_budget():
+    chunks = _chunk(TextChunker(chunk_size=30, overlap=15, overlap_mode=OverlapMode.WORDS), _sentences(6))
+    # One 10-word sentence fits in 15 words of overlap, two don't
+    assert chunks[1].startswith("s2w0")
+
+
+def test_word_overlap_carries_the_tail_of_a_long_last_sentence():
+    text = _sentences(1, words=40, prefix="a") + " " + _sentences(3, prefix="b")
+    chunks = _chunk(TextChunker(chunk_size=30, overlap=5, overlap_mode=OverlapMode.WORDS), text)
+    assert chunks[1].split()[:5] == chunks[0].split()[-5:]
+
+
+def test_text_without_punctuation_does_not_accumulate():
+    words = [f"w{i}" for i in range(100)]
+    chunker = TextChunker(chunk_size=30, overlap=0, overlap_mode=OverlapMode.WORDS)
+    chunks = []
+    for start in range(0, len(words), 10):
+        chunks.extend(chunker.feed(" ".join(words[start:start + 10])))
+    chunks.extend(chunker.flush())
+
+    assert all(len(chunk.split()) <= 40 for chunk in chunks)
+    assert " ".join(chunks).split() == words
+
+
+def test_empty_text_yields_no_chunks():
+    assert _chunk(TextChunker(), "  \n ") == []
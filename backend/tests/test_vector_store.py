@@ -0,0 +1,13 @@
+# backend/tests/test_vector_store.py
+import pytest
+
+from src.services.vector_store import VectorStore
+
+
+def test_incomplete_backends_fail_at_construction():
+    class EncodeOnlyStore(VectorStore):
+        async def encode_query(self, text):
+            return None
+
+    with pytest.raises(TypeError, match="search"):
+        EncodeOnlyStore()